@@ -1,12 +1,32 @@
 
 import os
+import io
+import csv
+import json
+import zlib
 import asyncio
-from contextlib import asynccontextmanager
+import math
+import hmac
+import secrets
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from functools import partial
+from typing import Annotated, AsyncIterator, Optional, Literal
 from fastapi import HTTPException
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.tg_interface.interface import AsyncTelegramInterface
+from app.tg_interface.interface import AsyncTelegramInterface, derive_webhook_secret, update_ordering_key
+from app.tg_interface.update_queue import UpdateQueue
+from app.tg_interface.update_dedup import MemoryUpdateDeduplicator, PostgresUpdateDeduplicator
 from app.loads.loads import Loads
+from app.loads.load import ALLOWED_STAGES
+from app.loads import queries
+from app.response_cache import ResponseCache
+from app.broadcaster import LoadsBroadcaster, Subscription
+from app.leader import LeaderElection
+from app.driver_links import verify_driver_token
+from app.attempt_limiter import AttemptLimiter, MemoryAttemptLimiter, PostgresAttemptLimiter
 from app import settings
 from app.logger import api_logger
 
@@ -65,6 +85,8 @@ async def lifespan(application: FastAPI):
 
     Initializes database connection, telegram interface, and sets up webhook URL.
     Stores initialized resources in application state for use by endpoints.
+    With `API_MODE=read`, connections are read-only and the Telegram
+    interface is not started at all.
 
     Args:
         application: FastAPI application instance.
@@ -75,9 +97,11 @@ async def lifespan(application: FastAPI):
     api_logger.info("Starting application lifespan")
 
     try:
-        public_url = get_public_url(settings.IS_LOCALHOST)
-        webhook_url = public_url + settings.TG_WEBHOOK_ENDPOINT
-        api_logger.info(f"Webhook URL configured: {webhook_url}")
+        webhook_url = None
+        if not settings.READ_ONLY:
+            public_url = get_public_url(settings.IS_LOCALHOST)
+            webhook_url = public_url + settings.TG_WEBHOOK_ENDPOINT
+            api_logger.info(f"Webhook URL configured: {webhook_url}")
 
         # Initialize resources
         api_logger.info("Initializing database connection")
@@ -86,27 +110,135 @@ async def lifespan(application: FastAPI):
                 db_port = settings.DB_PORT,
                 db_name = settings.DB_NAME,
                 db_user = settings.DB_USER,
-                db_password = settings.DB_PASSWORD
+                db_password = settings.DB_PASSWORD,
+                pool_min_size = settings.DB_POOL_MIN_SIZE,
+                pool_max_size = settings.DB_POOL_MAX_SIZE,
+                pool_timeout = settings.DB_POOL_TIMEOUT,
+                pool_max_idle = settings.DB_POOL_MAX_IDLE,
+                pool_max_lifetime = settings.DB_POOL_MAX_LIFETIME,
+                prepare_threshold = None if settings.DB_PGBOUNCER_TRANSACTION_MODE
+                                    else settings.DB_PREPARE_THRESHOLD,
+                cache_actives = settings.LOADS_CACHE,
+                cache_max_age = settings.LOADS_CACHE_MAX_AGE,
+                cache_stale_if_error = settings.LOADS_CACHE_STALE_IF_ERROR,
+                cache_reload_timeout = settings.LOADS_CACHE_RELOAD_TIMEOUT,
+                delta_overlap = settings.LOADS_DELTA_OVERLAP,
+                filter_ids = settings.LOADS_ID_FILTER,
+                ids_error_rate = settings.LOADS_ID_FILTER_ERROR_RATE,
+                ids_rebuild_interval = settings.LOADS_ID_FILTER_REBUILD,
+                read_only = settings.READ_ONLY
         ) as loads:
             api_logger.info("Database connection established")
 
-            api_logger.info("Initializing Telegram interface")
-            async with AsyncTelegramInterface(
+            # Clustered: every worker checks updates against the same secret
+            webhook_secret = None
+            if settings.CLUSTER_MODE:
+                webhook_secret = settings.TG_WEBHOOK_SECRET or derive_webhook_secret(settings.TG_API_TOKEN)
+
+            if settings.TG_UPDATE_DEDUP == 'postgres':
+                update_dedup = PostgresUpdateDeduplicator(loads, ttl=settings.TG_UPDATE_DEDUP_TTL)
+            elif settings.TG_UPDATE_DEDUP == 'memory':
+                update_dedup = MemoryUpdateDeduplicator(ttl=settings.TG_UPDATE_DEDUP_TTL)
+            else:
+                update_dedup = None
+
+            if settings.READ_ONLY:
+                api_logger.info("Read-only mode, Telegram interface skipped")
+                telegram = nullcontext()
+            else:
+                api_logger.info("Initializing Telegram interface")
+                telegram = AsyncTelegramInterface(
                     token=settings.TG_API_TOKEN,
                     webhook_url=webhook_url,
                     chat_id=settings.TELEGRAM_LOADS_CHAT_ID,
-                    loads=loads) as tg_if:
+                    loads=loads,
+                    secret=webhook_secret,
+                    manage_webhook=not settings.CLUSTER_MODE,
+                    dedup=update_dedup
+                )
+            async with telegram as tg_if:
 
-                api_logger.info("Telegram interface initialized")
+                application.state.tg_updates = None
+                if tg_if is not None:
+                    api_logger.info("Telegram interface initialized")
+                    application.state.tg_updates = UpdateQueue(
+                        tg_if.webhook_entrypoint,
+                        key=update_ordering_key,
+                        workers=settings.TG_UPDATE_WORKERS,
+                        maxsize=settings.TG_UPDATE_QUEUE_SIZE,
+                        put_timeout=settings.TG_UPDATE_PUT_TIMEOUT,
+                        drain_timeout=settings.TG_UPDATE_DRAIN_TIMEOUT
+                    )
+                    await application.state.tg_updates.start()
                 application.state.tg_if = tg_if
                 application.state.loads = loads
+                application.state.export_slots = asyncio.Semaphore(settings.EXPORT_MAX_CONCURRENT)
+                application.state.loads_response = ResponseCache(
+                    render=partial(_render_active_loads, loads),
+                    interval=settings.LOADS_RESPONSE_INTERVAL,
+                    version=loads.actives_version
+                )
+
+                # Client IPs are locked progressively. Load IDs are public, anyone
+                # could lock a load for good: they only get a short fixed lock.
+                ip_limits = {
+                    'max_failures': settings.DRIVER_MAX_FAILURES,
+                    'window': settings.DRIVER_FAILURE_WINDOW,
+                    'lockout': settings.DRIVER_LOCKOUT
+                }
+                load_limits = {**ip_limits, 'lockout': settings.DRIVER_LOAD_LOCKOUT, 'progressive': False}
+                if settings.DRIVER_LIMITER == 'postgres' and not settings.READ_ONLY:
+                    application.state.driver_limiter = PostgresAttemptLimiter(loads, **ip_limits)
+                    application.state.load_limiter = PostgresAttemptLimiter(loads, **load_limits)
+                else:
+                    if settings.DRIVER_LIMITER == 'postgres':
+                        api_logger.warning("Failures can not be written in read-only mode, limiting in memory")
+                    application.state.driver_limiter = MemoryAttemptLimiter(**ip_limits)
+                    application.state.load_limiter = MemoryAttemptLimiter(**load_limits)
+                if settings.SOCKET_LOC and not settings.TRUST_FORWARDED_FOR:
+                    # Unix socket peers have no address, only the proxy knows the client's
+                    api_logger.warning(
+                        "Client IPs are unknown on a Unix socket without TRUST_FORWARDED_FOR, "
+                        "/s3/driver locks out by load only, for DRIVER_LOAD_LOCKOUT seconds"
+                    )
+
+                application.state.broadcaster = None
+                if settings.LOADS_STREAM and loads.standby:
+                    api_logger.warning("A hot standby can not LISTEN, /s3/loads/stream and /s3/loads/ws disabled")
+                elif settings.LOADS_STREAM:
+                    application.state.broadcaster = LoadsBroadcaster(
+                        loads,
+                        heartbeat=settings.LOADS_STREAM_HEARTBEAT,
+                        buffer_size=settings.LOADS_STREAM_BUFFER
+                    )
+                    await application.state.broadcaster.start()
+
+                # Clustered: whichever worker holds the lock registers the webhook
+                leader = None
+                if settings.CLUSTER_MODE and tg_if is not None:
+                    leader = LeaderElection(
+                        loads.get_conn_url(),
+                        queries.WEBHOOK_LEADER_LOCK_KEY,
+                        on_elected=tg_if.set_webhook,
+                        retry_interval=settings.LEADER_RETRY_INTERVAL
+                    )
+                    await leader.start(timeout=settings.DB_POOL_TIMEOUT)
 
                 api_logger.info("Setting permissions to socket")
                 asyncio.create_task(set_660_permissions(settings.SOCKET_LOC, 5))
 
                 api_logger.info("Application startup completed successfully")
-                # Yielding control
-                yield
+                try:
+                    # Yielding control
+                    yield
+                finally:
+                    if leader is not None:
+                        await leader.stop()
+                    # Drained while the bot can still answer
+                    if application.state.tg_updates is not None:
+                        await application.state.tg_updates.stop()
+                    if application.state.broadcaster is not None:
+                        await application.state.broadcaster.stop()
 
         api_logger.info("Application shutdown completed")
     except Exception as e:
@@ -124,6 +256,24 @@ app.add_middleware(
 )
 
 
+async def checkout_loads(request: Request) -> AsyncIterator[Loads]:
+    """
+    FastAPI dependency that checks out one pooled connection per request.
+
+    All queries made through the yielded `Loads` during the request share
+    that connection, which is returned to the pool once the request is done.
+
+    Args:
+        request: FastAPI request object to access application state.
+
+    Yields:
+        Loads: The application-wide Loads instance bound to the connection.
+    """
+    loads: Loads = request.app.state.loads
+    async with loads.connection():
+        yield loads
+
+
 def _gen_response3(
     *,
     json_status: str,
@@ -148,119 +298,715 @@ def _gen_response3(
     }
 
 
+def _encode_json(content) -> bytes:
+    """
+    Encode content to JSON bytes the same way FastAPI's JSONResponse does.
+    """
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+async def _render_active_loads(loads: Loads) -> bytes:
+    """
+    Read active loads and encode the `/s3/loads` response body.
+
+    Args:
+        loads: Loads instance to read from.
+
+    Returns:
+        bytes: Encoded response with the safe dump of every active load
+            and the cursor to sync changes from.
+    """
+    # High water first: loads changed while reading are sent again in the next delta
+    cursor = loads.delta_cursor(await loads.get_high_water())
+    active_loads = [load.safe_dump() for load in await loads.get_actives(public=True)]
+    api_logger.info(f"Rendered {len(active_loads)} active loads")
+    return _encode_json(_gen_response3(
+        json_status='success',
+        workload={'len': len(active_loads), 'loads': active_loads, 'cursor': cursor}
+    ))
+
+
+PUBLIC_CACHE_CONTROL = (
+    f'public, max-age={settings.PUBLIC_CACHE_MAX_AGE}, '
+    f'stale-while-revalidate={settings.PUBLIC_CACHE_STALE_WHILE_REVALIDATE}'
+)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an entity tag.
+
+    Uses the weak comparison required for If-None-Match: a `W/` prefix is
+    ignored, and `*` matches any tag.
+
+    Args:
+        if_none_match: Value of the If-None-Match header, if sent.
+        etag: Quoted entity tag of the current representation.
+
+    Returns:
+        bool: True if the client already has the representation.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+async def _encode_export_csv(batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """
+    Encode export batches as CSV, one chunk per batch, header first.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(queries.EXPORT_LOADS_COLUMNS)
+    async for rows in batches:
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _encode_export_ndjson(batches: AsyncIterator[list[tuple]]) -> AsyncIterator[bytes]:
+    """
+    Encode export batches as newline delimited JSON, one chunk per batch.
+    """
+    async for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(queries.EXPORT_LOADS_COLUMNS, row)), default=datetime.isoformat) + '\n'
+            for row in rows
+        ).encode()
+
+
+async def _holding(slots: asyncio.Semaphore, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Stream chunks while holding one of the export slots.
+    """
+    async with slots:
+        async for chunk in chunks:
+            yield chunk
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Compress a byte stream into a single gzip member on the fly.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """
+    Tell whether an Accept-Encoding header allows a gzip response.
+
+    Codings are weighed by their q-value: `gzip;q=0` refuses gzip, and a
+    `*` applies to gzip when it is not listed itself.
+
+    Args:
+        accept_encoding: Value of the header, empty if it was not sent.
+
+    Returns:
+        bool: True if gzip has a q-value above 0.
+    """
+    weights = {}
+    for entry in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in entry.split(';')]
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+
 @app.post(settings.TG_WEBHOOK_ENDPOINT)
 async def process_tg_webhook(request: Request):
     """
     Process incoming Telegram webhook requests.
 
-    Validates the webhook secret token and forwards the update to the
-    Telegram interface for processing.
+    Validates the webhook secret token and queues the update for the
+    background workers of the Telegram interface, without waiting for it
+    to be processed.
 
     Args:
         request: FastAPI request object containing webhook data.
 
     Returns:
-        dict: Status response indicating successful processing.
+        dict: Status response indicating the update was queued.
 
     Raises:
-        HTTPException: 403 if the secret token is invalid.
+        HTTPException: 403 if the secret token is invalid, 404 on read-only
+            nodes, which run no bot, 503 if the update queue is full:
+            Telegram delivers the update again later.
     """
     api_logger.debug("Received Telegram webhook request")
 
     try:
-        tg_if: AsyncTelegramInterface = request.app.state.tg_if
+        tg_if: Optional[AsyncTelegramInterface] = request.app.state.tg_if
+        if tg_if is None:
+            raise HTTPException(404, 'Not Found')
         got_secret = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
 
-        if got_secret != tg_if.own_secret:
+        # Constant time: in clustered mode the secret lives as long as the bot token
+        if got_secret is None or not hmac.compare_digest(got_secret.encode(), tg_if.own_secret.encode()):
             api_logger.warning("Invalid webhook secret token received")
             raise HTTPException(403, 'Forbidden')
 
         api_logger.debug("Webhook authentication successful")
         data = await request.json()
-        api_logger.debug(f"Processing webhook data: {data.get('update_id', 'unknown')}")
+        api_logger.debug(f"Queueing webhook data: {data.get('update_id', 'unknown')}")
 
-        await tg_if.webhook_entrypoint(data)
-        api_logger.debug("Webhook processed successfully")
+        if not await request.app.state.tg_updates.put(data):
+            raise HTTPException(503, 'Update queue full')
+        api_logger.debug("Webhook queued successfully")
         return {'status': 'ok'}
     except Exception as e:
         api_logger.error(f"Error processing webhook: {e}")
         raise
 
 
+LOAD_PUBLIC_FIELDS = ('id', 'type', 'stage', 'stages', 'last_update')
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[tuple[str, ...]]:
+    """
+    Parse a comma separated `fields` projection of public load fields.
+
+    Args:
+        fields: Field names as sent by the client, if any.
+
+    Returns:
+        Optional[tuple[str, ...]]: Fields to keep, always including 'id',
+            or None to keep all of them.
+
+    Raises:
+        ValueError: If a field is not a public load field.
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = names.difference(LOAD_PUBLIC_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in LOAD_PUBLIC_FIELDS if name == 'id' or name in names)
+
+
 @app.get('/s3/loads')
-async def get_loads(request: Request):
+async def get_loads(
+        request: Request,
+        updated_since: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        stage: Optional[ALLOWED_STAGES] = None,
+        load_type: Annotated[Optional[Literal['external', 'internal']], Query(alias='type')] = None,
+        fields: Optional[str] = None
+):
     """
-    Retrieve all active loads from the database.
+    Retrieve all active loads, or only what changed since a cursor.
 
     Returns a list of active loads with their safe dump representation
-    (excluding sensitive driver and client information).
+    (excluding sensitive driver and client information). The body is
+    served pre-encoded from `ResponseCache`, gzipped when the client
+    accepts it, and rendered again at most once per
+    `LOADS_RESPONSE_INTERVAL` seconds. Rendering reads the database in a
+    background task, so no connection is checked out for the request.
+
+    The body is tagged with a strong ETag; a request whose If-None-Match
+    has it gets 304 Not Modified without a body.
+
+    Every response has a `cursor`. Passed back as `cursor` (or a moment
+    as `updated_since`), only loads changed since are returned, with the
+    IDs of loads that left the list in `removed`. Delta and filtered
+    requests are read from the database on every call.
 
     Args:
         request: FastAPI request object to access application state.
+        updated_since: Only loads changed at or after this moment.
+        cursor: Cursor of a previous response, instead of `updated_since`.
+        stage: Only loads in this stage.
+        load_type: Only loads of this type.
+        fields: Comma separated public fields to return, 'id' is always
+            included.
 
     Returns:
-        dict: Response containing count and list of active loads.
+        Response: JSON response containing count and list of active loads,
+            or an empty 304 response.
+
+    Raises:
+        HTTPException: 400 if both `cursor` and `updated_since` are given,
+            the cursor is malformed, a field or the stage is not allowed.
     """
-    api_logger.info("Retrieving active loads")
+    if any(value is not None for value in (updated_since, cursor, stage, load_type, fields)):
+        return await _get_loads_delta(request, updated_since, cursor, stage, load_type, fields)
 
-    try:
-        loads: Loads = request.app.state.loads
-        active_loads_objects = await loads.get_actives()
-        active_loads = [load.safe_dump() for load in active_loads_objects]
+    api_logger.debug("Retrieving active loads")
 
-        api_logger.info(f"Retrieved {len(active_loads)} active loads")
-        return _gen_response3(
-            json_status='success',
-            workload={'len': len(active_loads), 'loads': active_loads}
-        )
+    try:
+        loads_response: ResponseCache = request.app.state.loads_response
+        cached = await loads_response.get()
     except Exception as e:
         api_logger.error(f"Error retrieving active loads: {e}")
         raise e
 
+    gzipped = _accepts_gzip(request.headers.get('Accept-Encoding', ''))
+    # Different encodings are different representations with their own tags
+    etag = cached.etag[:-1] + '-gzip"' if gzipped else cached.etag
+    headers = {
+        'Vary': 'Accept-Encoding',
+        'ETag': etag,
+        'Cache-Control': PUBLIC_CACHE_CONTROL
+    }
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(cached.gzip_body, media_type='application/json', headers=headers)
+    return Response(cached.body, media_type='application/json', headers=headers)
+
+
+async def _get_loads_delta(
+        request: Request,
+        updated_since: Optional[datetime],
+        cursor: Optional[str],
+        stage: Optional[str],
+        load_type: Optional[str],
+        fields: Optional[str]
+) -> Response:
+    """
+    Serve a filtered or delta `/s3/loads` request straight from the database.
+
+    See `get_loads()` for the arguments.
+    """
+    api_logger.info(
+        f"Retrieving active loads changed since {cursor or updated_since} "
+        f"(stage={stage}, type={load_type}, fields={fields})"
+    )
+    loads: Loads = request.app.state.loads
+    try:
+        if cursor is not None and updated_since is not None:
+            raise ValueError('Pass either cursor or updated_since, not both')
+        since = loads.parse_delta_cursor(cursor) if cursor is not None else updated_since
+        projection = _parse_fields(fields)
+        changed, removed, high_water = await loads.get_changes(
+            since=since, stage=stage, load_type=load_type, public=True
+        )
+    except ValueError as e:
+        api_logger.warning(f"Bad loads request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    dumps = [load.safe_dump() for load in changed]
+    if projection is not None:
+        dumps = [{name: dump[name] for name in projection} for dump in dumps]
+    workload = {'len': len(dumps), 'loads': dumps, 'cursor': loads.delta_cursor(high_water)}
+    if since is not None:
+        workload['removed'] = removed
+    return Response(
+        _encode_json(_gen_response3(json_status='success', workload=workload)),
+        media_type='application/json',
+        headers={'Cache-Control': PUBLIC_CACHE_CONTROL}
+    )
+
+
+def _get_broadcaster(request: Request) -> LoadsBroadcaster:
+    """
+    Get the broadcaster of load changes.
+
+    Raises:
+        HTTPException: 503 if streaming is disabled.
+    """
+    broadcaster: Optional[LoadsBroadcaster] = request.app.state.broadcaster
+    if broadcaster is None:
+        raise HTTPException(status_code=503, detail='Load stream is disabled')
+    return broadcaster
+
+
+async def _sse_events(broadcaster: LoadsBroadcaster, subscription: Subscription) -> AsyncIterator[str]:
+    """
+    Frame a subscription as Server-Sent Events, unsubscribing when the
+    client goes away.
+    """
+    try:
+        async for event in subscription.events():
+            yield event.sse()
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@app.get('/s3/loads/stream')
+async def stream_loads(request: Request):
+    """
+    Stream changes of active loads as Server-Sent Events.
+
+    The first event is a `snapshot` of all active loads, then every
+    `changes` event has the loads added or changed and the IDs removed.
+    A `heartbeat` event is sent every `LOADS_STREAM_HEARTBEAT` seconds.
+    A client falling behind gets a `reset` event and the stream ends.
+
+    Args:
+        request: FastAPI request object to access application state.
+
+    Returns:
+        StreamingResponse: The event stream.
+
+    Raises:
+        HTTPException: 503 if streaming is disabled.
+    """
+    broadcaster = _get_broadcaster(request)
+    subscription = broadcaster.subscribe()
+    api_logger.info("Load stream subscribed over SSE")
+    return StreamingResponse(
+        _sse_events(broadcaster, subscription),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.websocket('/s3/loads/ws')
+async def stream_loads_ws(websocket: WebSocket):
+    """
+    Stream changes of active loads over a WebSocket.
+
+    Sends the same events as `/s3/loads/stream`, each as a JSON text
+    message `{"event": name, "data": payload}`. Messages from the client
+    are ignored.
+
+    Args:
+        websocket: FastAPI WebSocket connection.
+    """
+    broadcaster: Optional[LoadsBroadcaster] = websocket.app.state.broadcaster
+    if broadcaster is None:
+        await websocket.close(code=1013, reason='Load stream is disabled')
+        return
+
+    await websocket.accept()
+    subscription = broadcaster.subscribe()
+    api_logger.info("Load stream subscribed over WebSocket")
+    try:
+        async for event in subscription.events():
+            await websocket.send_text(event.ws())
+        await websocket.close()
+    except WebSocketDisconnect:
+        api_logger.debug("Load stream WebSocket disconnected")
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@app.get('/s3/history')
+async def get_history(
+        response: Response,
+        after: Optional[str] = None,
+        limit: int = Query(default=50, ge=1, le=500),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        loads: Loads = Depends(checkout_loads)
+):
+    """
+    Retrieve a page of historical loads, newest first.
+
+    Keyset-paginated: pass `next` from the previous response as `after`
+    to get the following page. Sensitive fields are excluded. Pages may
+    be cached publicly for `PUBLIC_CACHE_MAX_AGE` seconds.
+
+    Args:
+        response: Response whose headers are sent with the page.
+        after: Cursor returned as `next` by the previous page.
+        limit: Page size.
+        since: Only loads modified at or after this moment.
+        until: Only loads modified before this moment.
+        loads: Loads instance with a connection checked out for this request.
+
+    Returns:
+        dict: Response containing the page of loads and the next cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    api_logger.info(f"Retrieving history page after {after} (limit {limit})")
+
+    try:
+        page = await loads.get_historicals(
+            after=after, limit=limit, since=since, until=until, public=True
+        )
+    except ValueError as e:
+        api_logger.warning(f"Bad history page request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = loads.history_cursor(page[-1]) if len(page) == limit else None
+    response.headers['Cache-Control'] = PUBLIC_CACHE_CONTROL
+    return _gen_response3(
+        json_status='success',
+        workload={
+            'len': len(page),
+            'loads': [load.safe_dump() for load in page],
+            'next': next_cursor
+        }
+    )
+
+
+@app.get('/s3/export')
+async def export_loads(
+        request: Request,
+        export_format: Annotated[Literal['csv', 'ndjson'], Query(alias='format')] = 'csv',
+        gzip: bool = False,
+        stage: Optional[ALLOWED_STAGES] = None,
+        load_type: Annotated[Optional[Literal['external', 'internal']], Query(alias='type')] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+):
+    """
+    Stream loads as CSV or NDJSON without sensitive fields.
+
+    Rows are read from a server-side cursor in batches and written out as
+    they arrive, so memory use does not depend on the size of the export.
+    The connection is checked out by the stream itself rather than through
+    `checkout_loads`, since it has to outlive the endpoint function.
+
+    Each stream holds its connection until read to the end, so at most
+    `EXPORT_MAX_CONCURRENT` are served at once and slow readers can not
+    take over the pool.
+
+    Args:
+        request: FastAPI request object to access application state.
+        export_format: Either 'csv' or 'ndjson'.
+        gzip: Compress the stream with gzip.
+        stage: Only loads in this stage.
+        load_type: Only loads of this type.
+        since: Only loads modified at or after this moment.
+        until: Only loads modified before this moment.
+
+    Returns:
+        StreamingResponse: The export, as an attachment, gzipped as a whole
+            file rather than as a transfer encoding.
+
+    Raises:
+        HTTPException: 503 while `EXPORT_MAX_CONCURRENT` exports are
+            being streamed.
+    """
+    slots: asyncio.Semaphore = request.app.state.export_slots
+    if slots.locked():
+        api_logger.warning("Export refused, too many exports in progress")
+        raise HTTPException(503, 'Too many exports in progress', headers={'Retry-After': '30'})
+
+    api_logger.info(
+        f"Exporting loads as {export_format} (gzip={gzip}, stage={stage}, "
+        f"type={load_type}, since={since}, until={until})"
+    )
+    loads: Loads = request.app.state.loads
+    batches = loads.iter_export(
+        stage=stage,
+        load_type=load_type,
+        since=since,
+        until=until,
+        batch_size=settings.EXPORT_BATCH_SIZE
+    )
+    encode = _encode_export_csv if export_format == 'csv' else _encode_export_ndjson
+    body = encode(batches)
+
+    filename = f'loads.{export_format}'
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if gzip:
+        body = _gzip_chunks(body)
+        filename += '.gz'
+        media_type = 'application/gzip'
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+
+    return StreamingResponse(_holding(slots, body), media_type=media_type, headers=headers)
+
+
+@app.post('/s3/loads/bulk')
+async def add_loads_bulk(request: Request):
+    """
+    Create many loads at once.
+
+    Expects a JSON array of loads in the `Load` input format and the
+    `BULK_API_TOKEN` in the `X-Api-Token` header. Rows are validated and
+    inserted independently: invalid or already existing ones are reported
+    without failing the rest of the batch.
+
+    The token and the body are checked before any connection is checked
+    out: the batch is inserted on a connection of its own.
+
+    Args:
+        request: FastAPI request object containing the batch.
+
+    Returns:
+        dict: Response containing created and failed counts and a per-row report.
+
+    Raises:
+        HTTPException: 403 if the token is wrong or not configured,
+            413 if the batch is too large, 422 if the body is not a JSON array,
+            400 if the batch violates database constraints, 503 on
+            read-only nodes.
+    """
+    loads: Loads = request.app.state.loads
+    if loads.read_only:
+        raise HTTPException(503, 'Read-only node')
+
+    got_token = request.headers.get('X-Api-Token') or ''
+    # Compared as bytes, non-ASCII strings make compare_digest() raise
+    if settings.BULK_API_TOKEN is None or not secrets.compare_digest(
+            got_token.encode(), settings.BULK_API_TOKEN.encode()
+    ):
+        api_logger.warning("Invalid bulk API token received")
+        raise HTTPException(403, 'Forbidden')
+
+    try:
+        data = await request.json()
+    except ValueError as e:
+        api_logger.warning(f"Bulk request body is not JSON: {e}")
+        raise HTTPException(422, 'Expected a JSON array of loads')
+    if not isinstance(data, list):
+        raise HTTPException(422, 'Expected a JSON array of loads')
+    if len(data) > settings.BULK_MAX_LOADS:
+        raise HTTPException(413, f'At most {settings.BULK_MAX_LOADS} loads per request')
+
+    api_logger.info(f"Bulk adding {len(data)} loads")
+    try:
+        report = await loads.add_many(data)
+    except ValueError as e:
+        api_logger.error(f"Bulk add failed: {e.__cause__}")
+        raise HTTPException(400, 'Batch violates database constraints')
+
+    created = sum(1 for entry in report if entry['status'] == 'created')
+    api_logger.info(f"Bulk add done: {created} created, {len(report) - created} failed")
+    return _gen_response3(
+        json_status='success',
+        workload={'created': created, 'failed': len(report) - created, 'report': report}
+    )
+
+
+def _client_ip(request: Request) -> Optional[str]:
+    """
+    Get the IP address of the client.
+
+    With `TRUST_FORWARDED_FOR` the last X-Forwarded-For entry is used: the
+    one appended by our own proxy, which clients can not forge.
+
+    Args:
+        request: FastAPI request object.
+
+    Returns:
+        Optional[str]: The address, None if unknown (e.g. on a Unix socket).
+    """
+    if settings.TRUST_FORWARDED_FOR:
+        forwarded_for = request.headers.get('X-Forwarded-For')
+        if forwarded_for:
+            return forwarded_for.split(',')[-1].strip()
+    return request.client.host if request.client else None
+
 
 @app.get('/s3/driver')
-async def get_driver(load_id: str, auth_num: str, request: Request):
+async def get_driver(
+        load_id: str,
+        auth_num: str,
+        request: Request,
+        response: Response,
+        token: Optional[str] = None
+):
     """
     Retrieve driver information for a specific load.
 
     Implements security measures including:
-    - 2-second delay for brute force protection
+    - Progressive lockout of the client IP after failed lookups, and a
+      short fixed one of the load (see `AttemptLimiter`); successful ones
+      are not delayed
     - Client phone number authentication
     - Load existence validation
 
+    Requests from a signed link (see `app.driver_links`) carry a `token`.
+    It is verified before anything else: forged or expired ones are
+    rejected without a query, valid ones skip the lockout.
+
+    No connection is checked out for the whole request: each query takes
+    one from the pool, so requests rejected by the token, the cache or the
+    ID filter never wait for the pool.
+
+    Driver details are personal data: the response must not be stored by
+    browsers or the CDN.
+
     Args:
         load_id: Unique identifier for the load.
         auth_num: Client phone number for authentication.
-        request: FastAPI request object to access application state.
+        request: FastAPI request object.
+        response: Response whose headers are sent with the driver details.
+        token: Token of a signed link for this load and phone number.
 
     Returns:
         dict: Response containing driver name and phone number.
 
     Raises:
-        HTTPException: 400 if load ID is invalid, 401 if authentication fails.
+        HTTPException: 400 if load ID is invalid, 401 if authentication or
+            the token fails, 429 while the client IP or the load is locked.
     """
     # /driver?load_id=683cd668819d85b045d7085283aa3b77&auth_num=380951234567
     api_logger.info(f"Driver info request for load {load_id}... with auth {auth_num}...")
 
-    try:
-        loads: Loads = request.app.state.loads
-
-        # Start load fetch asynchronously
-        delayed_fetch = asyncio.create_task(loads.get_load_by_id(load_id))
+    loads: Loads = request.app.state.loads
+    load_limiter: AttemptLimiter = request.app.state.load_limiter
+    limited = [(load_limiter, [f'load:{load_id}'])]
+    client_ip = _client_ip(request)
+    if client_ip is not None:
+        limited.append((request.app.state.driver_limiter, [f'ip:{client_ip}']))
 
-        # Brute force protection delay
-        api_logger.debug("Applying brute force protection delay")
-        await asyncio.sleep(2)
+    try:
+        if token is not None:
+            if not verify_driver_token(load_id, auth_num, token, settings.DRIVER_LINK_SECRET):
+                api_logger.warning(f"Invalid or expired driver link for load {load_id}...")
+                raise HTTPException(status_code=401, detail='Invalid or expired link')
+        else:
+            retry_after = max([await limiter.retry_after(keys) for limiter, keys in limited])
+            if retry_after > 0:
+                api_logger.warning(
+                    f"Driver info request for load {load_id}... from {client_ip} locked out for {retry_after:.0f}s"
+                )
+                raise HTTPException(
+                    status_code=429,
+                    detail='Too many failed attempts',
+                    headers={'Retry-After': str(math.ceil(retry_after))}
+                )
 
-        load = await delayed_fetch
+        load = await loads.get_load_by_id(load_id)
         if load is None:
             api_logger.warning(f"Load not found: {load_id}")
+            if token is None:
+                for limiter, keys in limited:
+                    await limiter.failed(keys)
             raise HTTPException(status_code=400, detail='Wrong load ID')
 
         api_logger.debug(f"Load found: {load.load_id}...")
 
+        # Still checked for signed links: the client of the load may have changed
         if load.client_num != auth_num:
             api_logger.warning(f"Authentication failed for load {load_id}... with auth {auth_num}...")
+            if token is None:
+                for limiter, keys in limited:
+                    await limiter.failed(keys)
             raise HTTPException(
                 401,
                 detail=_gen_response3(
@@ -271,6 +1017,7 @@ async def get_driver(load_id: str, auth_num: str, request: Request):
             )
 
         api_logger.info(f"Driver info successfully retrieved for load {load_id}...")
+        response.headers['Cache-Control'] = 'no-store'
         return _gen_response3(
             json_status='success',
             message=None,
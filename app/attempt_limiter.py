@@ -0,0 +1,177 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from datetime import timedelta
+from typing import Iterable, Optional
+from app.loads.loads import Loads
+from app.loads import queries
+from app.logger import api_logger
+
+
+class AttemptLimiter(ABC):
+    """
+    Progressive lockout of keys (client IPs, load IDs) after failed attempts.
+
+    Failures are counted over a sliding `window`. Once a key has
+    `max_failures` of them it is locked for `lockout` seconds after the
+    last one, and every further failure doubles that, up to the window,
+    unless the lockout is not `progressive`. Successful attempts cost
+    nothing and are never delayed.
+
+    Subclasses store the failures.
+    """
+
+    def __init__(
+            self,
+            max_failures: int = 5,
+            window: float = 3600.0,
+            lockout: float = 30.0,
+            progressive: bool = True
+    ):
+        """
+        Args:
+            max_failures: Failures within the window before a key is locked.
+            window: Seconds a failure is remembered.
+            lockout: Seconds the first lock lasts.
+            progressive: Double the lock with every further failure. Off for
+                keys anyone can fail against, such as public load IDs, so
+                nobody can lock them for long.
+        """
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self.progressive = progressive
+
+    def lock_duration(self, failures: int) -> float:
+        """
+        Get how long a key stays locked after its last failure.
+
+        Args:
+            failures: Failures of the key within the window.
+
+        Returns:
+            float: Seconds, 0 if the key is not locked.
+        """
+        if failures < self.max_failures:
+            return 0.0
+        if not self.progressive:
+            return min(self.lockout, self.window)
+        # Capped, the failures are forgotten after the window anyway
+        exponent = min(failures - self.max_failures, 32)
+        return min(self.lockout * 2 ** exponent, self.window)
+
+    @abstractmethod
+    async def retry_after(self, keys: Iterable[str]) -> float:
+        """
+        Get how long the most locked of the keys stays locked.
+
+        Args:
+            keys: Keys of the attempt.
+
+        Returns:
+            float: Seconds to wait before trying again, 0 if allowed now.
+        """
+
+    @abstractmethod
+    async def failed(self, keys: Iterable[str]) -> None:
+        """
+        Record a failed attempt against each of the keys.
+
+        Args:
+            keys: Keys of the attempt.
+        """
+
+
+class MemoryAttemptLimiter(AttemptLimiter):
+    """
+    Keeps failures in the memory of this process.
+
+    Enough for a single worker. At most `max_keys` keys are remembered,
+    the least recently failed ones are forgotten first.
+    """
+
+    def __init__(self, *args, max_keys: int = 100_000, **kwargs):
+        """
+        Args:
+            max_keys: Keys remembered at most.
+            *args, **kwargs: See `AttemptLimiter`.
+        """
+        super().__init__(*args, **kwargs)
+        self.max_keys = max_keys
+        self._failures: OrderedDict[str, deque[float]] = OrderedDict()
+
+    def _recent(self, key: str, now: float) -> Optional[deque[float]]:
+        """
+        Get the failures of a key within the window, forgetting older ones.
+        """
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    async def retry_after(self, keys: Iterable[str]) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        for key in keys:
+            failures = self._recent(key, now)
+            if failures:
+                wait = max(wait, failures[-1] + self.lock_duration(len(failures)) - now)
+        return wait
+
+    async def failed(self, keys: Iterable[str]) -> None:
+        now = time.monotonic()
+        for key in keys:
+            failures = self._recent(key, now)
+            if failures is None:
+                failures = self._failures[key] = deque()
+            failures.append(now)
+            self._failures.move_to_end(key)
+        while len(self._failures) > self.max_keys:
+            self._failures.popitem(last=False)
+
+
+class PostgresAttemptLimiter(AttemptLimiter):
+    """
+    Keeps failures in the database, shared by every worker.
+
+    Timestamps come from the database clock, so workers agree on them.
+    Expired failures are deleted at most once per window by each worker.
+    """
+
+    def __init__(self, loads: Loads, *args, **kwargs):
+        """
+        Args:
+            loads: Loads instance whose pool is used.
+            *args, **kwargs: See `AttemptLimiter`.
+        """
+        super().__init__(*args, **kwargs)
+        self.loads = loads
+        self._pruned_at: Optional[float] = None
+
+    async def retry_after(self, keys: Iterable[str]) -> float:
+        rows = await self.loads.execute_query(
+            queries.AUTH_FAILURES_RECENT,
+            {'keys': list(keys), 'window': timedelta(seconds=self.window)},
+            prepare=True
+        )
+        wait = 0.0
+        for failures, last_failed_at, now in rows:
+            locked_until = last_failed_at + timedelta(seconds=self.lock_duration(failures))
+            wait = max(wait, (locked_until - now).total_seconds())
+        return wait
+
+    async def failed(self, keys: Iterable[str]) -> None:
+        await self.loads.execute_query(queries.AUTH_FAILURE_INSERT, {'keys': list(keys)}, prepare=True)
+
+        if self._pruned_at is None or time.monotonic() - self._pruned_at >= self.window:
+            self._pruned_at = time.monotonic()
+            await self.loads.execute_query(
+                queries.AUTH_FAILURES_PRUNE,
+                {'window': timedelta(seconds=self.window)}
+            )
+            api_logger.debug("Expired authentication failures pruned")
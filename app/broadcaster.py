@@ -0,0 +1,242 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, NamedTuple, Optional
+from app.loads.loads import Loads
+from app.loads.listener import LoadsListener
+from app.loads import queries
+from app.logger import api_logger
+
+
+class StreamEvent(NamedTuple):
+    """
+    Event pushed to stream subscribers, encoded once for all of them.
+
+    Attributes:
+        name: 'snapshot', 'changes', 'heartbeat' or 'reset'.
+        data: JSON encoded payload.
+    """
+    name: str
+    data: str
+
+    def sse(self) -> str:
+        """
+        Frame the event for a Server-Sent Events stream.
+        """
+        return f'event: {self.name}\ndata: {self.data}\n\n'
+
+    def ws(self) -> str:
+        """
+        Frame the event as a WebSocket text message.
+        """
+        return f'{{"event":"{self.name}","data":{self.data}}}'
+
+
+HEARTBEAT_EVENT = StreamEvent('heartbeat', '{}')
+
+# Sent instead of the buffered events to a subscriber that fell behind.
+# The stream ends after it: the client reconnects and gets a new snapshot.
+RESET_EVENT = StreamEvent('reset', '{}')
+
+
+def _encode(content) -> str:
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'))
+
+
+class Subscription:
+    """
+    Bounded buffer of events for one stream subscriber.
+    """
+
+    def __init__(self, buffer_size: int):
+        """
+        Args:
+            buffer_size: Events kept for the subscriber before it is reset.
+        """
+        self.queue: asyncio.Queue[StreamEvent] = asyncio.Queue(maxsize=buffer_size)
+
+    async def events(self) -> AsyncIterator[StreamEvent]:
+        """
+        Yield events as they are pushed, until the subscriber is reset.
+        """
+        while True:
+            event = await self.queue.get()
+            yield event
+            if event is RESET_EVENT:
+                return
+
+
+class LoadsBroadcaster:
+    """
+    Pushes changes of active loads to stream subscribers of this process.
+
+    Keeps the public (`safe_dump`) view of active loads in memory. Every
+    change notification, whichever process or interface wrote the change,
+    makes it read the loads changed since its cursor with
+    `Loads.get_changes()`, once per burst of notifications, and push the
+    loads that actually differ to every subscriber. New subscribers get a
+    snapshot of the view first.
+
+    Pushing never waits for a subscriber: one whose buffer is full is
+    dropped and sent a reset event instead.
+    """
+
+    def __init__(
+            self,
+            loads: Loads,
+            heartbeat: float = 15.0,
+            buffer_size: int = 64,
+            retry_delay: float = 1.0
+    ):
+        """
+        Args:
+            loads: Loads instance to read changes with.
+            heartbeat: Seconds between heartbeat events.
+            buffer_size: Events buffered per subscriber.
+            retry_delay: Seconds before reading changes again after a failure.
+        """
+        self.loads = loads
+        self.heartbeat = heartbeat
+        self.buffer_size = buffer_size
+        self.retry_delay = retry_delay
+
+        self.cursor: Optional[datetime] = None
+        self.subscribers: set[Subscription] = set()
+        self.listener: Optional[LoadsListener] = None
+        # Public view of active loads by ID, in modification order
+        self._loads: dict[str, dict] = {}
+        self._snapshot: Optional[StreamEvent] = None
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """
+        Listen for changes, read the active loads and start pushing.
+        """
+        self.listener = LoadsListener(
+            self.loads.get_conn_url(),
+            queries.LOADS_CHANGED_CHANNEL,
+            on_notify=lambda _payload: self._wake.set(),
+            on_status=self._on_listener_status
+        )
+        # Listening first, so no change between the first read and LISTEN is missed
+        await self.listener.start(timeout=self.loads.pool_timeout)
+        await self._sync()
+        self._tasks = [
+            asyncio.create_task(self._run_sync()),
+            asyncio.create_task(self._run_heartbeat())
+        ]
+        api_logger.info(f"Loads broadcaster started with {len(self._loads)} active loads")
+
+    async def stop(self) -> None:
+        """
+        Stop pushing and listening. Subscribers are reset.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.listener is not None:
+            await self.listener.stop()
+        for subscription in list(self.subscribers):
+            self._drop(subscription)
+
+    def subscribe(self) -> Subscription:
+        """
+        Subscribe to changes, starting with a snapshot of the active loads.
+
+        Returns:
+            Subscription: Buffer the events are pushed to.
+        """
+        if self._snapshot is None:
+            self._snapshot = StreamEvent('snapshot', _encode({
+                'loads': list(self._loads.values()),
+                'cursor': self._encoded_cursor()
+            }))
+        subscription = Subscription(self.buffer_size)
+        subscription.queue.put_nowait(self._snapshot)
+        self.subscribers.add(subscription)
+        api_logger.debug(f"Stream subscribed, {len(self.subscribers)} subscribers")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Stop pushing events to a subscriber.
+
+        Args:
+            subscription: Subscription returned by `subscribe()`.
+        """
+        self.subscribers.discard(subscription)
+        api_logger.debug(f"Stream unsubscribed, {len(self.subscribers)} subscribers")
+
+    def push(self, event: StreamEvent) -> None:
+        """
+        Push an event to every subscriber without waiting for any.
+
+        Args:
+            event: Event to push.
+        """
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                api_logger.warning("Stream subscriber fell behind, resetting it")
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        """
+        Unsubscribe and replace whatever is buffered with a reset event.
+        """
+        self.subscribers.discard(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(RESET_EVENT)
+
+    def _on_listener_status(self, listening: bool) -> None:
+        # Changes made while not listening are read once listening again
+        if listening:
+            self._wake.set()
+
+    def _encoded_cursor(self) -> Optional[str]:
+        return None if self.cursor is None else self.loads.delta_cursor(self.cursor)
+
+    async def _sync(self) -> None:
+        """
+        Read the loads changed since the cursor and push what differs.
+        """
+        changed, removed, self.cursor = await self.loads.get_changes(since=self.cursor, public=True)
+
+        updated = []
+        for load in changed:
+            dump = load.safe_dump()
+            # Loads within the overlap of the cursor are read again unchanged
+            if self._loads.get(load.load_id) != dump:
+                self._loads.pop(load.load_id, None)
+                self._loads[load.load_id] = dump
+                updated.append(dump)
+        gone = [load_id for load_id in removed if self._loads.pop(load_id, None) is not None]
+
+        if updated or gone:
+            self._snapshot = None
+            self.push(StreamEvent('changes', _encode({
+                'loads': updated,
+                'removed': gone,
+                'cursor': self._encoded_cursor()
+            })))
+            api_logger.debug(f"Pushed {len(updated)} changed and {len(gone)} removed loads")
+
+    async def _run_sync(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self._sync()
+            except Exception as e:
+                api_logger.error(f"Error reading load changes: {e}, retrying in {self.retry_delay}s")
+                await asyncio.sleep(self.retry_delay)
+                self._wake.set()
+
+    async def _run_heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self.push(HEARTBEAT_EVENT)
@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import hmac
+import re
+import time
+from typing import Optional
+from urllib.parse import urlencode
+from app.loads.load import Load
+from app import settings
+
+
+def _signature(secret: str, load_id: str, client_num: str, expires: int) -> str:
+    message = f'driver|{load_id}|{client_num}|{expires}'.encode()
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def make_driver_token(
+        load_id: str,
+        client_num: str,
+        secret: str,
+        ttl: float,
+        now: Optional[float] = None
+) -> str:
+    """
+    Sign a load and client pair for `/s3/driver`.
+
+    Args:
+        load_id: Unique identifier of the load.
+        client_num: Phone number of the client of the load.
+        secret: Key the token is signed with.
+        ttl: Seconds the token stays valid.
+        now: Current UNIX time, the clock by default.
+
+    Returns:
+        str: URL-safe token, `{expires}.{signature}`.
+    """
+    expires = int((time.time() if now is None else now) + ttl)
+    return f'{expires}.{_signature(secret, load_id, client_num, expires)}'
+
+
+def verify_driver_token(
+        load_id: str,
+        client_num: str,
+        token: str,
+        secret: Optional[str],
+        now: Optional[float] = None
+) -> bool:
+    """
+    Check a token made by `make_driver_token()`, in constant time.
+
+    Args:
+        load_id: Load ID of the request.
+        client_num: Client phone number of the request.
+        token: Token of the request.
+        secret: Key tokens are signed with, None if links are disabled.
+        now: Current UNIX time, the clock by default.
+
+    Returns:
+        bool: True if the token signs this pair and has not expired.
+    """
+    if not secret:
+        return False
+    expires, _, signature = token.partition('.')
+    # ASCII digits only, of a sane length: int() refuses some other digits
+    # and very long numbers
+    if not re.fullmatch(r'[0-9]{1,12}', expires):
+        return False
+    expected = _signature(secret, load_id, client_num, int(expires))
+    if not hmac.compare_digest(expected.encode(), signature.encode()):
+        return False
+    return int(expires) > (time.time() if now is None else now)
+
+
+def driver_link(load: Load) -> Optional[str]:
+    """
+    Build a signed link to the driver details of a load, for its client.
+
+    Args:
+        load: The load.
+
+    Returns:
+        Optional[str]: The link, None unless `DRIVER_LINK_SECRET` and
+            `DRIVER_LINK_BASE` are set.
+    """
+    if not settings.DRIVER_LINK_SECRET or not settings.DRIVER_LINK_BASE:
+        return None
+    token = make_driver_token(
+        load.load_id,
+        load.client_num,
+        settings.DRIVER_LINK_SECRET,
+        settings.DRIVER_LINK_TTL
+    )
+    query = urlencode({'load_id': load.load_id, 'auth_num': load.client_num, 'token': token})
+    return f'{settings.DRIVER_LINK_BASE}?{query}'
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from psycopg import AsyncConnection
+from app.loads import queries
+from app.logger import api_logger
+
+
+class LeaderElection:
+    """
+    Elects one leader among the processes sharing a database.
+
+    The leader is the process holding a session advisory lock on a
+    dedicated connection, kept outside the pool like `LoadsListener`'s.
+    Postgres releases the lock as soon as that connection closes, whether
+    the leader stops, crashes or loses the network, and one of the
+    processes retrying every `retry_interval` takes over.
+    """
+
+    def __init__(
+            self,
+            conninfo: str,
+            key: int,
+            on_elected: Callable[[], Awaitable[None]],
+            retry_interval: float = 10.0,
+            heartbeat: float = 30.0
+    ):
+        """
+        Args:
+            conninfo: Connection string of the database. Must reach Postgres
+                directly or through a session pooler: advisory locks do not
+                survive transaction pooling.
+            key: Advisory lock key, the same in every process.
+            on_elected: Awaited once every time this process becomes the
+                leader. If it fails, leadership is given up and retried.
+            retry_interval: Seconds between attempts to take the lock.
+            heartbeat: Seconds between checks that the leader connection
+                is alive.
+        """
+        self.conninfo = conninfo
+        self.key = key
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.heartbeat = heartbeat
+
+        self.is_leader = False
+        # Set once the first attempt to take the lock is over, and the
+        # leader has run `on_elected`
+        self.decided = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, timeout: float) -> None:
+        """
+        Start running for leader in the background.
+
+        Args:
+            timeout: Seconds to wait for the first attempt, after which
+                the election goes on in the background.
+        """
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self.decided.wait(), timeout)
+        except asyncio.TimeoutError:
+            api_logger.warning("Leader election undecided yet, retrying in background")
+
+    async def stop(self) -> None:
+        """
+        Stop running, and give up leadership by closing the connection.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _try_lock(self, conn: AsyncConnection) -> bool:
+        cursor = await conn.execute(queries.TRY_ADVISORY_LOCK, (self.key, ))
+        return (await cursor.fetchone())[0]
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with await AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    while not await self._try_lock(conn):
+                        self.decided.set()
+                        await asyncio.sleep(self.retry_interval)
+
+                    self.is_leader = True
+                    api_logger.info(f"Elected leader (lock {self.key})")
+                    await self.on_elected()
+                    self.decided.set()
+                    while True:
+                        await asyncio.sleep(self.heartbeat)
+                        await conn.execute('select 1')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                api_logger.warning(f"Leader election failed: {e}, retrying in {self.retry_interval}s")
+            finally:
+                if self.is_leader:
+                    self.is_leader = False
+                    api_logger.info(f"Leadership given up (lock {self.key})")
+            await asyncio.sleep(self.retry_interval)
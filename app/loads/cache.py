@@ -0,0 +1,180 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+from app.loads.load import Load
+from app.logger import db_logger
+
+
+class ActiveLoadsCache:
+    """
+    In-process identity map of active loads, keyed by load ID.
+
+    The snapshot is trusted while it is tracked (a listener is receiving
+    change notifications), not invalidated and younger than `max_age`.
+    Otherwise the next read reloads it; concurrent reads share that single
+    reload. If the reload fails, or takes longer than `reload_timeout`, the
+    last good snapshot keeps being served until it is `stale_if_error`
+    seconds old; a slow reload goes on in the background meanwhile.
+
+    Loads handed out are copies, so callers may modify them freely.
+    """
+
+    def __init__(
+            self,
+            fetch: Callable[[], Awaitable[list[Load]]],
+            max_age: float = 60.0,
+            stale_if_error: float = 30.0,
+            reload_timeout: float = 1.0
+    ):
+        """
+        Args:
+            fetch: Coroutine function reading all active loads from the database.
+            max_age: Seconds after which the snapshot is reloaded even without
+                a change notification, in case one was lost.
+            stale_if_error: Seconds after the last successful reload during
+                which the snapshot is served when reloading fails.
+            reload_timeout: Seconds a read waits for a reload before the
+                snapshot is served, while it may be served stale.
+        """
+        self._fetch = fetch
+        self.max_age = max_age
+        self.stale_if_error = stale_if_error
+        self.reload_timeout = reload_timeout
+
+        self._loads: dict[str, Load] = {}
+        self._loaded_at: Optional[float] = None
+        self._valid = False
+        self._tracking = False
+        # Bumped on every change, a reload started before a change is not trusted
+        self._generation = 0
+        self._inflight: Optional[asyncio.Task] = None
+
+    @property
+    def fresh(self) -> bool:
+        """
+        Whether the snapshot can be served without reloading.
+        """
+        return (
+            self._valid and
+            self._tracking and
+            time.monotonic() - self._loaded_at < self.max_age
+        )
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        Number changing whenever active loads may have changed.
+
+        None while changes are not tracked and the version means nothing.
+        """
+        return self._generation if self._tracking else None
+
+    def set_tracking(self, tracking: bool) -> None:
+        """
+        Record whether change notifications are being received.
+
+        Either way the snapshot is invalidated: notifications may have been
+        missed while they were not received.
+
+        Args:
+            tracking: True once listening, False when the listener is down.
+        """
+        db_logger.info(f"Active loads cache tracking: {tracking}")
+        self._tracking = tracking
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Make the next read reload the snapshot.
+        """
+        self._valid = False
+        self._generation += 1
+
+    def put(self, load: Load) -> None:
+        """
+        Write a load through to the snapshot after it was saved.
+
+        Loads moved to history leave the snapshot.
+
+        Args:
+            load: The load as saved in the database.
+        """
+        self._generation += 1
+        if load.stage == 'history':
+            self._loads.pop(load.load_id, None)
+        else:
+            self._loads[load.load_id] = load.model_copy(deep=True)
+
+    def peek(self, load_id: str) -> Optional[Load]:
+        """
+        Get a copy of an active load without reloading.
+
+        Args:
+            load_id: Unique identifier of the load.
+
+        Returns:
+            Optional[Load]: The load, or None if the snapshot is not fresh or
+                does not have it.
+        """
+        if not self.fresh:
+            return None
+        load = self._loads.get(load_id)
+        return None if load is None else load.model_copy(deep=True)
+
+    async def get_all(self) -> list[Load]:
+        """
+        Get copies of all active loads, ordered by modification time.
+
+        Returns:
+            list[Load]: Active loads.
+
+        Raises:
+            Exception: Whatever the reload raised, once the snapshot is too
+                old to be served instead.
+        """
+        await self._ensure_loaded()
+        loads = sorted(self._loads.values(), key=lambda load: load.last_update)
+        return [load.model_copy(deep=True) for load in loads]
+
+    async def count(self) -> int:
+        """
+        Get the number of active loads.
+        """
+        await self._ensure_loaded()
+        return len(self._loads)
+
+    async def _ensure_loaded(self) -> None:
+        """
+        Reload the snapshot unless it is fresh, sharing an ongoing reload.
+        """
+        if self.fresh:
+            return
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._reload(self._generation))
+        servable = self._loaded_at is not None and time.monotonic() - self._loaded_at < self.stale_if_error
+        try:
+            # A cancelled reader must not cancel the reload others wait for
+            reload = asyncio.shield(self._inflight)
+            # A database that hangs must not hang reads that can be served stale
+            await (asyncio.wait_for(reload, self.reload_timeout) if servable else reload)
+        except Exception as e:
+            if not servable:
+                raise
+            db_logger.warning(f"Serving stale active loads, reload failed or still running: {e!r}")
+
+    async def _reload(self, generation: int) -> None:
+        """
+        Replace the snapshot with the loads read from the database.
+
+        Args:
+            generation: Generation the reload was requested at. The snapshot
+                stays invalid if anything changed since.
+        """
+        try:
+            loads = await self._fetch()
+        finally:
+            self._inflight = None
+        self._loads = {load.load_id: load for load in loads}
+        self._loaded_at = time.monotonic()
+        self._valid = generation == self._generation
+        db_logger.debug(f"Active loads cache reloaded: {len(loads)} loads (valid: {self._valid})")
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import math
+import secrets
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from app.logger import db_logger
+
+
+class BloomFilter:
+    """
+    Set of strings answering "definitely not present" or "maybe present".
+
+    Sized for `capacity` items at the given false positive rate. Items are
+    hashed with a key of its own, so IDs can not be crafted to collide.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Args:
+            capacity: Items the filter is sized for. More can be added, at
+                the cost of a higher false positive rate.
+            error_rate: False positive rate at capacity, e.g. 0.01.
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._key = secrets.token_bytes(16)
+
+    def _positions(self, item: str) -> list[int]:
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16, key=self._key).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        """
+        Add an item.
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class KnownLoadIds:
+    """
+    Bloom filter of every load ID in the database.
+
+    Lets lookups of IDs that definitely do not exist skip the database.
+    Like `ActiveLoadsCache`, the filter is only trusted while change
+    notifications are received and no insert was notified since it was
+    built: a load missing from the filter would be reported as not found.
+    Untrusted, every ID is looked up. Inserts notified by any process make
+    it rebuild in the background, a single rebuild at a time; loads added
+    by this process are added to it directly.
+    """
+
+    def __init__(
+            self,
+            fetch: Callable[[], AsyncIterator[list[str]]],
+            estimate: Callable[[], Awaitable[int]],
+            error_rate: float = 0.01,
+            rebuild_interval: float = 3600.0,
+            min_capacity: int = 1024
+    ):
+        """
+        Args:
+            fetch: Returns an async iterator over batches of all load IDs.
+            estimate: Coroutine function estimating the number of loads.
+            error_rate: False positive rate the filter is sized for.
+            rebuild_interval: Seconds between rebuilds without notifications,
+                which also resize the filter as loads accumulate.
+            min_capacity: Smallest capacity the filter is sized for.
+        """
+        self._fetch = fetch
+        self._estimate = estimate
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.min_capacity = min_capacity
+
+        self.filter: Optional[BloomFilter] = None
+        self._valid = False
+        self._tracking = False
+        # Bumped on every notified insert, a build started before one is not trusted
+        self._generation = 0
+        # IDs added by this process while a build is running, added to it after
+        self._added_while_building: Optional[list[str]] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._periodic: Optional[asyncio.Task] = None
+
+    @property
+    def fresh(self) -> bool:
+        """
+        Whether the filter has every load ID.
+        """
+        return self.filter is not None and self._valid and self._tracking
+
+    def might_exist(self, load_id: str) -> bool:
+        """
+        Check whether a load may exist.
+
+        Args:
+            load_id: Unique identifier of the load.
+
+        Returns:
+            bool: False only if the load definitely does not exist.
+        """
+        return not self.fresh or load_id in self.filter
+
+    def add(self, load_id: str) -> None:
+        """
+        Add the ID of a load this process has just inserted.
+
+        Args:
+            load_id: Unique identifier of the load.
+        """
+        if self._added_while_building is not None:
+            self._added_while_building.append(load_id)
+        if self.filter is not None:
+            self.filter.add(load_id)
+            if self.filter.count > self.filter.capacity:
+                self.rebuild()
+
+    def set_tracking(self, tracking: bool) -> None:
+        """
+        Record whether change notifications are being received.
+
+        Either way the filter is rebuilt: inserts may have been missed.
+
+        Args:
+            tracking: True once listening, False when the listener is down.
+        """
+        db_logger.info(f"Known load IDs tracking: {tracking}")
+        self._tracking = tracking
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """
+        Stop trusting the filter until it is rebuilt, and rebuild it.
+        """
+        self._valid = False
+        self._generation += 1
+        self.rebuild()
+
+    def rebuild(self) -> Optional[asyncio.Task]:
+        """
+        Rebuild the filter in the background unless it is being rebuilt.
+
+        Returns:
+            Optional[asyncio.Task]: The rebuild, None without an event loop.
+        """
+        if self._inflight is None:
+            try:
+                self._inflight = asyncio.get_running_loop().create_task(self._rebuild())
+            except RuntimeError:
+                return None
+        return self._inflight
+
+    async def start(self) -> None:
+        """
+        Build the filter and start rebuilding it periodically.
+        """
+        await self.rebuild()
+        self._periodic = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self) -> None:
+        """
+        Stop rebuilding.
+        """
+        for task in (self._periodic, self._inflight):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._periodic = self._inflight = None
+
+    async def _rebuild(self) -> None:
+        # Kept over every pass, a later one may not see them yet
+        self._added_while_building = []
+        try:
+            while True:
+                generation = self._generation
+                capacity = max(
+                    self.min_capacity,
+                    2 * await self._estimate(),
+                    2 * (self.filter.count if self.filter is not None else 0)
+                )
+                built = BloomFilter(capacity, self.error_rate)
+                async for batch in self._fetch():
+                    for load_id in batch:
+                        built.add(load_id)
+                for load_id in self._added_while_building:
+                    built.add(load_id)
+
+                self.filter = built
+                self._valid = generation == self._generation
+                db_logger.info(
+                    f"Known load IDs rebuilt: {built.count} IDs, {len(built._bits)} bytes "
+                    f"(valid: {self._valid})"
+                )
+                # Inserts notified while building may be missing, build again
+                if self._valid:
+                    return
+        except Exception as e:
+            db_logger.error(f"Error rebuilding known load IDs: {e}")
+        finally:
+            self._added_while_building = None
+            self._inflight = None
+
+    async def _rebuild_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.rebuild_interval)
+            task = self.rebuild()
+            if task is not None:
+                await asyncio.shield(task)
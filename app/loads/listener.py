@@ -0,0 +1,100 @@
+import asyncio
+from typing import Callable, Optional
+from psycopg import AsyncConnection, sql
+from app.logger import db_logger
+
+
+class LoadsListener:
+    """
+    LISTENs for change notifications on a dedicated connection.
+
+    The connection is kept outside the pool: it is idle most of the time
+    and must not be recycled. When it drops, the listener reports it and
+    reconnects with exponential backoff.
+    """
+
+    def __init__(
+            self,
+            conninfo: str,
+            channel: str,
+            on_notify: Callable[[str], None],
+            on_status: Callable[[bool], None],
+            heartbeat: float = 30.0,
+            reconnect_delay: float = 1.0,
+            max_reconnect_delay: float = 30.0
+    ):
+        """
+        Args:
+            conninfo: Connection string of the database.
+            channel: Notification channel to listen on.
+            on_notify: Called with the payload of every notification.
+            on_status: Called with True once listening, False when the
+                connection is lost.
+            heartbeat: Seconds without notifications after which the
+                connection is checked.
+            reconnect_delay: Seconds before the first reconnection attempt.
+            max_reconnect_delay: Upper bound of the backoff between attempts.
+        """
+        self.conninfo = conninfo
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_status = on_status
+        self.heartbeat = heartbeat
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.listening = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, timeout: float) -> None:
+        """
+        Start listening in the background.
+
+        Args:
+            timeout: Seconds to wait for the first connection. The listener
+                keeps trying in the background after that.
+        """
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self.listening.wait(), timeout)
+        except asyncio.TimeoutError:
+            db_logger.warning(f"Not listening on '{self.channel}' yet, retrying in background")
+
+    async def stop(self) -> None:
+        """
+        Stop listening and close the connection.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with await AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    await conn.execute(sql.SQL('listen {}').format(sql.Identifier(self.channel)))
+                    db_logger.info(f"Listening on '{self.channel}'")
+                    self.listening.set()
+                    self.on_status(True)
+                    delay = self.reconnect_delay
+                    while True:
+                        async for notify in conn.notifies(timeout=self.heartbeat):
+                            self.on_notify(notify.payload)
+                        # Quiet for a while, make sure the connection is alive
+                        await conn.execute('select 1')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                db_logger.warning(f"Listener on '{self.channel}' lost: {e}, reconnecting in {delay}s")
+            finally:
+                if self.listening.is_set():
+                    self.listening.clear()
+                    self.on_status(False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
@@ -9,7 +9,7 @@ from pydantic import (
     field_serializer,
     ConfigDict
 )
-from typing import Literal, Optional
+from typing import Literal, Optional, Any, TypeVar
 from app.logger import model_logger
 
 
@@ -23,6 +23,32 @@ class NoSuchLoadID(RuntimeError):
 
 ALLOWED_STAGES = Literal['start', 'engage', 'drive', 'clear', 'finish', 'history']
 
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
+
+def construct_trusted(model: type[ModelT], fields: dict[str, Any]) -> ModelT:
+    """
+    Build a model instance from already validated values without validation.
+
+    Equivalent to `model.model_construct(**fields)` when every field is given,
+    but skips its per-field default resolution, which makes it several times
+    cheaper. Meant for rows read back from the database.
+
+    Args:
+        model: Model class to instantiate.
+        fields: Value of every field of the model, by field name.
+
+    Returns:
+        ModelT: The model instance, owning `fields` as its data.
+    """
+    instance = model.__new__(model)
+    object.__setattr__(instance, '__dict__', fields)
+    object.__setattr__(instance, '__pydantic_fields_set__', set(fields))
+    object.__setattr__(instance, '__pydantic_extra__', None)
+    object.__setattr__(instance, '__pydantic_private__', None)
+    return instance
+
+
 class Stages(BaseModel):
     """
     Model representing the different stages/locations in a load's journey.
@@ -160,3 +186,63 @@ class Load(BaseModel):
             },
             by_alias=True
         )
+
+    def public(self) -> 'PublicLoad':
+        """
+        Get the public view of the load, without sensitive data.
+
+        Returns:
+            PublicLoad: The load without client and driver details.
+        """
+        return construct_trusted(PublicLoad, {
+            'load_type': self.load_type,
+            'stage': self.stage,
+            'stages': self.stages,
+            'load_id': self.load_id,
+            'last_update': self.last_update
+        })
+
+
+class PublicLoad(BaseModel):
+    """
+    Public view of a load, read without the client and driver tables.
+
+    Read-only model served by the public endpoints. It never holds
+    sensitive data, and dumps exactly like `Load.safe_dump()`.
+
+    Attributes:
+        load_type: Type of load ('external' or 'internal').
+        stage: Current stage of the load.
+        stages: All stage locations for the load journey.
+        load_id: Unique identifier for the load.
+        last_update: Timestamp of the last update.
+    """
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
+
+    load_type: Literal['external', 'internal'] = Field(alias='type')
+    stage: ALLOWED_STAGES
+    stages: Stages
+    load_id: str = Field(alias='id')
+    last_update: datetime
+
+    @field_serializer('last_update')
+    def format_time(self, last_update: datetime) -> str:
+        """
+        Format the last_update timestamp for display, like `Load`.
+
+        Args:
+            last_update: Datetime object to format.
+
+        Returns:
+            str: Formatted time string in HH:MM format.
+        """
+        return last_update.strftime('%H:%M')
+
+    def safe_dump(self) -> dict:
+        """
+        Generate the public dictionary representation.
+
+        Returns:
+            dict: Load data using field aliases.
+        """
+        return self.model_dump(by_alias=True)
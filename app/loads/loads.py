@@ -1,11 +1,128 @@
 
-from typing import Optional, Any
-from app.loads.load import Load, Stages
-from psycopg import AsyncConnection
-from psycopg.errors import DataError, IntegrityError
+import base64
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from contextvars import ContextVar
+from types import MappingProxyType
+from typing import Optional, Any, AsyncIterator, Mapping, Iterable, Sequence
+from pydantic import TypeAdapter, ValidationError
+from app.loads.load import Load, PublicLoad, Stages, ALLOWED_STAGES, construct_trusted
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.rows import RowMaker, AsyncRowFactory
+from psycopg.errors import DataError, IntegrityError, NotNullViolation
+from psycopg_pool import AsyncConnectionPool
 from app.loads import queries
+from app.loads.cache import ActiveLoadsCache
+from app.loads.known_ids import KnownLoadIds
+from app.loads.listener import LoadsListener
 from app.logger import db_logger
 
+
+LOAD_LIST_ADAPTER = TypeAdapter(list[Load])
+
+
+def load_row(cursor: AsyncCursor[Any]) -> RowMaker[Load]:
+    """
+    Row factory building `Load` objects from the loads CTE queries.
+
+    Rows come from the database, where they were validated on the way in,
+    so models are built with `construct_trusted()` and skip validation.
+    Columns are looked up by name once per result, not once per row.
+
+    Args:
+        cursor: Cursor that executed a query returning the
+            CTE_SELECT_ALL_LOADS columns.
+
+    Returns:
+        RowMaker[Load]: Function turning a row of values into a Load.
+    """
+    column = {description.name: index for index, description in enumerate(cursor.description)}
+    load_id = column['loads_id']
+    modified_at = column['modified_at']
+    load_type = column['load_type']
+    client_num = column['client_number']
+    driver_name = column['driver_name']
+    driver_num = column['driver_phone']
+    stage = column['current_status']
+    start = column['start_city']
+    engage = column['engage_city']
+    clear = column['clear_city']
+    finish = column['finish_city']
+
+    def make_load(values: Sequence[Any]) -> Load:
+        return construct_trusted(Load, {
+            'load_type': values[load_type],
+            'stage': values[stage],
+            'stages': construct_trusted(Stages, {
+                'start': values[start],
+                'engage': values[engage],
+                'drive': None,
+                'clear': values[clear],
+                'finish': values[finish]
+            }),
+            'client_num': values[client_num],
+            'driver_name': values[driver_name],
+            'driver_num': values[driver_num],
+            'load_id': values[load_id],
+            'last_update': values[modified_at].replace(tzinfo=None)
+        })
+
+    return make_load
+
+
+def public_load_row(cursor: AsyncCursor[Any]) -> RowMaker[PublicLoad]:
+    """
+    Row factory building `PublicLoad` objects from the public CTE queries.
+
+    Args:
+        cursor: Cursor that executed a query returning the
+            CTE_SELECT_PUBLIC_LOADS columns.
+
+    Returns:
+        RowMaker[PublicLoad]: Function turning a row of values into a PublicLoad.
+    """
+    column = {description.name: index for index, description in enumerate(cursor.description)}
+    load_id = column['loads_id']
+    modified_at = column['modified_at']
+    load_type = column['load_type']
+    stage = column['current_status']
+    start = column['start_city']
+    engage = column['engage_city']
+    clear = column['clear_city']
+    finish = column['finish_city']
+
+    def make_public_load(values: Sequence[Any]) -> PublicLoad:
+        return construct_trusted(PublicLoad, {
+            'load_type': values[load_type],
+            'stage': values[stage],
+            'stages': construct_trusted(Stages, {
+                'start': values[start],
+                'engage': values[engage],
+                'drive': None,
+                'clear': values[clear],
+                'finish': values[finish]
+            }),
+            'load_id': values[load_id],
+            'last_update': values[modified_at].replace(tzinfo=None)
+        })
+
+    return make_public_load
+
+
+def _projection(public: bool) -> tuple[str, AsyncRowFactory]:
+    """
+    Get the loads CTE and row factory of a read.
+
+    Args:
+        public: Read the public projection instead of full loads.
+
+    Returns:
+        tuple[str, AsyncRowFactory]: CTE query and the matching row factory.
+    """
+    if public:
+        return queries.CTE_SELECT_PUBLIC_LOADS, public_load_row
+    return queries.CTE_SELECT_ALL_LOADS, load_row
+
 # TMP_PG_RUN_CMD = 'docker run --name dev-postgres -e POSTGRES_DB=pstgrs -e POSTGRES_USER=olvr -e POSTGRES_PASSWORD=msVWXP -p 127.0.0.1:5432:5432 -d postgres'
 # TODO REMOVE TMP_PG_RUN_CMD AND SET UP DOCKER COMPOSE
 # TODO DO NOT FORGET TO ADD PERSISTENT VOLUME
@@ -18,7 +135,9 @@ class Loads:
 
     Provides async database operations for managing transportation loads,
     including CRUD operations, stage management, and data persistence.
-    Implements async context manager for proper connection handling.
+    Implements async context manager that opens and closes a bounded
+    connection pool. Every query checks a connection out of the pool,
+    unless the caller has already bound one with `connection()`.
     """
 
     def __init__(
@@ -28,7 +147,22 @@ class Loads:
             db_name: str,
             db_user: str,
             db_password: str,
-            autocommit=False
+            autocommit=False,
+            pool_min_size: int = 1,
+            pool_max_size: int = 10,
+            pool_timeout: float = 30.0,
+            pool_max_idle: float = 600.0,
+            pool_max_lifetime: float = 3600.0,
+            prepare_threshold: Optional[int] = 5,
+            cache_actives: bool = False,
+            cache_max_age: float = 60.0,
+            cache_stale_if_error: float = 30.0,
+            cache_reload_timeout: float = 1.0,
+            delta_overlap: float = 5.0,
+            filter_ids: bool = False,
+            ids_error_rate: float = 0.01,
+            ids_rebuild_interval: float = 3600.0,
+            read_only: bool = False
     ):
         """
         Initialize the Loads manager with database connection parameters.
@@ -39,6 +173,39 @@ class Loads:
             db_name: Database name.
             db_user: Database username.
             db_password: Database password.
+            autocommit: Open pooled connections in autocommit mode.
+            pool_min_size: Connections the pool keeps open at all times.
+            pool_max_size: Upper bound of simultaneously open connections.
+            pool_timeout: Seconds to wait for a free connection before
+                `PoolTimeout` is raised.
+            pool_max_idle: Seconds an unused connection above `pool_min_size`
+                is kept before it is closed.
+            pool_max_lifetime: Seconds after which a connection is recycled.
+            prepare_threshold: Executions of a query after which psycopg
+                prepares it server-side on that connection. Hot queries are
+                prepared on first use. None disables prepared statements,
+                which is required behind a transaction-mode PgBouncer.
+            cache_actives: Keep active loads in memory, invalidated by
+                change notifications from every process using the database.
+            cache_max_age: Seconds after which cached active loads are
+                reloaded even without a change notification.
+            cache_stale_if_error: Seconds after the last successful reload
+                during which cached active loads are served if the
+                database fails.
+            cache_reload_timeout: Seconds a read waits for a reload of the
+                cached active loads before they are served stale.
+            delta_overlap: Seconds before a delta cursor that are read
+                again, for changes committed after a later one was read.
+            filter_ids: Keep a Bloom filter of load IDs, so lookups of
+                IDs that do not exist skip the database. Rebuilt on inserts
+                notified by every process using the database.
+            ids_error_rate: False positive rate of the load ID filter.
+            ids_rebuild_interval: Seconds between rebuilds of the load ID
+                filter without notifications.
+            read_only: Open pooled connections with read-only transactions,
+                so every write fails, and leave the schema alone. The
+                database may be a hot standby, which can not LISTEN: the
+                cache and the filter are then left disabled.
         """
         # Assemble connection string from individual parameters
         self.db_host = db_host
@@ -47,8 +214,37 @@ class Loads:
         self.db_user = db_user
         self.db_password = db_password
         self.autocommit = autocommit
-
-        self.connection: Optional[AsyncConnection] = None
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+        self.pool_timeout = pool_timeout
+        self.pool_max_idle = pool_max_idle
+        self.pool_max_lifetime = pool_max_lifetime
+        self.prepare_threshold = prepare_threshold
+        self.cache_actives = cache_actives
+        self.cache_max_age = cache_max_age
+        self.cache_stale_if_error = cache_stale_if_error
+        self.cache_reload_timeout = cache_reload_timeout
+        self.delta_overlap = timedelta(seconds=delta_overlap)
+        self.filter_ids = filter_ids
+        self.ids_error_rate = ids_error_rate
+        self.ids_rebuild_interval = ids_rebuild_interval
+        self.read_only = read_only
+        # Set on entry when read_only and connected to a hot standby
+        self.standby = False
+
+        self.pool: Optional[AsyncConnectionPool] = None
+        self.cache: Optional[ActiveLoadsCache] = None
+        self.known_ids: Optional[KnownLoadIds] = None
+        self.listener: Optional[LoadsListener] = None
+        # Connection checked out by `connection()` for the current task, if any
+        self._bound_connection: ContextVar[Optional[AsyncConnection]] = ContextVar(
+            f'loads_bound_connection_{id(self)}',
+            default=None
+        )
+        # Lookup tables by name, loaded by `refresh_lookups()`. Replaced as a
+        # whole on refresh, never mutated.
+        self.status_ids: Mapping[str, int] = MappingProxyType({})
+        self.type_ids: Mapping[str, int] = MappingProxyType({})
 
     def get_conn_url(self, hide_password=False):
         pwd = '****' if hide_password else self.db_password
@@ -58,23 +254,50 @@ class Loads:
         """
         Async context manager entry.
 
-        Establishes database connection and initializes tables if needed.
+        Opens the connection pool, initializes tables if needed (unless
+        `read_only`) and loads the lookup tables. With `cache_actives` or `filter_ids`, starts
+        listening for changes and warms the cache and the filter up, unless
+        the database is a hot standby.
 
         Returns:
             self: The Loads instance for use in async context.
         """
         db_logger.info(f"Connecting to database: {self.get_conn_url(hide_password=True)}")
         try:
-            self.connection = await AsyncConnection.connect(
+            connection_kwargs = {
+                'autocommit': self.autocommit,
+                'prepare_threshold': self.prepare_threshold
+            }
+            if self.read_only:
+                connection_kwargs['options'] = '-c default_transaction_read_only=on'
+            self.pool = AsyncConnectionPool(
                 self.get_conn_url(),
-                autocommit=self.autocommit
+                kwargs=connection_kwargs,
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                timeout=self.pool_timeout,
+                max_idle=self.pool_max_idle,
+                max_lifetime=self.pool_max_lifetime,
+                open=False
+            )
+            await self.pool.open(wait=True, timeout=self.pool_timeout)
+            db_logger.info(
+                f"Database pool opened (min={self.pool_min_size}, max={self.pool_max_size})"
             )
-            db_logger.info("Database connection established successfully")
 
-            db_logger.debug("Initializing database schema if needed")
-            await self.initialise_db_if_empty()
+            if not self.read_only:
+                db_logger.debug("Initializing database schema if needed")
+                await self.initialise_db_if_empty()
+            await self.refresh_lookups()
+            if self.read_only:
+                [[self.standby]] = await self.execute_query(queries.IN_RECOVERY)
             db_logger.info("Database initialization completed")
 
+            if (self.cache_actives or self.filter_ids) and self.standby:
+                db_logger.warning("A hot standby can not LISTEN, active loads cache and load ID filter disabled")
+            elif self.cache_actives or self.filter_ids:
+                await self._start_listening()
+
             return self
         except Exception as e:
             db_logger.error(f"Failed to connect to database: {e}")
@@ -84,22 +307,134 @@ class Loads:
         """
         Async context manager exit.
 
-        Closes the database connection and cleans up resources.
+        Stops the change listener and the load ID filter, closes the
+        connection pool and cleans up resources.
 
         Args:
             exc_type: Exception type if an exception occurred.
             exc_val: Exception value if an exception occurred.
             exc_tb: Exception traceback if an exception occurred.
         """
-        if self.connection:
-            db_logger.info("Closing database connection")
+        if self.listener:
+            await self.listener.stop()
+        if self.known_ids:
+            await self.known_ids.stop()
+        if self.pool:
+            db_logger.info("Closing database pool")
             try:
-                await self.connection.close()
-                db_logger.info("Database connection closed successfully")
+                await self.pool.close()
+                db_logger.info("Database pool closed successfully")
             except Exception as e:
-                db_logger.error(f"Error closing database connection: {e}")
+                db_logger.error(f"Error closing database pool: {e}")
                 raise
 
+    async def _start_listening(self) -> None:
+        """
+        Listen for load changes, then fill the active loads cache and the
+        load ID filter, whichever is enabled.
+        """
+        if self.cache_actives:
+            self.cache = ActiveLoadsCache(
+                self._fetch_actives,
+                max_age=self.cache_max_age,
+                stale_if_error=self.cache_stale_if_error,
+                reload_timeout=self.cache_reload_timeout
+            )
+        if self.filter_ids:
+            self.known_ids = KnownLoadIds(
+                self._iter_load_ids,
+                self._estimate_loads,
+                error_rate=self.ids_error_rate,
+                rebuild_interval=self.ids_rebuild_interval
+            )
+        self.listener = LoadsListener(
+            self.get_conn_url(),
+            queries.LOADS_CHANGED_CHANNEL,
+            on_notify=self._on_loads_changed,
+            on_status=self._on_listener_status
+        )
+        # Listening first, so no change between warm-up and LISTEN is missed
+        await self.listener.start(timeout=self.pool_timeout)
+        if self.cache is not None:
+            db_logger.info(f"Active loads cache warmed up: {await self.cache.count()} loads")
+        if self.known_ids is not None:
+            await self.known_ids.start()
+
+    def _on_loads_changed(self, operation: str) -> None:
+        """
+        Handle a change notification, its payload is the SQL operation.
+        """
+        if self.cache is not None:
+            self.cache.invalidate()
+        if self.known_ids is not None and operation == 'INSERT':
+            self.known_ids.invalidate()
+
+    def _on_listener_status(self, listening: bool) -> None:
+        if self.cache is not None:
+            self.cache.set_tracking(listening)
+        if self.known_ids is not None:
+            self.known_ids.set_tracking(listening)
+
+    async def _iter_load_ids(self) -> AsyncIterator[list[str]]:
+        """
+        Stream every load ID in batches, for the load ID filter.
+
+        Runs in a task of its own, see `_fetch_actives()`.
+        """
+        self._bound_connection.set(None)
+        async with self.connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor(name='loads_ids') as cursor:
+                    await cursor.execute(queries.SELECT_LOAD_IDS)
+                    while rows := await cursor.fetchmany(10000):
+                        yield [row[0] for row in rows]
+
+    async def _estimate_loads(self) -> int:
+        """
+        Estimate the number of loads from the planner statistics.
+        """
+        self._bound_connection.set(None)
+        rows = await self.execute_query(queries.ESTIMATE_LOADS, prepare=True)
+        return max(rows[0][0], 0)
+
+    async def _fetch_actives(self) -> list[Load]:
+        """
+        Read active loads for the cache.
+
+        Runs in a task of its own, which inherits the connection bound by
+        the reader that started it. That reader may be gone before the
+        task ends, so the task checks out its own connection.
+        """
+        self._bound_connection.set(None)
+        return await self._get_loads_by_fq(filter_query=queries.FILTER_ACTIVE_LOADS)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        """
+        Check out a pooled connection for the duration of the block.
+
+        Every query this instance runs inside the block (including ones from
+        tasks spawned in it) reuses the checked out connection. Nested calls
+        reuse the outer connection. Used per HTTP request and per bot handler.
+
+        Yields:
+            AsyncConnection: The connection bound to the current context.
+
+        Raises:
+            PoolTimeout: If no connection becomes free within `pool_timeout`.
+        """
+        bound = self._bound_connection.get()
+        if bound is not None:
+            yield bound
+            return
+
+        async with self.pool.connection() as conn:
+            token = self._bound_connection.set(conn)
+            try:
+                yield conn
+            finally:
+                self._bound_connection.reset(token)
+
     async def get_load_by_id(self, load_id: str) -> Optional[Load]:
         """
         Retrieve a specific load by its unique identifier.
@@ -119,15 +454,25 @@ class Loads:
             db_logger.error(f"Invalid load_id type: {type(load_id).__name__}, expected str")
             raise TypeError('load_id must be a string')
 
+        if self.cache is not None and (load := self.cache.peek(load_id)) is not None:
+            db_logger.debug(f"Load found in cache: {load_id}...")
+            return load
+
+        if self.known_ids is not None and not self.known_ids.might_exist(load_id):
+            db_logger.debug(f"Load not found by the ID filter: {load_id}...")
+            return None
+
         try:
             rows = await self.execute_query(
                 queries.CTE_SELECT_ALL_LOADS +
                 queries.FILTER_SINGLE_LOAD,
-                load_id
+                load_id,
+                prepare=True,
+                row_factory=load_row
             )
 
             if rows is not None and len(rows) > 0:
-                load = self._convert_cte_row_to_load(rows[0])
+                load = rows[0]
                 db_logger.debug(f"Load found: {load_id}... (stage: {load.stage})")
                 return load
             else:
@@ -137,6 +482,80 @@ class Loads:
             db_logger.error(f"Error retrieving load by ID {load_id}...: {e}")
             raise
 
+    async def refresh_lookups(self) -> None:
+        """
+        Load the `load_statuses` and `load_types` tables into memory.
+
+        Called on startup. Call it again after these tables are changed;
+        an unknown stage or type also triggers a refresh before failing.
+
+        Raises:
+            RuntimeError: If 'history' does not have the id the schema
+                relies on.
+        """
+        statuses = await self.execute_query(queries.SELECT_LOAD_STATUSES, prepare=False)
+        types = await self.execute_query(queries.SELECT_LOAD_TYPES, prepare=False)
+        status_ids = dict(statuses)
+        if status_ids.get('history') != queries.HISTORY_STATUS_ID:
+            raise RuntimeError(
+                f"Status 'history' must have id {queries.HISTORY_STATUS_ID}, got {status_ids.get('history')}"
+            )
+        self.status_ids = MappingProxyType(status_ids)
+        self.type_ids = MappingProxyType(dict(types))
+        db_logger.info(f"Lookups loaded: {len(status_ids)} statuses, {len(types)} types")
+
+    async def _lookup_id(self, table: str, name: str) -> int:
+        """
+        Resolve a stage or load type name to its id.
+
+        Args:
+            table: Either 'status_ids' or 'type_ids'.
+            name: Stage or load type.
+
+        Returns:
+            int: Id of the row with that name.
+
+        Raises:
+            ValueError: If there is no such name even after a refresh.
+        """
+        lookup_id = getattr(self, table).get(name)
+        if lookup_id is None:
+            db_logger.warning(f"Unknown lookup {name!r}, refreshing lookups")
+            await self.refresh_lookups()
+            lookup_id = getattr(self, table).get(name)
+        if lookup_id is None:
+            raise ValueError(f'Unknown stage or load type {name!r}')
+        return lookup_id
+
+    async def status_id(self, stage: str) -> int:
+        """
+        Resolve a stage to its `load_statuses` id.
+
+        Raises:
+            ValueError: If the stage is unknown.
+        """
+        return await self._lookup_id('status_ids', stage)
+
+    async def type_id(self, load_type: str) -> int:
+        """
+        Resolve a load type to its `load_types` id.
+
+        Raises:
+            ValueError: If the load type is unknown.
+        """
+        return await self._lookup_id('type_ids', load_type)
+
+    def actives_version(self) -> Optional[int]:
+        """
+        Get a version of the active loads.
+
+        Returns:
+            Optional[int]: Number changing whenever active loads may have
+                changed, or None when changes are not tracked (no cache or
+                the change listener is down).
+        """
+        return None if self.cache is None else self.cache.version
+
     async def get_qty_of_actives(self):
         """
         Get the count of active loads.
@@ -144,7 +563,13 @@ class Loads:
         Returns:
             int: Number of loads not in 'history' stage.
         """
-        rows = await self.execute_query(query=queries.COUNT_ACTIVE_LOADS)
+        if self.cache is not None:
+            return await self.cache.count()
+        active_ids = [
+            status_id for status_id in self.status_ids.values()
+            if status_id != queries.HISTORY_STATUS_ID
+        ]
+        rows = await self.execute_query(queries.COUNT_ACTIVE_LOADS, {'status_ids': active_ids}, prepare=True)
         return rows[0][0]
 
     async def get_qty_of_historicals(self):
@@ -154,64 +579,456 @@ class Loads:
         Returns:
             int: Number of loads in 'history' stage.
         """
-        rows = await self.execute_query(query=queries.COUNT_HISTORICAL_LOADS)
+        rows = await self.execute_query(
+            queries.COUNT_HISTORICAL_LOADS,
+            {'status_id': queries.HISTORY_STATUS_ID},
+            prepare=True
+        )
         return rows[0][0]
 
-    async def get_actives(self) -> list[Load]:
+    async def get_actives(self, public: bool = False) -> list[Load] | list[PublicLoad]:
         """
         Retrieve all active loads from the database.
 
+        Args:
+            public: Read the public projection, which does not touch the
+                clients and drivers tables. With the cache enabled, the
+                cached loads are projected instead.
+
         Returns:
-            list[Load]: List of loads not in 'history' stage.
+            list[Load] | list[PublicLoad]: List of loads not in 'history'
+                stage, public views if `public` is set.
         """
-        return await self._get_loads_by_fq(filter_query=queries.FILTER_ACTIVE_LOADS)
+        if self.cache is not None:
+            actives = await self.cache.get_all()
+            return [load.public() for load in actives] if public else actives
+        cte, row_factory = _projection(public)
+        return await self.execute_query(cte + queries.FILTER_ACTIVE_LOADS, prepare=True, row_factory=row_factory)
 
-    async def get_historicals(self) -> list[Load]:
+    async def get_historicals(
+            self,
+            after: Optional[str] = None,
+            limit: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            public: bool = False
+    ) -> list[Load] | list[PublicLoad]:
         """
-        Retrieve all historical loads from the database.
+        Retrieve a page of historical loads, newest first.
+
+        Pages are keyset-paginated on (modified_at, load_id): pass the
+        `history_cursor()` of the last load of a page as `after` to get
+        the next one.
+
+        Args:
+            after: Cursor of the last load of the previous page.
+            limit: Maximum number of loads to return, None for all.
+            since: Only loads modified at or after this moment.
+            until: Only loads modified before this moment.
+            public: Read the public projection instead of full loads.
 
         Returns:
-            list[Load]: List of loads in 'history' stage.
+            list[Load] | list[PublicLoad]: List of loads in 'history' stage.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        cte, row_factory = _projection(public)
+        query = cte + queries.FILTER_HISTORY_PAGE
+        params: dict[str, Any] = {'limit': limit}
+        if since is not None:
+            query += queries.HISTORY_PAGE_SINCE
+            params['since'] = since
+        if until is not None:
+            query += queries.HISTORY_PAGE_UNTIL
+            params['until'] = until
+        if after is not None:
+            query += queries.HISTORY_PAGE_AFTER
+            params['after_at'], params['after_id'] = self._parse_history_cursor(after)
+        query += queries.HISTORY_PAGE_ORDER
+
+        return await self.execute_query(query, params, prepare=True, row_factory=row_factory)
+
+    @staticmethod
+    def history_cursor(load: Load | PublicLoad) -> str:
         """
-        return await self._get_loads_by_fq(filter_query=queries.FILTER_HISTORY_LOADS)
+        Build an opaque pagination cursor pointing at the given load.
+
+        Args:
+            load: Load fetched from the database.
+
+        Returns:
+            str: URL-safe cursor to pass as `after` to `get_historicals()`.
+        """
+        raw = f'{load.last_update.isoformat()}|{load.load_id}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _parse_history_cursor(cursor: str) -> tuple[datetime, str]:
+        """
+        Decode a cursor built by `history_cursor()`.
+
+        Args:
+            cursor: Opaque cursor string.
+
+        Returns:
+            tuple[datetime, str]: Modification time and ID of the load.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            modified_at, sep, load_id = raw.partition('|')
+            if sep != '|' or len(load_id) != 32:
+                raise ValueError
+            return datetime.fromisoformat(modified_at), load_id
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError('Malformed history cursor') from e
+
+    async def get_changes(
+            self,
+            since: Optional[datetime] = None,
+            stage: Optional[str] = None,
+            load_type: Optional[str] = None,
+            public: bool = False
+    ) -> tuple[list[Load] | list[PublicLoad], list[str], datetime]:
+        """
+        Retrieve active loads changed since a moment, and the IDs of loads
+        that left the active set since then.
+
+        Changes are tracked by `changed_at`, the database time of the last
+        write, never by the `last_update` the load was written with. Loads
+        changed up to `delta_overlap` before `since` are read again:
+        `changed_at` is set before the write commits, so a change may
+        become visible after a later one. Clients apply the result
+        idempotently, upserting loads and then dropping removed IDs.
+
+        Args:
+            since: Moment the client is up to date with, usually the high
+                water mark of its previous call. None for all active loads.
+            stage: Only loads in this active stage; loads moved to any other
+                stage are reported as removed.
+            load_type: Only loads of this type.
+            public: Read the public projection instead of full loads.
+
+        Returns:
+            tuple[list[Load] | list[PublicLoad], list[str], datetime]:
+                Changed loads ordered by change time, IDs of removed
+                loads (empty when `since` is None) and the high water mark
+                to pass as `since` next time.
+
+        Raises:
+            ValueError: If the stage or load type is unknown, or the stage is
+                'history'.
+        """
+        if stage == 'history':
+            raise ValueError("Stage 'history' is not active")
+
+        cte, row_factory = _projection(public)
+        changed_query = cte + queries.DELTA_CHANGED
+        removed_query = queries.DELTA_REMOVED
+        params: dict[str, Any] = {}
+        if since is not None:
+            changed_query += queries.DELTA_SINCE
+            params['since'] = since - self.delta_overlap
+        if stage is not None:
+            changed_query += queries.DELTA_BY_STAGE
+            params['status_id'] = await self.status_id(stage)
+        if load_type is not None:
+            changed_query += queries.DELTA_BY_TYPE
+            removed_query += queries.DELTA_BY_TYPE
+            params['load_type_id'] = await self.type_id(load_type)
+        if stage is not None:
+            removed_query += queries.DELTA_MOVED_AWAY
+            if load_type is not None:
+                removed_query += queries.DELTA_BY_TYPE
+        changed_query += queries.DELTA_ORDER
+
+        async with self.connection():
+            high_water = await self.get_high_water()
+            changed = await self.execute_query(changed_query, params, prepare=True, row_factory=row_factory)
+            removed = []
+            if since is not None:
+                removed = [row[0] for row in await self.execute_query(removed_query, params, prepare=True)]
+
+        db_logger.debug(f"Changes since {since}: {len(changed)} changed, {len(removed)} removed")
+        return changed, removed, high_water
+
+    async def get_high_water(self) -> datetime:
+        """
+        Get the latest change time of any load, as assigned by the database.
+
+        Read it before the loads it is handed out with: everything changed
+        up to it is then included, or arrives within `delta_overlap`.
+
+        Returns:
+            datetime: High water mark of `changed_at`, the epoch if there
+                are no loads.
+        """
+        rows = await self.execute_query(queries.DELTA_HIGH_WATER, prepare=True)
+        return rows[0][0]
+
+    @staticmethod
+    def delta_cursor(high_water: datetime) -> str:
+        """
+        Build an opaque delta cursor from a high water mark.
+
+        Args:
+            high_water: High water mark returned by `get_changes()`.
+
+        Returns:
+            str: URL-safe cursor, decoded back by `parse_delta_cursor()`.
+        """
+        return base64.urlsafe_b64encode(high_water.isoformat().encode()).decode().rstrip('=')
+
+    @staticmethod
+    def parse_delta_cursor(cursor: str) -> datetime:
+        """
+        Decode a cursor built by `delta_cursor()`.
+
+        Args:
+            cursor: Opaque cursor string.
+
+        Returns:
+            datetime: The high water mark it was built from.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            return datetime.fromisoformat(base64.urlsafe_b64decode(padded.encode()).decode())
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ValueError('Malformed delta cursor') from e
+
+    async def iter_export(
+            self,
+            stage: Optional[str] = None,
+            load_type: Optional[str] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 1000
+    ) -> AsyncIterator[list[tuple[Any, ...]]]:
+        """
+        Stream non-sensitive load rows in batches from a server-side cursor.
+
+        Rows follow `queries.EXPORT_LOADS_COLUMNS`, ordered by modification
+        time. Only one batch is held in memory at a time; the connection
+        stays checked out until the iteration ends or is abandoned.
+
+        Args:
+            stage: Only loads in this stage.
+            load_type: Only loads of this type.
+            since: Only loads modified at or after this moment.
+            until: Only loads modified before this moment.
+            batch_size: Rows fetched from the server per round trip.
+
+        Yields:
+            list[tuple[Any, ...]]: Next batch of rows, never empty.
+
+        Raises:
+            ValueError: If the stage or load type is unknown.
+        """
+        query = queries.EXPORT_LOADS
+        params: dict[str, Any] = {}
+        if stage is not None:
+            query += queries.EXPORT_BY_STAGE
+            params['status_id'] = await self.status_id(stage)
+        if load_type is not None:
+            query += queries.EXPORT_BY_TYPE
+            params['load_type_id'] = await self.type_id(load_type)
+        if since is not None:
+            query += queries.EXPORT_SINCE
+            params['since'] = since
+        if until is not None:
+            query += queries.EXPORT_UNTIL
+            params['until'] = until
+        query += queries.EXPORT_ORDER
+
+        db_logger.info(f"Starting export (stage={stage}, type={load_type}, since={since}, until={until})")
+        exported = 0
+        async with self.connection() as conn:
+            # Named cursors live inside a transaction, close it when done
+            async with conn.transaction():
+                async with conn.cursor(name='loads_export') as cursor:
+                    await cursor.execute(query, params)
+                    while rows := await cursor.fetchmany(batch_size):
+                        exported += len(rows)
+                        yield rows
+        db_logger.info(f"Export finished: {exported} rows")
 
     async def add(self, load: Load) -> str:
         """
         Add a new load to the database.
 
-        Creates client and driver records if they don't exist,
-        then creates the load record.
+        Resolves or creates the client and driver records and creates the
+        load record in a single statement and a single commit. A client or
+        driver committed concurrently is invisible to that statement, which
+        is then run once more.
 
         Args:
             load: Load object to add to the database.
 
         Returns:
             str: The load ID of the created load.
+
+        Raises:
+            ValueError: If the load already exists or violates constraints.
         """
         db_logger.info(f"Adding new load: {load.load_id}... (type: {load.load_type}, stage: {load.stage})")
 
         try:
-            db_logger.debug(f"Inserting client: {load.client_num[:6]}...")
-            client_id = await self._insert_client(load.client_num)
-
-            db_logger.debug(f"Inserting driver: {load.driver_name}")
-            driver_id = await self._insert_driver(
-                name=load.driver_name,
-                phone_num=load.driver_num
-            )
-
-            db_logger.debug(f"Inserting load: {load.load_id}...")
-            load_id = await self._insert_load(
-                load=load,
-                client_id=client_id,
-                driver_id=driver_id
-            )
-
+            params = {
+                'load_id': load.load_id,
+                'modified_at': load.last_update,
+                'load_type': load.load_type,
+                'load_type_id': await self.type_id(load.load_type),
+                'status_id': await self.status_id(load.stage),
+                'client_num': load.client_num,
+                'driver_name': load.driver_name,
+                'driver_num': load.driver_num,
+                'stage': load.stage,
+                'start_city': load.stages.start,
+                'engage_city': load.stages.engage,
+                'clear_city': load.stages.clear,
+                'finish_city': load.stages.finish
+            }
+            try:
+                rows = await self.execute_query(queries.INSERT_LOAD, params, prepare=True)
+            except NotNullViolation as e:
+                if e.diag.column_name not in ('client_id', 'driver_id'):
+                    raise
+                db_logger.info(f"{e.diag.column_name} of load {load.load_id}... inserted concurrently, retrying")
+                rows = await self.execute_query(queries.INSERT_LOAD, params, prepare=True)
+            load_id = rows[0][0]
             db_logger.info(f"Load successfully added: {load_id}...")
+            if self.cache is not None:
+                self.cache.put(load)
+            if self.known_ids is not None:
+                self.known_ids.add(load_id)
             return load_id
-        except Exception as e:
+        except (DataError, IntegrityError, IndexError) as e:
             db_logger.error(f"Error adding load {load.load_id}...: {e}")
-            raise
+            raise ValueError from e
+
+    async def add_many(self, loads: Iterable[Any]) -> list[dict[str, Any]]:
+        """
+        Add a batch of loads in a single transaction.
+
+        The batch is validated in one pass, staged with COPY into a
+        temporary table and inserted with set-based statements, so the
+        number of round trips does not depend on the size of the batch.
+        Rows failing validation or already existing are reported and
+        skipped, the rest is inserted. Inserted loads are dated by the
+        database clock, whatever `last_update` they carry.
+
+        Args:
+            loads: Load objects or mappings in the `Load` input format.
+
+        Returns:
+            list[dict[str, Any]]: One entry per submitted row, in order, with
+                its `index`, `id` (None if the row is not a valid load),
+                `status` ('created' or 'error') and `error` message.
+
+        Raises:
+            ValueError: If the batch violates database constraints.
+        """
+        items = list(loads)
+        db_logger.info(f"Adding a batch of {len(items)} loads")
+        report = [
+            {'index': index, 'id': None, 'status': 'error', 'error': None}
+            for index in range(len(items))
+        ]
+
+        staged = []
+        seen = set()
+        for index, load in self._validate_batch(items, report):
+            entry = report[index]
+            entry['id'] = load.load_id
+            # Checks the database would otherwise fail the whole batch on
+            if len(load.load_id) != 32:
+                entry['error'] = 'Load ID must be 32 characters long'
+            elif len(load.client_num) != 12 or len(load.driver_num) != 12:
+                entry['error'] = 'Phone numbers must have 12 digits'
+            elif load.stage not in self.status_ids or load.load_type not in self.type_ids:
+                entry['error'] = 'Unknown stage or load type'
+            elif load.load_id in seen:
+                entry['error'] = 'Duplicate load ID in batch'
+            else:
+                seen.add(load.load_id)
+                staged.append((index, load))
+
+        inserted = set()
+        if staged:
+            try:
+                async with self.connection() as conn:
+                    async with conn.transaction():
+                        async with conn.cursor() as cursor:
+                            await cursor.execute(queries.BULK_CREATE_STAGING, prepare=False)
+                            async with cursor.copy(queries.BULK_COPY_STAGING) as copy:
+                                for index, load in staged:
+                                    await copy.write_row((
+                                        index,
+                                        load.load_id,
+                                        self.type_ids[load.load_type],
+                                        load.client_num,
+                                        load.driver_name,
+                                        load.driver_num,
+                                        self.status_ids[load.stage],
+                                        load.stages.start,
+                                        load.stages.engage,
+                                        load.stages.clear,
+                                        load.stages.finish
+                                    ))
+                            await cursor.execute(queries.BULK_INSERT_CLIENTS, prepare=False)
+                            await cursor.execute(queries.BULK_INSERT_DRIVERS, prepare=False)
+                            await cursor.execute(queries.BULK_INSERT_LOADS, prepare=False)
+                            inserted = {row[0] for row in await cursor.fetchall()}
+            except (DataError, IntegrityError) as e:
+                db_logger.error(f"Error adding a batch of loads: {e}")
+                raise ValueError from e
+
+        if inserted and self.cache is not None:
+            self.cache.invalidate()
+        if self.known_ids is not None:
+            for load_id in inserted:
+                self.known_ids.add(load_id)
+        for index, load in staged:
+            if load.load_id in inserted:
+                report[index]['status'] = 'created'
+            else:
+                report[index]['error'] = 'Load already exists'
+
+        db_logger.info(f"Batch added: {len(inserted)} of {len(items)} loads created")
+        return report
+
+    @staticmethod
+    def _validate_batch(items: list[Any], report: list[dict[str, Any]]) -> list[tuple[int, Load]]:
+        """
+        Validate raw batch items, recording validation errors in the report.
+
+        Args:
+            items: Submitted batch items.
+            report: Per-row report to record errors in.
+
+        Returns:
+            list[tuple[int, Load]]: Position and model of every valid item.
+        """
+        try:
+            return list(enumerate(LOAD_LIST_ADAPTER.validate_python(items)))
+        except ValidationError as e:
+            failed = set()
+            for error in e.errors(include_url=False):
+                index, *field = error['loc']
+                if index not in failed:
+                    failed.add(index)
+                    location = '.'.join(str(part) for part in field)
+                    report[index]['error'] = f"{location}: {error['msg']}" if location else error['msg']
+
+        valid = [index for index in range(len(items)) if index not in failed]
+        return list(zip(valid, LOAD_LIST_ADAPTER.validate_python([items[index] for index in valid])))
 
     async def change_stage(self, load: Load, new_stage) -> Load:
         """
@@ -236,6 +1053,98 @@ class Loads:
             db_logger.error(f"Error changing stage for load {load.load_id}...: {e}")
             raise
 
+    async def transition(self, load_id: str, new_stage: ALLOWED_STAGES) -> Optional[Load]:
+        """
+        Move a load to a new stage in a single statement.
+
+        Updates the stage and timestamp and returns the fully joined load
+        in the same round trip, so there is no read-modify-write window.
+
+        Args:
+            load_id: Unique identifier for the load.
+            new_stage: New stage to set for the load.
+
+        Returns:
+            Optional[Load]: The updated load, or None if no such load exists.
+
+        Raises:
+            ValueError: If the stage is unknown.
+        """
+        db_logger.info(f"Transitioning load: {load_id}... to '{new_stage}'")
+
+        try:
+            rows = await self.execute_query(
+                queries.TRANSITION_LOAD,
+                {
+                    'modified_at': datetime.now(),
+                    'status_id': await self.status_id(new_stage),
+                    'load_id': load_id
+                },
+                prepare=True,
+                row_factory=load_row
+            )
+        except (DataError, IntegrityError) as e:
+            db_logger.error(f"Error transitioning load {load_id}...: {e}")
+            raise ValueError(f'Cannot move load to stage {new_stage!r}') from e
+
+        if not rows:
+            db_logger.warning(f"Load to transition not found: {load_id}...")
+            return None
+
+        db_logger.info(f"Load stage successfully updated: {load_id}...")
+        if self.cache is not None:
+            self.cache.put(rows[0])
+        return rows[0]
+
+    async def transition_many(
+            self,
+            load_ids: Iterable[str],
+            new_stage: ALLOWED_STAGES,
+            from_stage: Optional[ALLOWED_STAGES] = None
+    ) -> list[Load]:
+        """
+        Move many loads to a new stage in a single statement.
+
+        Args:
+            load_ids: Unique identifiers of the loads.
+            new_stage: New stage to set for the loads.
+            from_stage: Only move loads that are still in this stage, so
+                loads moved by someone else in the meantime are left alone.
+
+        Returns:
+            list[Load]: The loads actually moved. Unknown ids and loads not
+                in `from_stage` are skipped.
+
+        Raises:
+            ValueError: If the stage is unknown.
+        """
+        load_ids = list(load_ids)
+        if not load_ids:
+            return []
+        db_logger.info(f"Transitioning {len(load_ids)} loads to '{new_stage}' (from '{from_stage}')")
+
+        try:
+            rows = await self.execute_query(
+                queries.TRANSITION_LOADS,
+                {
+                    'modified_at': datetime.now(),
+                    'status_id': await self.status_id(new_stage),
+                    'from_status_id': None if from_stage is None else await self.status_id(from_stage),
+                    'load_ids': load_ids
+                },
+                prepare=True,
+                row_factory=load_row
+            )
+        except (DataError, IntegrityError) as e:
+            db_logger.error(f"Error transitioning {len(load_ids)} loads: {e}")
+            raise ValueError(f'Cannot move loads to stage {new_stage!r}') from e
+
+        db_logger.info(f"Transitioned {len(rows)} of {len(load_ids)} loads to '{new_stage}'")
+        if self.cache is not None:
+            for load in rows:
+                self.cache.put(load)
+        return rows
+
     async def update(self, load: Load) -> str:
         """
         Update an existing load in the database.
@@ -246,8 +1155,10 @@ class Loads:
         Returns:
             str: The load ID of the updated load.
         """
-
-        return await self._update_load(load)
+        load_id = await self._update_load(load)
+        if self.cache is not None:
+            self.cache.put(load)
+        return load_id
 
     async def _get_loads_by_fq(self, filter_query: str) -> list[Load]:
         """
@@ -259,13 +1170,11 @@ class Loads:
         Returns:
             list[Load]: List of loads matching the filter criteria.
         """
-        rows = await self.execute_query(query=queries.CTE_SELECT_ALL_LOADS + filter_query)
-        loads = []
-        for row in rows:
-            loads.append(
-                self._convert_cte_row_to_load(row)
-            )
-        return loads
+        return await self.execute_query(
+            query=queries.CTE_SELECT_ALL_LOADS + filter_query,
+            prepare=True,
+            row_factory=load_row
+        )
 
     async def _insert_client(self, phone_number: str) -> int:
         """
@@ -281,7 +1190,10 @@ class Loads:
             ValueError: If database operation fails.
         """
         try:
-            rows = await self.execute_query(queries.INSERT_CLIENT, phone_number)
+            rows = await self.execute_query(queries.INSERT_CLIENT, {'phone_num': phone_number}, prepare=True)
+            if not rows:
+                # Inserted concurrently, after this statement took its snapshot
+                rows = await self.execute_query(queries.INSERT_CLIENT, {'phone_num': phone_number}, prepare=True)
             return rows[0][0]
         except (DataError, IntegrityError, IndexError) as e:
             raise ValueError from e
@@ -301,40 +1213,10 @@ class Loads:
             ValueError: If database operation fails.
         """
         try:
-            rows = await self.execute_query(queries.INSERT_DRIVER, name, phone_num)
-            return rows[0][0]
-        except (DataError, IntegrityError, IndexError) as e:
-            raise ValueError from e
-
-    async def _insert_load(self, load: Load, client_id, driver_id) -> str:
-        """
-        Insert a new load record into the database.
-
-        Args:
-            load: Load object to insert.
-            client_id: ID of the associated client.
-            driver_id: ID of the associated driver.
-
-        Returns:
-            str: The load ID of the inserted load.
-
-        Raises:
-            ValueError: If database operation fails.
-        """
-        try:
-            rows = await self.execute_query(
-                queries.INSERT_LOAD,
-                load.load_id,
-                load.last_update,
-                load.load_type,
-                client_id,
-                driver_id,
-                load.stage,
-                load.stages.start,
-                load.stages.engage,
-                load.stages.clear,
-                load.stages.finish
-            )
+            rows = await self.execute_query(queries.INSERT_DRIVER, {'name_surname': name, 'phone_num': phone_num}, prepare=True)
+            if not rows:
+                # Inserted concurrently, after this statement took its snapshot
+                rows = await self.execute_query(queries.INSERT_DRIVER, {'name_surname': name, 'phone_num': phone_num}, prepare=True)
             return rows[0][0]
         except (DataError, IntegrityError, IndexError) as e:
             raise ValueError from e
@@ -356,62 +1238,51 @@ class Loads:
             rows = await self.execute_query(
                 queries.UPDATE_LOAD,
                 load.last_update,
-                load.stage,
-                load.load_id
+                await self.status_id(load.stage),
+                load.load_id,
+                prepare=True
             )
             return rows[0][0]
         except (DataError, IntegrityError, IndexError) as e:
             raise ValueError('Given load is not present in the database. '
                              'Try first add it') from e
 
-    @staticmethod
-    def _convert_cte_row_to_load(row) -> Load:
-        """
-        Convert a database row from the loads CTE query to a Load object.
-
-        Args:
-            row: Database row with load data from the CTE query.
-
-        Returns:
-            Load: Load object created from the database row.
-        """
-        return Load(
-            type=row[3],
-            stage=row[7],
-            stages=Stages(
-                start=row[8],
-                engage=row[9],
-                clear=row[10],
-                finish=row[11]
-            ),
-            client_num=row[4],
-            driver_name=row[5],
-            driver_num=row[6],
-            id=row[0],
-            last_update=row[2].replace(tzinfo=None)
-        )
-
     async def initialise_db_if_empty(self):
         """
         Initialize database tables if they don't exist.
 
         Creates the necessary database schema for clients, drivers, and loads.
         """
-        await self.execute_query(queries.INITIALIZE_DB)
+        # Multi-statement scripts can not be prepared whatever the threshold is
+        await self.execute_query(queries.INITIALIZE_DB, prepare=False)
 
-    async def execute_query(self, query: str, *params) -> list[tuple[Any, ...]]:
+    async def execute_query(
+            self,
+            query: str,
+            *params,
+            prepare: Optional[bool] = None,
+            row_factory: Optional[AsyncRowFactory[Any]] = None
+    ) -> list[Any]:
         """
         Execute a database query with parameters.
 
-        Handles connection management, commits successful queries,
+        Runs on the connection bound by `connection()` or checks one out
+        of the pool for this query only. Commits successful queries
         and rolls back on errors.
 
         Args:
             query: SQL query string to execute.
-            *params: Query parameters to bind.
+            *params: Query parameters to bind. A single mapping binds
+                named `%(name)s` parameters instead.
+            prepare: True to prepare the query on its first execution on
+                a connection, False to never prepare it, None to leave it
+                to `prepare_threshold`. Ignored when prepared statements
+                are disabled.
+            row_factory: psycopg row factory for the results, tuples by default.
 
         Returns:
-            list[tuple[Any, ...]]: Query results as list of tuples.
+            list[Any]: Query results as list of rows, tuples unless
+                `row_factory` is given.
 
         Raises:
             Exception: Re-raises any database exceptions after rollback.
@@ -420,21 +1291,26 @@ class Loads:
         query_preview = query[:100] + "..." if len(query) > 100 else query
         db_logger.debug(f"Executing query: {query_preview} with {len(params)} parameters")
 
-        try:
-            async with self.connection.cursor() as cursor:
-                await cursor.execute(query, params)
-                rows = []
-                if cursor.description:
-                    rows = await cursor.fetchall()
-                    db_logger.debug(f"Query returned {len(rows)} rows")
-                else:
-                    db_logger.debug("Query executed (no return data)")
-
-                await self.connection.commit()
-                return rows
-        except Exception as e:
-            db_logger.error(f"Database query failed: {e}")
-            db_logger.debug(f"Failed query: {query_preview}")
-            await self.connection.rollback()
-            raise e
+        async with self.connection() as conn:
+            try:
+                async with conn.cursor(row_factory=row_factory or conn.row_factory) as cursor:
+                    if len(params) == 1 and isinstance(params[0], Mapping):
+                        params = params[0]
+                    if self.prepare_threshold is None:
+                        prepare = False
+                    await cursor.execute(query, params, prepare=prepare)
+                    rows = []
+                    if cursor.description:
+                        rows = await cursor.fetchall()
+                        db_logger.debug(f"Query returned {len(rows)} rows")
+                    else:
+                        db_logger.debug("Query executed (no return data)")
+
+                    await conn.commit()
+                    return rows
+            except Exception as e:
+                db_logger.error(f"Database query failed: {e}")
+                db_logger.debug(f"Failed query: {query_preview}")
+                await conn.rollback()
+                raise e
 
@@ -1,8 +1,23 @@
 
 
-INITIALIZE_DB = """
+# Id of the 'history' status. The seed below pins it and the partial
+# indexes and the active/history filters are written against it.
+HISTORY_STATUS_ID = 6
+
+# Notified after every statement changing loads, see the trigger below
+LOADS_CHANGED_CHANNEL = 'loads_changed'
+
+# Transaction advisory lock serializing INITIALIZE_DB between processes
+# starting at once. The key spells 'SCHEMA'.
+SCHEMA_LOCK_KEY = 0x534348454D41
+
+INITIALIZE_DB = f"""
     begin;
 
+    -- Concurrent DDL on the same objects fails (duplicate pg_class rows,
+    -- "tuple concurrently updated"), processes starting at once take turns
+    select pg_advisory_xact_lock({SCHEMA_LOCK_KEY});
+
     create table if not exists clients(
         clients_id serial primary key,
         phone_num varchar(12) not null unique,
@@ -33,6 +48,7 @@ INITIALIZE_DB = """
         loads_id char(32) primary key,
         created_at timestamptz not null default now(),
         modified_at timestamptz not null, -- This field is filling up from the Pydantic Load model
+        changed_at timestamptz not null default now(), -- Set by the database on every write, see below
         load_type_id int4 not null references load_types(load_types_id),
         client_id int4 not null references clients(clients_id),
         driver_id int4 not null references drivers(drivers_id),
@@ -42,30 +58,168 @@ INITIALIZE_DB = """
         clear_city text,
         finish_city text not null
     );
+    -- Added after the table, for databases created before it
+    alter table loads add column if not exists changed_at timestamptz not null default now();
 
-    insert into load_statuses (status) 
-    values 
-        ('start'),
-        ('engage'), 
-        ('drive'),
-        ('clear'),
-        ('finish'), 
-        ('history')
-    on conflict (status) do nothing;
+    -- Ids are fixed: the partial indexes below rely on 'history' being 6
+    insert into load_statuses (load_status_id, status)
+    values
+        (1, 'start'),
+        (2, 'engage'),
+        (3, 'drive'),
+        (4, 'clear'),
+        (5, 'finish'),
+        (6, 'history')
+    on conflict do nothing;
+    -- Explicit ids leave the sequence behind, a status added later would collide
+    select setval('load_statuses_load_status_id_seq', (select max(load_status_id) from load_statuses));
 
     insert into load_types (load_type)
     values ('external'), ('internal')
     on conflict (load_type) do nothing;
 
+    -- Foreign keys
+    create index if not exists loads_client_id_idx on loads (client_id);
+    create index if not exists loads_driver_id_idx on loads (driver_id);
+
+    -- Reads of a stage ordered by modification time
+    create index if not exists loads_status_modified_at_idx
+        on loads (current_status_id, modified_at);
+
+    -- Keyset pages of history
+    create index if not exists loads_history_keyset_idx
+        on loads (modified_at, loads_id)
+        where current_status_id = 6;
+
+    -- Active view: only non-history rows, covering everything but the names.
+    -- Replaces loads_active_modified_at_idx, which does not cover changed_at.
+    drop index if exists loads_active_modified_at_idx;
+    create index if not exists loads_active_covering_idx
+        on loads (modified_at)
+        include (
+            loads_id,
+            changed_at,
+            load_type_id,
+            client_id,
+            driver_id,
+            current_status_id,
+            start_city,
+            engage_city,
+            clear_city,
+            finish_city
+        )
+        where current_status_id <> 6;
+
+    -- Delta sync: loads changed, or moved to history, since a cursor
+    create index if not exists loads_active_changed_at_idx
+        on loads (changed_at)
+        where current_status_id <> 6;
+    create index if not exists loads_history_changed_at_idx
+        on loads (changed_at)
+        where current_status_id = 6;
+
+    -- Failed driver lookups for the attempt limiter. Unlogged: losing them
+    -- on a crash only lifts lockouts early.
+    create unlogged table if not exists auth_failures(
+        key text not null,
+        failed_at timestamptz not null default now()
+    );
+    create index if not exists auth_failures_key_failed_at_idx
+        on auth_failures (key, failed_at);
+    create index if not exists auth_failures_failed_at_idx
+        on auth_failures (failed_at);
+
+    -- Telegram update IDs already received, see PostgresUpdateDeduplicator
+    create table if not exists tg_updates(
+        update_id bigint primary key,
+        received_at timestamptz not null default now()
+    );
+    create index if not exists tg_updates_received_at_idx
+        on tg_updates (received_at);
+
+    -- Delta cursors compare against changed_at, never against modified_at:
+    -- that one is supplied by the application and may run ahead of the clock.
+    create or replace function loads_set_changed_at() returns trigger
+    language plpgsql as $$
+    begin
+        new.changed_at := now();
+        return new;
+    end;
+    $$;
+
+    do $$
+    begin
+        if not exists (select 1 from pg_trigger where tgname = 'loads_changed_at') then
+            create trigger loads_changed_at
+                before insert or update on loads
+                for each row execute function loads_set_changed_at();
+        end if;
+    end;
+    $$;
+
+    -- Lets processes caching loads know they changed. Statement level, so a
+    -- bulk write sends a single notification.
+    create or replace function loads_notify_changed() returns trigger
+    language plpgsql as $$
+    begin
+        perform pg_notify('loads_changed', tg_op);
+        return null;
+    end;
+    $$;
+
+    do $$
+    begin
+        if not exists (select 1 from pg_trigger where tgname = 'loads_changed_notify') then
+            create trigger loads_changed_notify
+                after insert or update or delete or truncate on loads
+                for each statement execute function loads_notify_changed();
+        end if;
+    end;
+    $$;
+
     commit;
 """
 
+# Session advisory lock held by the worker owning the Telegram webhook in
+# clustered mode, see LeaderElection. The key spells 'LOADS'.
+WEBHOOK_LEADER_LOCK_KEY = 0x4C4F414453
+
+TRY_ADVISORY_LOCK = """
+    select pg_try_advisory_lock(%s)
+"""
+
+# True on a hot standby, which refuses LISTEN and never sees a NOTIFY
+IN_RECOVERY = """
+    select pg_is_in_recovery()
+"""
+
+# Small lookup tables, cached by Loads and resolved to ids before writes
+SELECT_LOAD_STATUSES = """
+    select status, load_status_id from load_statuses
+"""
+
+SELECT_LOAD_TYPES = """
+    select load_type, load_types_id from load_types
+"""
+
+# Load ID filter: every ID (index only scan of the primary key) and the
+# planner's estimate of the row count, to size the filter
+SELECT_LOAD_IDS = """
+    select loads_id from loads
+"""
+
+ESTIMATE_LOADS = """
+    select reltuples::bigint from pg_class where oid = 'loads'::regclass
+"""
+
 DROP_ALL_TABLES = """
     DROP TABLE IF EXISTS loads;
     DROP TABLE IF EXISTS load_statuses;
     DROP TABLE IF EXISTS load_types;
     DROP TABLE IF EXISTS clients;
     DROP TABLE IF EXISTS drivers;
+    DROP TABLE IF EXISTS auth_failures;
+    DROP TABLE IF EXISTS tg_updates;
 """
 
 ADD_FAKE_DATA = """
@@ -107,6 +261,7 @@ CTE_SELECT_ALL_LOADS = """
         l.loads_id,
         l.created_at,
         l.modified_at,
+        l.changed_at,
         lt.load_type,
         c.phone_num as client_number,
         d.name_surname as driver_name,
@@ -115,7 +270,9 @@ CTE_SELECT_ALL_LOADS = """
         l.start_city,
         l.engage_city,
         l.clear_city,
-        l.finish_city
+        l.finish_city,
+        l.current_status_id,
+        l.load_type_id
     from loads l
     join clients c
         on l.client_id = c.clients_id
@@ -125,18 +282,113 @@ CTE_SELECT_ALL_LOADS = """
         on l.current_status_id = ls.load_status_id
     join load_types lt
 		on l.load_type_id = lt.load_types_id
-    order by modified_at
+)
+"""
+
+# Public projection for the public endpoints: the same CTE without the
+# clients and drivers joins, so they never read a phone number or a name.
+# Named like the one above, the filters below apply to either. Active
+# loads are read with an index only scan of loads_active_covering_idx.
+CTE_SELECT_PUBLIC_LOADS = """
+    with all_loads as (
+    select
+        l.loads_id,
+        l.modified_at,
+        l.changed_at,
+        lt.load_type,
+        ls.status as current_status,
+        l.start_city,
+        l.engage_city,
+        l.clear_city,
+        l.finish_city,
+        l.current_status_id,
+        l.load_type_id
+    from loads l
+    join load_statuses ls
+        on l.current_status_id = ls.load_status_id
+    join load_types lt
+        on l.load_type_id = lt.load_types_id
 )
 """
 
 FILTER_ACTIVE_LOADS = """
     select * from all_loads
-    where current_status != 'history'
+    where current_status_id <> 6 -- 'history'
+    order by modified_at
 """
 
-FILTER_HISTORY_LOADS = """
+# Keyset pagination over history, newest first. Conditions are appended
+# only when given, then the page is closed with HISTORY_PAGE_ORDER.
+FILTER_HISTORY_PAGE = """
     select * from all_loads
-    where current_status = 'history'
+    where current_status_id = 6 -- 'history'
+"""
+
+HISTORY_PAGE_SINCE = """
+        and modified_at >= %(since)s
+"""
+
+HISTORY_PAGE_UNTIL = """
+        and modified_at < %(until)s
+"""
+
+HISTORY_PAGE_AFTER = """
+        and (modified_at, loads_id) < (%(after_at)s, %(after_id)s)
+"""
+
+HISTORY_PAGE_ORDER = """
+    order by modified_at desc, loads_id desc
+    limit %(limit)s
+"""
+
+# Delta sync of active loads. The cursor handed to clients is the high
+# water mark of changed_at, read before the changes so that nothing
+# committed in between is skipped. Both arms use the partial indexes.
+DELTA_HIGH_WATER = """
+    select coalesce(
+        greatest(
+            (select max(changed_at) from loads where current_status_id <> 6),
+            (select max(changed_at) from loads where current_status_id = 6)
+        ),
+        'epoch'::timestamptz
+    )
+"""
+
+DELTA_CHANGED = """
+    select * from all_loads
+    where current_status_id <> 6 -- 'history'
+"""
+
+DELTA_SINCE = """
+        and changed_at >= %(since)s
+"""
+
+DELTA_BY_STAGE = """
+        and current_status_id = %(status_id)s
+"""
+
+DELTA_BY_TYPE = """
+        and load_type_id = %(load_type_id)s
+"""
+
+DELTA_ORDER = """
+    order by changed_at, loads_id
+"""
+
+# Loads that left the active set since the cursor: moved to history and,
+# when a stage is filtered on, moved to any other stage
+DELTA_REMOVED = """
+    select loads_id from loads
+    where current_status_id = 6 -- 'history'
+        and changed_at >= %(since)s
+"""
+
+DELTA_MOVED_AWAY = """
+    union all
+    select loads_id from loads
+    where current_status_id <> 6 -- 'history'
+        and current_status_id <> %(status_id)s
+        and changed_at >= %(since)s
 """
 
 FILTER_SINGLE_LOAD = """
@@ -144,27 +396,247 @@ FILTER_SINGLE_LOAD = """
     where loads_id = %s
 """
 
+# Export of non-sensitive load columns for BI, streamed through a
+# server-side cursor. Conditions are appended only when given.
+EXPORT_LOADS_COLUMNS = (
+    'id',
+    'created_at',
+    'modified_at',
+    'type',
+    'stage',
+    'start',
+    'engage',
+    'clear',
+    'finish'
+)
+
+EXPORT_LOADS = """
+    select
+        l.loads_id,
+        l.created_at,
+        l.modified_at,
+        lt.load_type,
+        ls.status,
+        l.start_city,
+        l.engage_city,
+        l.clear_city,
+        l.finish_city
+    from loads l
+    join load_statuses ls
+        on l.current_status_id = ls.load_status_id
+    join load_types lt
+        on l.load_type_id = lt.load_types_id
+    where true
+"""
+
+EXPORT_BY_STAGE = """
+        and l.current_status_id = %(status_id)s
+"""
+
+EXPORT_BY_TYPE = """
+        and l.load_type_id = %(load_type_id)s
+"""
+
+EXPORT_SINCE = """
+        and l.modified_at >= %(since)s
+"""
+
+EXPORT_UNTIL = """
+        and l.modified_at < %(until)s
+"""
+
+EXPORT_ORDER = """
+    order by l.modified_at, l.loads_id
+"""
+
+# Attempt limiter of /s3/driver, see PostgresAttemptLimiter
+AUTH_FAILURES_RECENT = """
+    select count(*), max(failed_at), now()
+    from auth_failures
+    where key = any(%(keys)s::text[])
+        and failed_at > now() - %(window)s::interval
+    group by key
+"""
+
+AUTH_FAILURE_INSERT = """
+    insert into auth_failures (key)
+    select unnest(%(keys)s::text[])
+"""
+
+AUTH_FAILURES_PRUNE = """
+    delete from auth_failures
+    where failed_at <= now() - %(window)s::interval
+"""
+
+# Webhook update deduplication, see PostgresUpdateDeduplicator. Returns a
+# row if the update is new, or was last received before the TTL: Telegram
+# may start update IDs over after a week without updates.
+TG_UPDATE_INSERT = """
+    insert into tg_updates (update_id)
+    values (%(update_id)s)
+    on conflict (update_id) do update
+        set received_at = now()
+        where tg_updates.received_at <= now() - %(ttl)s::interval
+    returning update_id
+"""
+
+TG_UPDATES_PRUNE = """
+    delete from tg_updates
+    where received_at <= now() - %(ttl)s::interval
+"""
+
 INSERT_CLIENT = """
-    insert into clients (phone_num)
-    values (%s)
-    on conflict (phone_num) 
-    do update
-    set phone_num = excluded.phone_num
-    returning clients_id;
+    with inserted as (
+        insert into clients (phone_num)
+        values (%(phone_num)s)
+        on conflict (phone_num) do nothing
+        returning clients_id
+    )
+    select clients_id from inserted
+    union all
+    select clients_id from clients where phone_num = %(phone_num)s
+    limit 1;
 """
 
 INSERT_DRIVER = """
-    insert into drivers (name_surname, phone_num)
-    values (%s, %s)
-    on conflict (name_surname, phone_num)
-    do update
-    set 
-        name_surname = excluded.name_surname,
-        phone_num = excluded.phone_num
-    returning drivers_id
+    with inserted as (
+        insert into drivers (name_surname, phone_num)
+        values (%(name_surname)s, %(phone_num)s)
+        on conflict (name_surname, phone_num) do nothing
+        returning drivers_id
+    )
+    select drivers_id from inserted
+    union all
+    select drivers_id from drivers
+    where name_surname = %(name_surname)s and phone_num = %(phone_num)s
+    limit 1;
 """
 
 INSERT_LOAD = """
+    -- Resolves or creates the client and the driver, inserts the load and
+    -- returns it in the CTE_SELECT_ALL_LOADS column order. Existing clients
+    -- and drivers are only read, never rewritten.
+    with inserted_client as (
+        insert into clients (phone_num)
+        values (%(client_num)s)
+        on conflict (phone_num) do nothing
+        returning clients_id
+    ),
+    client as (
+        select clients_id from inserted_client
+        union all
+        select clients_id from clients where phone_num = %(client_num)s
+        limit 1
+    ),
+    inserted_driver as (
+        insert into drivers (name_surname, phone_num)
+        values (%(driver_name)s, %(driver_num)s)
+        on conflict (name_surname, phone_num) do nothing
+        returning drivers_id
+    ),
+    driver as (
+        select drivers_id from inserted_driver
+        union all
+        select drivers_id from drivers
+        where name_surname = %(driver_name)s and phone_num = %(driver_num)s
+        limit 1
+    ),
+    inserted_load as (
+        insert into loads (
+            loads_id,
+            modified_at,
+            load_type_id,
+            client_id,
+            driver_id,
+            current_status_id,
+            start_city,
+            engage_city,
+            clear_city,
+            finish_city
+        )
+        values (
+            %(load_id)s,
+            %(modified_at)s,
+            %(load_type_id)s,
+            (select clients_id from client),
+            (select drivers_id from driver),
+            %(status_id)s,
+            %(start_city)s,
+            %(engage_city)s,
+            %(clear_city)s,
+            %(finish_city)s
+        )
+        returning *
+    )
+    select
+        l.loads_id,
+        l.created_at,
+        l.modified_at,
+        %(load_type)s as load_type,
+        %(client_num)s as client_number,
+        %(driver_name)s as driver_name,
+        %(driver_num)s as driver_phone,
+        %(stage)s as current_status,
+        l.start_city,
+        l.engage_city,
+        l.clear_city,
+        l.finish_city
+    from inserted_load l;
+"""
+
+# Bulk ingestion. Rows are staged with COPY into a temporary table, then
+# clients, drivers and loads are resolved and inserted set-wise in the same
+# transaction. `ord` is the position of the row in the submitted batch.
+BULK_CREATE_STAGING = """
+    create temp table bulk_loads (
+        ord int4 not null,
+        loads_id char(32) not null,
+        load_type_id int4 not null,
+        client_num varchar(12) not null,
+        driver_name text not null,
+        driver_num varchar(12) not null,
+        status_id int2 not null,
+        start_city text not null,
+        engage_city text,
+        clear_city text,
+        finish_city text not null
+    ) on commit drop
+"""
+
+BULK_COPY_STAGING = """
+    copy bulk_loads (
+        ord,
+        loads_id,
+        load_type_id,
+        client_num,
+        driver_name,
+        driver_num,
+        status_id,
+        start_city,
+        engage_city,
+        clear_city,
+        finish_city
+    ) from stdin
+"""
+
+# Sorted so concurrent batches lock the same keys in the same order
+BULK_INSERT_CLIENTS = """
+    insert into clients (phone_num)
+    select distinct client_num from bulk_loads
+    order by client_num
+    on conflict (phone_num) do nothing
+"""
+
+BULK_INSERT_DRIVERS = """
+    insert into drivers (name_surname, phone_num)
+    select distinct driver_name, driver_num from bulk_loads
+    order by driver_name, driver_num
+    on conflict (name_surname, phone_num) do nothing
+"""
+
+# Returns the ids actually inserted, the rest already existed. Bulk rows
+# come from outside, their last_update is ignored for the database time.
+BULK_INSERT_LOADS = """
     insert into loads (
         loads_id,
         modified_at,
@@ -177,39 +649,123 @@ INSERT_LOAD = """
         clear_city,
         finish_city
     )
-    values (
-        %s, --loads_id
-        %s, --modified_at
-        (select load_types_id from load_types where load_type = %s), -- load_type
-        %s, -- client_id
-        %s, -- driver_id
-        (select load_status_id from load_statuses where status = %s), -- current_status
-        %s, -- start_city
-        %s, -- engage_city
-        %s, -- clear_city
-        %s  -- finish_city
-    )
-    returning loads_id;
+    select
+        b.loads_id,
+        now(),
+        b.load_type_id,
+        c.clients_id,
+        d.drivers_id,
+        b.status_id,
+        b.start_city,
+        b.engage_city,
+        b.clear_city,
+        b.finish_city
+    from bulk_loads b
+    join clients c
+        on c.phone_num = b.client_num
+    join drivers d
+        on d.name_surname = b.driver_name and d.phone_num = b.driver_num
+    order by b.ord
+    on conflict (loads_id) do nothing
+    returning loads_id
 """
 
 UPDATE_LOAD = """
     update loads l
     set
         modified_at = %s,
-        current_status_id = (select load_status_id from load_statuses ls where ls.status = %s)
+        current_status_id = %s
     where
         l.loads_id = %s
     returning l.loads_id
 """
 
+TRANSITION_LOAD = """
+    -- Moves the load to the given stage and returns it in the
+    -- CTE_SELECT_ALL_LOADS column order
+    with updated as (
+        update loads l
+        set
+            modified_at = %(modified_at)s,
+            current_status_id = %(status_id)s
+        where
+            l.loads_id = %(load_id)s
+        returning l.*
+    )
+    select
+        u.loads_id,
+        u.created_at,
+        u.modified_at,
+        lt.load_type,
+        c.phone_num as client_number,
+        d.name_surname as driver_name,
+        d.phone_num as driver_phone,
+        ls.status as current_status,
+        u.start_city,
+        u.engage_city,
+        u.clear_city,
+        u.finish_city
+    from updated u
+    join clients c
+        on u.client_id = c.clients_id
+    join drivers d
+        on u.driver_id = d.drivers_id
+    join load_statuses ls
+        on u.current_status_id = ls.load_status_id
+    join load_types lt
+        on u.load_type_id = lt.load_types_id;
+"""
+
+TRANSITION_LOADS = """
+    -- Moves every listed load that is currently in `from_status_id` (any
+    -- status when it is null) to the given status and returns the moved
+    -- loads in the CTE_SELECT_ALL_LOADS column order
+    with updated as (
+        update loads l
+        set
+            modified_at = %(modified_at)s,
+            current_status_id = %(status_id)s
+        where
+            l.loads_id = any(%(load_ids)s::char(32)[])
+            and (
+                %(from_status_id)s::int2 is null
+                or l.current_status_id = %(from_status_id)s
+            )
+        returning l.*
+    )
+    select
+        u.loads_id,
+        u.created_at,
+        u.modified_at,
+        lt.load_type,
+        c.phone_num as client_number,
+        d.name_surname as driver_name,
+        d.phone_num as driver_phone,
+        ls.status as current_status,
+        u.start_city,
+        u.engage_city,
+        u.clear_city,
+        u.finish_city
+    from updated u
+    join clients c
+        on u.client_id = c.clients_id
+    join drivers d
+        on u.driver_id = d.drivers_id
+    join load_statuses ls
+        on u.current_status_id = ls.load_status_id
+    join load_types lt
+        on u.load_type_id = lt.load_types_id
+    order by u.modified_at, u.loads_id;
+"""
+
 COUNT_ACTIVE_LOADS = """
-    select count(current_status_id) as actives_count 
+    select count(*) as actives_count
     from loads l
-    where l.current_status_id in (1, 2, 3, 4, 5);
+    where l.current_status_id = any(%(status_ids)s::int2[])
 """
 
 COUNT_HISTORICAL_LOADS = """
-    select count(current_status_id) as historical_count 
+    select count(*) as historical_count
     from loads l
-    where l.current_status_id = 6;
+    where l.current_status_id = %(status_id)s
 """
\ No newline at end of file
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import hashlib
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional
+from app.logger import api_logger
+
+
+class CachedResponse(NamedTuple):
+    """
+    Encoded response body with its gzip variant.
+
+    Attributes:
+        body: Encoded body, sent as is.
+        gzip_body: The same body compressed with gzip.
+        etag: Strong entity tag of the body, quoted. The gzip variant is
+            tagged with a `-gzip` suffix, being a different representation.
+        version: Version of the data the body was rendered from, if known.
+        rendered_at: Monotonic time the body was rendered or last confirmed
+            up to date.
+    """
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    version: Optional[int]
+    rendered_at: float
+
+
+class ResponseCache:
+    """
+    Keeps a pre-encoded response and renders it again at most once per interval.
+
+    A response older than `interval` is still served while a single
+    background task renders its replacement (stale-while-revalidate).
+    When the data version is known and has not changed, the response is
+    only marked fresh again, without rendering.
+    """
+
+    def __init__(
+            self,
+            render: Callable[[], Awaitable[bytes]],
+            interval: float,
+            version: Callable[[], Optional[int]] = lambda: None,
+            compresslevel: int = 6
+    ):
+        """
+        Args:
+            render: Coroutine function producing the encoded body.
+            interval: Seconds a rendered response is served without checking.
+            version: Returns the current version of the rendered data, or
+                None when it is unknown and the body must be rendered again.
+            compresslevel: gzip level of the compressed variant.
+        """
+        self.render = render
+        self.interval = interval
+        self.version = version
+        self.compresslevel = compresslevel
+
+        self._response: Optional[CachedResponse] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def get(self) -> CachedResponse:
+        """
+        Get the cached response, rendering it if there is none yet.
+
+        Returns:
+            CachedResponse: The current response, possibly stale while it is
+                being rendered again.
+
+        Raises:
+            Exception: Whatever rendering raised, when there is no response
+                to serve instead.
+        """
+        response = self._response
+        if response is None:
+            # Nothing to serve yet, every request waits for the same render
+            await asyncio.shield(self._refresh())
+            return self._response
+
+        if time.monotonic() - response.rendered_at >= self.interval:
+            version = self.version()
+            if version is not None and version == response.version:
+                self._response = response._replace(rendered_at=time.monotonic())
+            else:
+                self._refresh()
+        return response
+
+    def _refresh(self) -> asyncio.Task:
+        """
+        Start rendering the response unless it is being rendered already.
+
+        Returns:
+            asyncio.Task: The task rendering the response.
+        """
+        if self._refreshing is None:
+            self._refreshing = asyncio.create_task(self._render())
+        return self._refreshing
+
+    async def _render(self) -> None:
+        version = self.version()
+        try:
+            body = await self.render()
+            self._response = CachedResponse(
+                body=body,
+                gzip_body=gzip.compress(body, compresslevel=self.compresslevel),
+                etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+                version=version,
+                rendered_at=time.monotonic()
+            )
+            api_logger.debug(f"Response rendered: {len(body)} bytes (version {version})")
+        except Exception as e:
+            api_logger.error(f"Error rendering response: {e}")
+            if self._response is None:
+                raise
+            # Keep serving the stale response, try again after an interval
+            self._response = self._response._replace(rendered_at=time.monotonic())
+        finally:
+            self._refreshing = None
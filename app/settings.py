@@ -8,6 +8,13 @@ if IS_LOCALHOST := os.getenv('IS_LOCALHOST', 'true') == 'true':
 # This has influence on Loglevel
 DEBUG = os.getenv('DEBUG', 'false') == 'true'
 
+# 'full' serves everything. 'read' serves only /s3/* on read-only database connections,
+# without starting the Telegram bot, for cheap read nodes behind the same socket.
+API_MODE = os.getenv('API_MODE', default='full')
+if API_MODE not in ('full', 'read'):
+    raise EnvironmentError(f"API_MODE must be 'full' or 'read', got '{API_MODE}'")
+READ_ONLY = API_MODE == 'read'
+
 # PostgreSQL
 DB_HOST = os.getenv('DB_HOST', default='localhost')
 DB_PORT = os.getenv('DB_PORT', default='5432')
@@ -15,6 +22,65 @@ DB_NAME = os.getenv('DB_NAME', default='loads_db')
 DB_USER = os.getenv('DB_USER', default=None)
 DB_PASSWORD = os.getenv('DB_PASSWORD', default=None)
 
+# PostgreSQL connection pool
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', default='1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', default='10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', default='30'))             # Seconds to wait for checkout
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', default='600'))          # Seconds before idle conn is closed
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', default='3600')) # Seconds before conn is recycled
+
+# Server-side prepared statements. Executions before a query is prepared on a connection.
+# Behind a transaction-mode PgBouncer prepared statements must be disabled.
+DB_PREPARE_THRESHOLD = int(os.getenv('DB_PREPARE_THRESHOLD', default='5'))
+DB_PGBOUNCER_TRANSACTION_MODE = os.getenv('DB_PGBOUNCER_TRANSACTION_MODE', 'false') == 'true'
+
+# In-memory cache of active loads, kept in sync across workers by LISTEN/NOTIFY
+LOADS_CACHE = os.getenv('LOADS_CACHE', 'false') == 'true'
+LOADS_CACHE_MAX_AGE = float(os.getenv('LOADS_CACHE_MAX_AGE', default='60'))            # Seconds before a reload anyway
+LOADS_CACHE_STALE_IF_ERROR = float(os.getenv('LOADS_CACHE_STALE_IF_ERROR', default='30'))  # Seconds served if DB fails
+LOADS_CACHE_RELOAD_TIMEOUT = float(os.getenv('LOADS_CACHE_RELOAD_TIMEOUT', default='1'))  # Seconds waited before that
+
+# Bloom filter of load IDs, lookups of unknown IDs skip the database
+LOADS_ID_FILTER = os.getenv('LOADS_ID_FILTER', 'false') == 'true'
+LOADS_ID_FILTER_ERROR_RATE = float(os.getenv('LOADS_ID_FILTER_ERROR_RATE', default='0.01'))  # False positive rate
+LOADS_ID_FILTER_REBUILD = float(os.getenv('LOADS_ID_FILTER_REBUILD', default='3600'))  # Seconds between rebuilds
+
+# Seconds the encoded /s3/loads response is served before it is rendered again
+LOADS_RESPONSE_INTERVAL = float(os.getenv('LOADS_RESPONSE_INTERVAL', default='5'))
+
+# Seconds before a /s3/loads delta cursor read again, for changes committed late
+LOADS_DELTA_OVERLAP = float(os.getenv('LOADS_DELTA_OVERLAP', default='5'))
+
+# Push stream of load changes (/s3/loads/stream and /s3/loads/ws)
+LOADS_STREAM = os.getenv('LOADS_STREAM', 'false') == 'true'
+LOADS_STREAM_HEARTBEAT = float(os.getenv('LOADS_STREAM_HEARTBEAT', default='15'))  # Seconds between heartbeats
+LOADS_STREAM_BUFFER = int(os.getenv('LOADS_STREAM_BUFFER', default='64'))  # Events buffered per subscriber
+
+# Lockout of /s3/driver after failed lookups, by client IP and by load ID
+DRIVER_LIMITER = os.getenv('DRIVER_LIMITER', default='memory')  # 'memory' (one worker) or 'postgres'
+DRIVER_MAX_FAILURES = int(os.getenv('DRIVER_MAX_FAILURES', default='5'))  # Failures before the first lock
+DRIVER_FAILURE_WINDOW = float(os.getenv('DRIVER_FAILURE_WINDOW', default='3600'))  # Seconds failures are remembered
+DRIVER_LOCKOUT = float(os.getenv('DRIVER_LOCKOUT', default='30'))  # Seconds of the first lock, doubled per failure
+DRIVER_LOAD_LOCKOUT = float(os.getenv('DRIVER_LOAD_LOCKOUT', default='5'))  # Seconds a load is locked, never doubled
+TRUST_FORWARDED_FOR = os.getenv('TRUST_FORWARDED_FOR', 'false') == 'true'  # Behind a proxy setting X-Forwarded-For
+
+# Signed driver links posted by the bot, verified by /s3/driver without the database
+DRIVER_LINK_SECRET = os.getenv('DRIVER_LINK_SECRET', default=None)  # Unset disables signed links
+DRIVER_LINK_BASE = os.getenv('DRIVER_LINK_BASE', default=None)  # Page the link opens, gets the query appended
+DRIVER_LINK_TTL = float(os.getenv('DRIVER_LINK_TTL', default='604800'))  # Seconds a link stays valid
+
+# Cache-Control of public endpoints, for browsers and the CDN
+PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', default='5'))            # Seconds a response is fresh
+PUBLIC_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv('PUBLIC_CACHE_STALE_WHILE_REVALIDATE', default='30'))  # Then stale
+
+# Rows fetched from the server-side cursor per round trip by /s3/export
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', default='1000'))
+EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', default='2'))  # Exports streamed at once, each holds a connection
+
+# Bulk ingestion through /s3/loads/bulk. The endpoint is disabled while the token is not set.
+BULK_API_TOKEN = os.getenv('BULK_API_TOKEN', default=None)
+BULK_MAX_LOADS = int(os.getenv('BULK_MAX_LOADS', default='10000'))  # Loads accepted per request
+
 # This host is using to set up Telegram Webhook
 PROD_HOST = os.getenv('PROD_HOST', default=None)             # On IS_LOCALHOST == False
 LOCALHOST = os.getenv('LOCALHOST', 'http://localhost:8000')  # On IS_LOCALHOST == True
@@ -24,6 +90,25 @@ TG_API_TOKEN = os.getenv('TG_API_TOKEN', default=None)
 TG_WEBHOOK_ENDPOINT = os.getenv('TG_WEBHOOK_ENDPOINT', '/tgwhep')
 TELEGRAM_DEVELOPER_CHAT_ID = os.getenv('TELEGRAM_DEVELOPER_CHAT_ID', default=None)
 TELEGRAM_LOADS_CHAT_ID = TELEGRAM_DEVELOPER_CHAT_ID if DEBUG else os.getenv('TELEGRAM_LOADS_CHAT_ID')
+TG_HISTORY_PAGE_SIZE = int(os.getenv('TG_HISTORY_PAGE_SIZE', default='20'))  # Loads shown by 'Show deleted'
+TG_TRACKED_LOADS = int(os.getenv('TG_TRACKED_LOADS', default='1000'))  # Loads whose messages bulk commands can edit
+
+# Webhook updates are acknowledged once queued and processed by background workers,
+# concurrently except for clicks on one load and other updates of one chat, kept in order
+TG_UPDATE_WORKERS = int(os.getenv('TG_UPDATE_WORKERS', default='4'))  # Updates processed concurrently
+TG_UPDATE_QUEUE_SIZE = int(os.getenv('TG_UPDATE_QUEUE_SIZE', default='1000'))  # Updates queued or in progress at most
+TG_UPDATE_PUT_TIMEOUT = float(os.getenv('TG_UPDATE_PUT_TIMEOUT', default='1'))  # Seconds waited on a full queue
+TG_UPDATE_DRAIN_TIMEOUT = float(os.getenv('TG_UPDATE_DRAIN_TIMEOUT', default='10'))  # Seconds to drain on shutdown
+
+# Updates delivered again by Telegram are dropped by update_id
+TG_UPDATE_DEDUP = os.getenv('TG_UPDATE_DEDUP', default='memory')  # 'memory' (one worker), 'postgres' or 'off'
+TG_UPDATE_DEDUP_TTL = float(os.getenv('TG_UPDATE_DEDUP_TTL', default='86400'))  # Seconds an update_id is remembered
+
+# Several workers or nodes serving one bot: a shared webhook secret, and the webhook
+# registered by the leader elected through a Postgres advisory lock
+CLUSTER_MODE = os.getenv('CLUSTER_MODE', 'false') == 'true'
+TG_WEBHOOK_SECRET = os.getenv('TG_WEBHOOK_SECRET', default=None)  # Unset derives it from TG_API_TOKEN
+LEADER_RETRY_INTERVAL = float(os.getenv('LEADER_RETRY_INTERVAL', default='10'))  # Seconds between election attempts
 
 
 SOCKET_LOC = os.getenv('SOCKET_LOC', default=None)
@@ -38,6 +123,10 @@ required_envs = {
     'TELEGRAM_LOADS_CHAT_ID': TELEGRAM_LOADS_CHAT_ID,
     'SOCKET_LOC': SOCKET_LOC
 }
+if READ_ONLY:
+    # Read nodes never talk to Telegram
+    for name in ('TG_API_TOKEN', 'TELEGRAM_DEVELOPER_CHAT_ID', 'TELEGRAM_LOADS_CHAT_ID'):
+        del required_envs[name]
 for name, value in required_envs.items():
     if value is None:
         raise EnvironmentError(f"Required environment variable '{name}' is missing")
@@ -73,9 +73,7 @@ class SetStartButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'start')
-        return load
+        return await loads.transition(load_id, 'start')
 
 
 class SetEngagedButton(AbstractButton):
@@ -86,9 +84,7 @@ class SetEngagedButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'engage')
-        return load
+        return await loads.transition(load_id, 'engage')
 
 
 class SetDriveButton(AbstractButton):
@@ -99,9 +95,7 @@ class SetDriveButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'drive')
-        return load
+        return await loads.transition(load_id, 'drive')
 
 
 class SetClearButton(AbstractButton):
@@ -112,9 +106,7 @@ class SetClearButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'clear')
-        return load
+        return await loads.transition(load_id, 'clear')
 
 class SetFinishButton(AbstractButton):
     """Button to set load stage to 'finish'."""
@@ -124,9 +116,7 @@ class SetFinishButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'finish')
-        return load
+        return await loads.transition(load_id, 'finish')
 
 class DeleteButton(AbstractButton):
     """Button to move load to 'history' stage (delete)."""
@@ -136,8 +126,7 @@ class DeleteButton(AbstractButton):
     @staticmethod
     async def process_click(callback_data: str, loads: Loads) -> Optional[Load]:
         load_id = extract_id_from_callback_data(callback_data)
-        load: Load = await loads.get_load_by_id(load_id)
-        await loads.change_stage(load, 'history')
+        await loads.transition(load_id, 'history')
         return None
 
 
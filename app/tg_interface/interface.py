@@ -1,14 +1,24 @@
 
 from app.logger import tg_logger
 from typing import List, Tuple, Optional, Any, TYPE_CHECKING
+from collections import OrderedDict
+import asyncio
+from datetime import timedelta
+import base64
+import hashlib
+import hmac
 import secrets
+from app import settings
 from app.loads.loads import Loads
 from app.loads.load import Load
-from app.tg_interface.inline_buttons import get_kbd, BUTTONS
+from app.driver_links import driver_link
+from app.tg_interface.inline_buttons import get_kbd, BUTTONS, extract_id_from_callback_data
+from app.tg_interface.update_dedup import UpdateDeduplicator
 from app.tg_interface.reply_buttons import get_kbd as get_reply_kbd, COMMANDS
-from telegram.error import BadRequest
+from telegram.error import BadRequest, RetryAfter
 from telegram import (
     Bot,
+    Message,
     Update,
     ReplyKeyboardMarkup,
     InlineKeyboardMarkup
@@ -27,6 +37,58 @@ if TYPE_CHECKING:
     from telegram import Bot
 
 
+def derive_webhook_secret(token: str) -> str:
+    """
+    Derive the webhook secret token from the bot token.
+
+    Every process running the same bot derives the same secret, so any of
+    them can check updates whichever one registered the webhook. It does
+    not reveal the bot token.
+
+    Args:
+        token: Telegram bot token.
+
+    Returns:
+        str: Secret made of the characters Telegram allows in it.
+    """
+    digest = hmac.new(token.encode(), b'telegram-webhook-secret', hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def update_ordering_key(data: dict[str, Any]) -> Optional[str]:
+    """
+    Get the key a raw update is processed in order by.
+
+    Button clicks are ordered by the load they act on, so two quick clicks
+    on one load are never reordered while clicks on other loads of the
+    same chat proceed. Any other update is ordered by its chat.
+
+    Args:
+        data: Raw update as received by the webhook.
+
+    Returns:
+        Optional[str]: 'load:<id>' or 'chat:<id>', None for updates
+            without a chat.
+    """
+    callback_query = data.get('callback_query')
+    if isinstance(callback_query, dict):
+        try:
+            return f"load:{extract_id_from_callback_data(str(callback_query.get('data')))}"
+        except RuntimeError:
+            pass
+        message = callback_query.get('message')
+    else:
+        message = next((
+            data[kind] for kind in ('message', 'edited_message', 'channel_post', 'edited_channel_post')
+            if isinstance(data.get(kind), dict)
+        ), None)
+    if isinstance(message, dict) and isinstance(message.get('chat'), dict):
+        chat_id = message['chat'].get('id')
+        if chat_id is not None:
+            return f'chat:{chat_id}'
+    return None
+
+
 def craft_load_message(load: Load) -> Tuple[str, InlineKeyboardMarkup]:
     """
     Builds a textual description and inline keyboard for a given load.
@@ -35,6 +97,8 @@ def craft_load_message(load: Load) -> Tuple[str, InlineKeyboardMarkup]:
         - Start and finish stage locations.
         - Driver's name and phone number.
         - Current stage and the last update timestamp.
+        - A signed link to the driver details for the client, when
+          signed links are configured.
 
     The inline keyboard is created using `get_kbd()` with the load's ID and
     external status.
@@ -53,6 +117,9 @@ def craft_load_message(load: Load) -> Tuple[str, InlineKeyboardMarkup]:
         f'{load.stages.start} ... {load.stages.finish}\n'\
         f'{load.driver_name}, +{load.driver_num}\n'\
         f'\nStage: {load.stage} ({load.last_update.strftime("%d %b %H:%M")})'
+    link = driver_link(load)
+    if link is not None:
+        craft += f'\nClient link: {link}'
 
     reply_markup = InlineKeyboardMarkup(
         get_kbd(
@@ -65,18 +132,46 @@ def craft_load_message(load: Load) -> Tuple[str, InlineKeyboardMarkup]:
 
 class AsyncTelegramInterface:
 
+    # Messages of a single load remembered for editing, newest kept
+    MESSAGES_PER_LOAD = 3
+    # Flood waits an edit sits out before it is given up
+    EDIT_RETRIES = 3
+
     def __init__(
             self,
             token: str,
             webhook_url: str,
             chat_id: int,
-            loads: Loads):
+            loads: Loads,
+            secret: Optional[str] = None,
+            manage_webhook: bool = True,
+            dedup: Optional[UpdateDeduplicator] = None):
+        """
+        Args:
+            token: Telegram bot token.
+            webhook_url: URL Telegram posts updates to.
+            chat_id: Chat the loads are posted to.
+            loads: Loads instance.
+            secret: Webhook secret token shared by every process, a random
+                one of this process by default.
+            manage_webhook: Register the webhook on enter and delete it on
+                exit. Off in clustered mode, where the leader registers it
+                with `set_webhook()` and nobody deletes it.
+            dedup: Drops updates delivered again, None processes every
+                delivery.
+        """
         self.token: str = token
         self.webhook_url: str = webhook_url
         self.chat_id: int = chat_id
         self.app: Optional[Application] = None
         self.loads: Loads = loads
-        self.own_secret = secrets.token_urlsafe(32)
+        self.own_secret = secret or secrets.token_urlsafe(32)
+        self.manage_webhook = manage_webhook
+        self.dedup = dedup
+        # load_id -> (chat_id, message_id) of messages showing the load,
+        # least recently posted loads are forgotten first. Kept by this
+        # process only: lost on restart, not shared between workers
+        self.load_messages: OrderedDict[str, List[Tuple[int, int]]] = OrderedDict()
 
     async def __aenter__(self) -> 'AsyncTelegramInterface':
         self.app = ApplicationBuilder().token(self.token).build()
@@ -86,14 +181,23 @@ class AsyncTelegramInterface:
         self.app.add_handler(CallbackQueryHandler(self.handle_inline_buttons))
         await self.app.initialize()
         await self.app.start()
-        await self.app.bot.set_webhook(url=self.webhook_url, secret_token=self.own_secret)
+        if self.manage_webhook:
+            await self.set_webhook()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.app.bot.delete_webhook()
+        if self.manage_webhook:
+            await self.app.bot.delete_webhook()
         await self.app.stop()
         await self.app.shutdown()
 
+    async def set_webhook(self) -> None:
+        """
+        Register the webhook with Telegram. Registering it again is harmless.
+        """
+        await self.app.bot.set_webhook(url=self.webhook_url, secret_token=self.own_secret)
+        tg_logger.info(f"Webhook registered: {self.webhook_url}")
+
     @staticmethod
     async def _prepare_chat(chat_id: int, loads: Loads, bot: Bot) -> None:
         """
@@ -125,8 +229,94 @@ class AsyncTelegramInterface:
             disable_notification=True
         )
 
-    @staticmethod
+    def remember_message(self, load_id: str, message: Message) -> None:
+        """
+        Remembers a message showing a load so it can be edited in a batch later.
+
+        Only the last `MESSAGES_PER_LOAD` messages of a load and the last
+        `TG_TRACKED_LOADS` loads are kept, in the memory of this process.
+
+        Args:
+            load_id (str): Unique identifier of the shown load.
+            message (Message): The message showing it.
+
+        Returns:
+            None
+        """
+        key = (message.chat_id, message.message_id)
+        messages = self.load_messages.pop(load_id, [])
+        if key in messages:
+            messages.remove(key)
+        messages.append(key)
+        self.load_messages[load_id] = messages[-self.MESSAGES_PER_LOAD:]
+        while len(self.load_messages) > settings.TG_TRACKED_LOADS:
+            self.load_messages.popitem(last=False)
+
+    async def refresh_load_messages(self, loads: List[Load], bot: Bot) -> Tuple[int, int]:
+        """
+        Edits every remembered message of the given loads, one at a time.
+
+        Loads moved to history get their messages replaced with "Deleted",
+        the same way the Delete button does, and are forgotten. Edits are
+        sent in sequence to stay within the flood limits of Telegram; when
+        it asks to slow down anyway, the edit is retried after the wait it
+        gives. Messages that can not be edited (gone, too old, not
+        modified) are skipped.
+
+        Only messages remembered by this process are edited, see
+        `remember_message()`.
+
+        Args:
+            loads (List[Load]): Loads whose messages are to be brought up to date.
+            bot (Bot): A PTB Bot instance used to edit the messages.
+
+        Returns:
+            Tuple[int, int]: Numbers of messages edited and not edited.
+        """
+        edits = []
+        for load in loads:
+            if load.stage == 'history':
+                messages = self.load_messages.pop(load.load_id, [])
+                edit = {'text': 'Deleted'}
+            else:
+                messages = self.load_messages.get(load.load_id, [])
+                text, kbd = craft_load_message(load)
+                edit = {'text': text, 'reply_markup': kbd}
+            edits.extend((chat_id, message_id, edit) for chat_id, message_id in messages)
+
+        edited = 0
+        for chat_id, message_id, edit in edits:
+            if await self._edit_message(bot, chat_id, message_id, edit):
+                edited += 1
+        tg_logger.info(f"Edited {edited} of {len(edits)} load messages")
+        return edited, len(edits) - edited
+
+    async def _edit_message(self, bot: Bot, chat_id: int, message_id: int, edit: dict[str, Any]) -> bool:
+        """
+        Edit a message, waiting out flood control up to `EDIT_RETRIES` times.
+
+        Returns:
+            bool: True if the message was edited.
+        """
+        for attempt in range(self.EDIT_RETRIES + 1):
+            try:
+                await bot.edit_message_text(chat_id=chat_id, message_id=message_id, **edit)
+                return True
+            except RetryAfter as e:
+                error = e
+                if attempt < self.EDIT_RETRIES:
+                    delay = e.retry_after
+                    delay = delay.total_seconds() if isinstance(delay, timedelta) else delay
+                    tg_logger.info(f"Flood control while editing messages, waiting {delay}s")
+                    await asyncio.sleep(delay)
+            except Exception as e:
+                error = e
+                break
+        tg_logger.warning(f"Load message {message_id} in chat {chat_id} was not edited: {error}")
+        return False
+
     async def post_loads(
+            self,
             chat_id: int,
             loads: List[Load],
             bot: Bot
@@ -137,7 +327,8 @@ class AsyncTelegramInterface:
         For each load, this method uses `craft_load_message()` to generate the
         message text and associated inline keyboard, then sends it via the given bot.
         After all loads are posted, it sends a final summary message with the
-        total number of loads sent.
+        total number of loads sent. Posted messages are remembered so bulk
+        commands can edit them.
 
         Args:
             chat_id (int): Unique identifier of the target chat.
@@ -149,11 +340,12 @@ class AsyncTelegramInterface:
         """
         for load in loads:
             text, kbd = craft_load_message(load)
-            await bot.send_message(
+            message = await bot.send_message(
                 chat_id=chat_id,
                 text=text,
                 reply_markup=kbd
             )
+            self.remember_message(load.load_id, message)
         await bot.send_message(
             chat_id=chat_id,
             text=f'Total {len(loads)} loads'
@@ -259,16 +451,19 @@ class AsyncTelegramInterface:
             if btn.callback_prefix in callback_data:
                 tg_logger.info(f"Processing button click: {btn.__name__}")
                 try:
-                    edited_load = await btn.process_click(
-                        callback_data=callback_data,
-                        loads=self.loads
-                    )
+                    async with self.loads.connection():
+                        edited_load = await btn.process_click(
+                            callback_data=callback_data,
+                            loads=self.loads
+                        )
                     if edited_load is None:
                         tg_logger.debug("Load deleted, updating message")
                         await update.callback_query.edit_message_text('Deleted')
                         return
 
                     tg_logger.debug(f'Updating load message: {edited_load.load_id}')
+                    # Messages posted before a restart become known once clicked
+                    self.remember_message(edited_load.load_id, update.callback_query.message)
                     edited_load_msg, keyboard = craft_load_message(edited_load)
                     await update.callback_query.edit_message_text(
                         text=edited_load_msg,
@@ -298,7 +493,8 @@ class AsyncTelegramInterface:
         """
         Entry point for processing incoming webhook updates.
 
-        Converts the raw webhook payload into an `Update` object and passes it to
+        Drops updates already received, before parsing them, then converts
+        the raw webhook payload into an `Update` object and passes it to
         the application's bot for processing.
 
         Args:
@@ -314,6 +510,14 @@ class AsyncTelegramInterface:
         update_id = data.get('update_id', 'unknown')
         tg_logger.debug(f"Processing webhook update: {update_id}")
 
+        if self.dedup is not None and isinstance(update_id, int):
+            try:
+                if not await self.dedup.first_seen(update_id):
+                    return
+            except Exception as e:
+                # Processing twice beats not processing at all
+                tg_logger.error(f"Error checking update {update_id} for replays: {e}")
+
         try:
             update = Update.de_json(data, self.app.bot)
             await self.app.process_update(update)
@@ -3,6 +3,8 @@ from typing import List, TYPE_CHECKING
 import asyncio
 from abc import ABC, abstractmethod
 from app.loads.loads import Loads
+from app.loads.load import ALLOWED_STAGES
+from app import settings
 from app.tg_interface.new_load_parser import LoadMessageParser, LoadMessageParseError
 from telegram import Bot, Update
 
@@ -58,13 +60,65 @@ class ShowDeletedCommand(AbstractCommand):
         bot: Bot,
         interface: 'AsyncTelegramInterface'
     ) -> None:
+        # Latest page only, posted oldest first so the newest ends up at the bottom
+        latest = await loads.get_historicals(limit=settings.TG_HISTORY_PAGE_SIZE)
         await interface.post_loads(
             chat_id=update.effective_chat.id,
-            loads = await loads.get_historicals(),
+            loads=latest[::-1],
             bot=bot
         )
 
 
+async def move_all(
+    update: Update,
+    loads: Loads,
+    bot: Bot,
+    interface: 'AsyncTelegramInterface',
+    from_stage: ALLOWED_STAGES,
+    to_stage: ALLOWED_STAGES
+) -> None:
+    """
+    Move every active load in `from_stage` to `to_stage` and edit their
+    messages, reporting how many could not be edited.
+    """
+    async with loads.connection():
+        load_ids = [load.load_id for load in await loads.get_actives() if load.stage == from_stage]
+        moved = await loads.transition_many(load_ids, to_stage, from_stage=from_stage)
+    _edited, not_edited = await interface.refresh_load_messages(moved, bot)
+    text = f'{from_stage} → {to_stage}: {len(moved)} loads'
+    if not_edited:
+        text += f', {not_edited} messages could not be edited'
+    await bot.send_message(chat_id=update.effective_chat.id, text=text)
+
+
+class ArchiveFinishedCommand(AbstractCommand):
+
+    text = 'Archive finished'
+
+    @staticmethod
+    async def action(
+        update: Update,
+        loads: Loads,
+        bot: Bot,
+        interface: 'AsyncTelegramInterface'
+    ) -> None:
+        await move_all(update, loads, bot, interface, from_stage='finish', to_stage='history')
+
+
+class AdvanceDriveCommand(AbstractCommand):
+
+    text = 'Drive → finish'
+
+    @staticmethod
+    async def action(
+        update: Update,
+        loads: Loads,
+        bot: Bot,
+        interface: 'AsyncTelegramInterface'
+    ) -> None:
+        await move_all(update, loads, bot, interface, from_stage='drive', to_stage='finish')
+
+
 class CreateNewCommand(AbstractCommand):
 
     SAMPLE_EXTERNAL = \
@@ -149,12 +203,15 @@ COMMANDS = (
     ShowActiveCommand,
     ShowDeletedCommand,
     CreateNewCommand,
+    ArchiveFinishedCommand,
+    AdvanceDriveCommand,
     ParseLoadCommand
 )
 
 
 LAYOUT = (
     (ShowActiveCommand, ShowDeletedCommand),
+    (AdvanceDriveCommand, ArchiveFinishedCommand),
     (CreateNewCommand, )
 )
 
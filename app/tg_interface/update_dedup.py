@@ -0,0 +1,119 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+from app.loads.loads import Loads
+from app.loads import queries
+from app.logger import tg_logger
+
+
+class UpdateDeduplicator(ABC):
+    """
+    Recognizes webhook updates delivered more than once.
+
+    Telegram delivers an update again when the webhook was slow or failed.
+    Update IDs are remembered for `ttl` seconds, and an update whose ID is
+    remembered is a replay to drop.
+
+    Subclasses store the IDs.
+    """
+
+    def __init__(self, ttl: float = 86400.0):
+        """
+        Args:
+            ttl: Seconds an update ID is remembered. Telegram keeps
+                undelivered updates for 24 hours.
+        """
+        self.ttl = ttl
+        self.dropped = 0
+
+    async def first_seen(self, update_id: int) -> bool:
+        """
+        Remember an update ID, and tell whether it is new.
+
+        Replays are counted in `dropped`.
+
+        Args:
+            update_id: ID of the update.
+
+        Returns:
+            bool: True the first time the ID is seen within the TTL.
+        """
+        if await self._remember(update_id):
+            return True
+        self.dropped += 1
+        tg_logger.info(f"Update {update_id} already received, dropped ({self.dropped} dropped so far)")
+        return False
+
+    @abstractmethod
+    async def _remember(self, update_id: int) -> bool:
+        """
+        Store an update ID unless stored already.
+
+        Returns:
+            bool: True if it was not stored yet.
+        """
+
+
+class MemoryUpdateDeduplicator(UpdateDeduplicator):
+    """
+    Keeps update IDs in the memory of this process.
+
+    Enough for a single worker. At most `max_ids` IDs are remembered, the
+    oldest ones are forgotten first.
+    """
+
+    def __init__(self, *args, max_ids: int = 100_000, **kwargs):
+        """
+        Args:
+            max_ids: Update IDs remembered at most.
+            *args, **kwargs: See `UpdateDeduplicator`.
+        """
+        super().__init__(*args, **kwargs)
+        self.max_ids = max_ids
+        self._seen: OrderedDict[int, float] = OrderedDict()
+
+    async def _remember(self, update_id: int) -> bool:
+        now = time.monotonic()
+        # Oldest first: forget the expired ones
+        while self._seen and next(iter(self._seen.values())) <= now - self.ttl:
+            self._seen.popitem(last=False)
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = now
+        while len(self._seen) > self.max_ids:
+            self._seen.popitem(last=False)
+        return True
+
+
+class PostgresUpdateDeduplicator(UpdateDeduplicator):
+    """
+    Keeps update IDs in the database, shared by every worker.
+
+    Whichever worker inserts an ID first processes the update. Expired IDs
+    are deleted at most once per TTL by each worker.
+    """
+
+    def __init__(self, loads: Loads, *args, **kwargs):
+        """
+        Args:
+            loads: Loads instance whose pool is used.
+            *args, **kwargs: See `UpdateDeduplicator`.
+        """
+        super().__init__(*args, **kwargs)
+        self.loads = loads
+        self._pruned_at: Optional[float] = None
+
+    async def _remember(self, update_id: int) -> bool:
+        if self._pruned_at is None or time.monotonic() - self._pruned_at >= self.ttl:
+            self._pruned_at = time.monotonic()
+            await self.loads.execute_query(queries.TG_UPDATES_PRUNE, {'ttl': timedelta(seconds=self.ttl)})
+            tg_logger.debug("Expired update IDs pruned")
+
+        rows = await self.loads.execute_query(
+            queries.TG_UPDATE_INSERT,
+            {'update_id': update_id, 'ttl': timedelta(seconds=self.ttl)},
+            prepare=True
+        )
+        return len(rows) > 0
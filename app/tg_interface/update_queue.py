@@ -0,0 +1,163 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+from app.logger import tg_logger
+
+
+class UpdateQueue:
+    """
+    Bounded queue of raw webhook updates, processed by background workers.
+
+    Lets the webhook endpoint answer Telegram as soon as an update is
+    queued, however long processing it takes. A full queue makes `put()`
+    wait briefly, then refuse the update: the endpoint answers with an
+    error and Telegram delivers the update again later.
+
+    Updates sharing an ordering key (e.g. a chat or a load) are processed
+    one at a time, in the order they were received: the worker processing
+    a key also processes the updates of that key queued meanwhile. Updates
+    with different keys, or none, are processed concurrently.
+
+    Updates that fail are logged and counted, not retried: Telegram has
+    already been told they were received.
+    """
+
+    def __init__(
+            self,
+            handle: Callable[[dict[str, Any]], Awaitable[None]],
+            key: Callable[[dict[str, Any]], Optional[str]] = lambda _data: None,
+            workers: int = 4,
+            maxsize: int = 1000,
+            put_timeout: float = 1.0,
+            drain_timeout: float = 10.0
+    ):
+        """
+        Args:
+            handle: Coroutine function processing one update.
+            key: Ordering key of an update, None if it needs no ordering.
+            workers: Updates processed concurrently.
+            maxsize: Updates queued at most, waiting for their key included.
+            put_timeout: Seconds `put()` waits for room in a full queue.
+            drain_timeout: Seconds `stop()` waits for queued updates.
+        """
+        self.handle = handle
+        self.key = key
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.drain_timeout = drain_timeout
+
+        # Unbounded itself: updates waiting for their key are taken out of it
+        # but still hold a slot of the capacity until processed
+        self.queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(maxsize)
+        # Keys being processed, with the updates waiting for them in order
+        self._busy: dict[str, deque[dict[str, Any]]] = {}
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self._closed = False
+        self._tasks: list[asyncio.Task] = []
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the counters of the queue.
+
+        Returns:
+            dict[str, int]: Updates queued or being processed now, and
+                accepted, rejected, processed and failed ones since start.
+        """
+        return {
+            'queued': self.accepted - self.processed - self.failed,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+    async def start(self) -> None:
+        """
+        Start the workers.
+        """
+        self._closed = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        tg_logger.info(f"Update queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """
+        Refuse new updates, process the queued ones for up to
+        `drain_timeout` seconds, then stop the workers.
+        """
+        self._closed = True
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            tg_logger.warning(f"Update queue not drained, {self.stats()['queued']} updates dropped")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        tg_logger.info(f"Update queue stopped: {self.stats()}")
+
+    async def put(self, data: dict[str, Any]) -> bool:
+        """
+        Queue an update, waiting up to `put_timeout` while the queue is full.
+
+        Args:
+            data: Raw update as received by the webhook.
+
+        Returns:
+            bool: True if queued, False if refused because the queue is
+                full or stopping.
+        """
+        if self._closed:
+            return self._reject(data, 'stopping')
+        try:
+            await asyncio.wait_for(self._capacity.acquire(), self.put_timeout)
+        except asyncio.TimeoutError:
+            return self._reject(data, 'full')
+        self.queue.put_nowait(data)
+        self.accepted += 1
+        return True
+
+    def _reject(self, data: dict[str, Any], reason: str) -> bool:
+        self.rejected += 1
+        tg_logger.warning(
+            f"Update {data.get('update_id', 'unknown')} refused, queue {reason} "
+            f"({self.rejected} refused so far)"
+        )
+        return False
+
+    async def _process(self, data: dict[str, Any]) -> None:
+        try:
+            await self.handle(data)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            tg_logger.error(f"Update {data.get('update_id', 'unknown')} failed: {e}")
+        finally:
+            self._capacity.release()
+            self.queue.task_done()
+
+    async def _work(self) -> None:
+        while True:
+            data = await self.queue.get()
+            try:
+                key = self.key(data)
+            except Exception as e:
+                # Processed unordered rather than lost, or the worker with it
+                tg_logger.error(f"Update {data.get('update_id', 'unknown')} has no ordering key: {e}")
+                key = None
+            if key is not None:
+                if key in self._busy:
+                    # Another worker is processing the key, it takes this one next
+                    self._busy[key].append(data)
+                    continue
+                self._busy[key] = deque()
+            try:
+                await self._process(data)
+                while key is not None and self._busy[key]:
+                    await self._process(self._busy[key].popleft())
+            finally:
+                if key is not None:
+                    del self._busy[key]
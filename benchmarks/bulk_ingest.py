@@ -0,0 +1,65 @@
+"""
+Measure load ingestion throughput of `Loads.add_many` against `Loads.add`.
+
+Every run recreates the benchmark database. Batches reuse a limited set of
+clients and drivers, like real onboarding of a client with its own fleet.
+
+Usage:
+    python -m benchmarks.bulk_ingest --loads 100000 --batch 10000
+"""
+import argparse
+import asyncio
+import secrets
+import time
+from app.loads.loads import LOAD_LIST_ADAPTER
+from benchmarks.seed import make_loads, recreate_database
+
+
+BENCH_DB_NAME = 'bench_loads'
+
+
+def make_batch(size: int, n_clients: int = 100, n_drivers: int = 500) -> list[dict]:
+    """
+    Generate raw loads in the `Load` input format.
+    """
+    return [
+        {
+            'id': secrets.token_hex(16),
+            'type': 'external' if i % 2 else 'internal',
+            'stage': 'start',
+            'stages': {'start': f'Start {i % 100}', 'finish': f'Finish {i % 100}'},
+            'client_num': f'380{i % n_clients:09d}',
+            'driver_name': f'Driver {i % n_drivers}',
+            'driver_num': f'381{i % n_drivers:09d}'
+        }
+        for i in range(size)
+    ]
+
+
+async def main(n_loads: int, batch_size: int, single: int) -> None:
+    await recreate_database(BENCH_DB_NAME)
+    async with make_loads(BENCH_DB_NAME) as loads:
+        batches = [make_batch(batch_size) for _ in range(n_loads // batch_size)]
+        started = time.perf_counter()
+        for batch in batches:
+            report = await loads.add_many(batch)
+            assert all(entry['status'] == 'created' for entry in report)
+        elapsed = time.perf_counter() - started
+        total = batch_size * len(batches)
+        print(f'add_many: {total} loads in batches of {batch_size}: {total / elapsed:,.0f} loads/s')
+
+        one_by_one = LOAD_LIST_ADAPTER.validate_python(make_batch(single))
+        started = time.perf_counter()
+        for load in one_by_one:
+            await loads.add(load)
+        elapsed = time.perf_counter() - started
+        print(f'add:      {single} loads one at a time: {single / elapsed:,.0f} loads/s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loads', type=int, default=100_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--single', type=int, default=2_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.loads, args.batch, args.single))
@@ -0,0 +1,123 @@
+"""
+Compare building `Load` objects from rows with and without validation.
+
+Rows are generated in memory in the CTE_SELECT_ALL_LOADS column order, so
+only hydration is measured: the validating constructor `Load(...)` used
+before, the same fields through `model_construct()`, and the `load_row`
+row factory built on `construct_trusted()`.
+
+Usage:
+    python -m benchmarks.hydration --rows 10000 --repeat 20
+"""
+import argparse
+import gc
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app.loads.load import Load, Stages
+from app.loads.loads import load_row
+
+
+COLUMNS = (
+    'loads_id',
+    'created_at',
+    'modified_at',
+    'load_type',
+    'client_number',
+    'driver_name',
+    'driver_phone',
+    'current_status',
+    'start_city',
+    'engage_city',
+    'clear_city',
+    'finish_city',
+    'current_status_id'
+)
+
+
+def make_rows(n: int) -> list[tuple]:
+    now = datetime.now(timezone.utc)
+    return [
+        (
+            f'{i:032x}', now, now, 'external', '380501234567', f'Driver {i}', '380671234567',
+            'drive', 'Start', 'Engage', 'Clear', 'Finish', 3
+        )
+        for i in range(n)
+    ]
+
+
+def validated(row: tuple) -> Load:
+    """
+    The previous, validating hydration.
+    """
+    return Load(
+        type=row[3],
+        stage=row[7],
+        stages=Stages(
+            start=row[8],
+            engage=row[9],
+            clear=row[10],
+            finish=row[11]
+        ),
+        client_num=row[4],
+        driver_name=row[5],
+        driver_num=row[6],
+        id=row[0],
+        last_update=row[2].replace(tzinfo=None)
+    )
+
+
+def constructed(row: tuple) -> Load:
+    """
+    Pydantic's own no-validation constructor, for reference.
+    """
+    return Load.model_construct(
+        load_type=row[3],
+        stage=row[7],
+        stages=Stages.model_construct(
+            start=row[8],
+            engage=row[9],
+            clear=row[10],
+            finish=row[11]
+        ),
+        client_num=row[4],
+        driver_name=row[5],
+        driver_num=row[6],
+        load_id=row[0],
+        last_update=row[2].replace(tzinfo=None)
+    )
+
+
+def best_of(repeat: int, hydrate, rows: list[tuple]) -> float:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        loads = [hydrate(row) for row in rows]
+        timings.append(time.perf_counter() - started)
+        assert len(loads) == len(rows)
+    return min(timings)
+
+
+def main(n_rows: int, repeat: int) -> None:
+    rows = make_rows(n_rows)
+    cursor = SimpleNamespace(description=[SimpleNamespace(name=name) for name in COLUMNS])
+    assert load_row(cursor)(rows[0]) == validated(rows[0])
+
+    slow = best_of(repeat, validated, rows)
+    construct = best_of(repeat, constructed, rows)
+    # The factory itself runs once per result, like psycopg does
+    fast = best_of(repeat, load_row(cursor), rows)
+    print(f'{n_rows} rows, best of {repeat}')
+    print(f'{"Load(...)":<18}{slow * 1e3:>10.2f} ms')
+    print(f'{"model_construct":<18}{construct * 1e3:>10.2f} ms')
+    print(f'{"load_row":<18}{fast * 1e3:>10.2f} ms')
+    print(f'{"speedup":<18}{slow / fast:>10.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,101 @@
+"""
+Compare hot read queries with and without server-side prepared statements.
+
+Reports the server planning time of `get_actives` and `get_load_by_id`
+queries (from EXPLAIN ANALYZE, text vs EXECUTE of a prepared statement)
+and the client-side latency of the Loads methods in both modes.
+
+Usage:
+    python -m benchmarks.prepared_statements --rows 100000 --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import time
+from psycopg import sql
+from app.loads import queries
+from benchmarks.seed import make_loads, recreate_database, seed
+
+
+BENCH_DB_NAME = 'bench_loads'
+
+HOT_QUERIES = {
+    'get_actives': (queries.CTE_SELECT_ALL_LOADS + queries.FILTER_ACTIVE_LOADS, ()),
+    'get_load_by_id': (queries.CTE_SELECT_ALL_LOADS + queries.FILTER_SINGLE_LOAD, None),
+}
+
+
+async def planning_time_ms(loads, query: str, params: tuple, prepared: bool) -> float:
+    """
+    Return the planning time the server reports for one execution of the query.
+    """
+    async with loads.connection():
+        if not prepared:
+            rows = await loads.execute_query(
+                f'explain (analyze, format json) {query}', *params, prepare=False
+            )
+            return rows[0][0][0]['Planning Time']
+
+        # EXECUTE is a utility statement and can not take bind parameters
+        types = '(text)' if params else ''
+        args = sql.SQL('({})').format(sql.Literal(params[0])).as_string() if params else ''
+        server_query = query.replace('%s', '$1')
+        await loads.execute_query(f'prepare bench_stmt{types} as {server_query}', prepare=False)
+        # The first five executions are planned with custom plans
+        for _ in range(6):
+            await loads.execute_query(f'execute bench_stmt{args}', prepare=False)
+        rows = await loads.execute_query(
+            f'explain (analyze, format json) execute bench_stmt{args}', prepare=False
+        )
+        await loads.execute_query('deallocate bench_stmt')
+        return rows[0][0][0]['Planning Time']
+
+
+async def latency_us(loads, load_id: str, iterations: int) -> dict[str, float]:
+    """
+    Return the mean client-side latency of the hot Loads methods.
+    """
+    calls = {
+        'get_actives': loads.get_actives,
+        'get_load_by_id': lambda: loads.get_load_by_id(load_id),
+    }
+    result = {}
+    async with loads.connection():
+        for name, call in calls.items():
+            for _ in range(10):
+                await call()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await call()
+            result[name] = (time.perf_counter() - started) / iterations * 1e6
+    return result
+
+
+async def main(rows: int, iterations: int) -> None:
+    await recreate_database(BENCH_DB_NAME)
+    async with make_loads(BENCH_DB_NAME) as loads:
+        await seed(loads, rows)
+        load_id = (await loads.execute_query('select loads_id from loads limit 1'))[0][0]
+
+    print(f'{rows} loads, {iterations} iterations per method\n')
+    print(f'{"query":<16}{"mode":<12}{"planning, ms":>14}{"latency, us":>14}')
+    for mode, threshold in (('text', None), ('prepared', 5)):
+        async with make_loads(
+                BENCH_DB_NAME,
+                pool_min_size=1,
+                pool_max_size=1,
+                prepare_threshold=threshold
+        ) as loads:
+            latency = await latency_us(loads, load_id, iterations)
+            for name, (query, params) in HOT_QUERIES.items():
+                params = params if params is not None else (load_id, )
+                planning = await planning_time_ms(loads, query, params, threshold is not None)
+                print(f'{name:<16}{mode:<12}{planning:>14.3f}{latency[name]:>14.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=2_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations))
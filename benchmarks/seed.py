@@ -0,0 +1,123 @@
+"""
+Helpers to create a throwaway database and fill it with generated loads.
+
+Used by the benchmarks and by the query plan tests. The database named by
+`DB_NAME` is only used to issue CREATE DATABASE, the data goes elsewhere.
+"""
+from psycopg import sql
+from app.loads.loads import Loads
+from app import settings
+
+
+SEED_CLIENTS = """
+    insert into clients (phone_num)
+    select '380' || lpad(g::text, 9, '0')
+    from generate_series(1, %(clients)s) g
+    on conflict (phone_num) do nothing
+"""
+
+SEED_DRIVERS = """
+    insert into drivers (name_surname, phone_num)
+    select 'Driver ' || g, '380' || lpad(g::text, 9, '0')
+    from generate_series(1, %(drivers)s) g
+    on conflict (name_surname, phone_num) do nothing
+"""
+
+# Every `active_every`-th load is spread over the active stages, the rest
+# is history. modified_at and changed_at grow with the row number like they
+# do in life, the trigger setting changed_at is disabled meanwhile.
+SEED_LOADS = """
+    insert into loads (
+        loads_id,
+        created_at,
+        modified_at,
+        changed_at,
+        load_type_id,
+        client_id,
+        driver_id,
+        current_status_id,
+        start_city,
+        engage_city,
+        clear_city,
+        finish_city
+    )
+    select
+        md5('seed' || g),
+        now() - make_interval(secs => %(loads)s - g + 60),
+        now() - make_interval(secs => %(loads)s - g),
+        now() - make_interval(secs => %(loads)s - g),
+        1 + g %% 2,
+        1 + g %% %(clients)s,
+        1 + g %% %(drivers)s,
+        case when g %% %(active_every)s = 0
+            then 1 + (g / %(active_every)s) %% 5
+            else 6
+        end,
+        'Start ' || g %% 100,
+        'Engage ' || g %% 10,
+        'Clear ' || g %% 10,
+        'Finish ' || g %% 100
+    from generate_series(1, %(loads)s) g
+    on conflict (loads_id) do nothing
+"""
+
+
+def make_loads(db_name: str, **kwargs) -> Loads:
+    """
+    Build a Loads instance for the given database using the app settings.
+    """
+    return Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=db_name,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        **kwargs
+    )
+
+
+async def recreate_database(db_name: str) -> None:
+    """
+    Drop and create an empty database.
+
+    Args:
+        db_name: Name of the database to recreate.
+    """
+    async with make_loads(settings.DB_NAME, autocommit=True) as loads:
+        drop = sql.SQL('DROP DATABASE IF EXISTS {} WITH (FORCE);').format(sql.Identifier(db_name))
+        await loads.execute_query(drop.as_string())
+        create = sql.SQL('CREATE DATABASE {};').format(sql.Identifier(db_name))
+        await loads.execute_query(create.as_string())
+
+
+async def seed(
+        loads: Loads,
+        n_loads: int,
+        n_clients: int = 10_000,
+        n_drivers: int = 2_000,
+        active_every: int = 10_000
+) -> None:
+    """
+    Fill the schema of an opened Loads instance with generated rows.
+
+    Args:
+        loads: Opened Loads instance, schema already initialised.
+        n_loads: Number of loads to generate.
+        n_clients: Number of clients to generate.
+        n_drivers: Number of drivers to generate.
+        active_every: One load out of this many is active, others are history.
+    """
+    params = {
+        'loads': n_loads,
+        'clients': n_clients,
+        'drivers': n_drivers,
+        'active_every': active_every
+    }
+    await loads.execute_query(SEED_CLIENTS, params)
+    await loads.execute_query(SEED_DRIVERS, params)
+    await loads.execute_query('alter table loads disable trigger loads_changed_at')
+    try:
+        await loads.execute_query(SEED_LOADS, params)
+    finally:
+        await loads.execute_query('alter table loads enable trigger loads_changed_at')
+    await loads.execute_query('analyze')
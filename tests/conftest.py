@@ -0,0 +1,22 @@
+import pytest
+from unittest.mock import patch
+
+
+class Clock:
+    """
+    Stand-in for time.monotonic, moved forward by the tests.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    # Modules call time.monotonic() through the time module, patched for all of them
+    with patch('time.monotonic', clock):
+        yield clock
@@ -1,7 +1,20 @@
+import asyncio
+import gzip
+import json
 import pytest
+from datetime import datetime, timezone
+from functools import partial
 from unittest.mock import patch, MagicMock, AsyncMock
-from fastapi import HTTPException
+from fastapi import HTTPException, Response
 from app.api import setup_ngrok, get_public_url, _gen_response3, app
+from app import settings
+from app.loads.loads import Loads
+from app.response_cache import ResponseCache
+from app.attempt_limiter import MemoryAttemptLimiter
+from app.driver_links import make_driver_token
+from app.broadcaster import HEARTBEAT_EVENT, LoadsBroadcaster, StreamEvent
+
+HIGH_WATER = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
 
 @pytest.mark.skip
 class TestSetupNgrok:
@@ -192,7 +205,7 @@ class TestProcessTgWebhook:
         request.headers.get.return_value = "correct_secret"
         request.app.state.tg_if.own_secret = "correct_secret"
         request.json = AsyncMock(return_value={"message": "test"})
-        request.app.state.tg_if.webhook_entrypoint = AsyncMock()
+        request.app.state.tg_updates.put = AsyncMock(return_value=True)
         return request
 
     @pytest.mark.asyncio
@@ -201,9 +214,20 @@ class TestProcessTgWebhook:
 
         result = await process_tg_webhook(mock_request)
 
-        mock_request.app.state.tg_if.webhook_entrypoint.assert_called_once_with({"message": "test"})
+        mock_request.app.state.tg_updates.put.assert_awaited_once_with({"message": "test"})
         assert result == {'status': 'ok'}
 
+    @pytest.mark.asyncio
+    async def test_process_tg_webhook_queue_full(self, mock_request):
+        from app.api import process_tg_webhook
+
+        mock_request.app.state.tg_updates.put.return_value = False
+
+        with pytest.raises(HTTPException) as exc_info:
+            await process_tg_webhook(mock_request)
+
+        assert exc_info.value.status_code == 503
+
     @pytest.mark.asyncio
     async def test_process_tg_webhook_wrong_secret(self, mock_request):
         from app.api import process_tg_webhook
@@ -216,6 +240,17 @@ class TestProcessTgWebhook:
         assert exc_info.value.status_code == 403
         assert exc_info.value.detail == 'Forbidden'
 
+    @pytest.mark.asyncio
+    async def test_process_tg_webhook_read_only(self, mock_request):
+        from app.api import process_tg_webhook
+
+        mock_request.app.state.tg_if = None
+
+        with pytest.raises(HTTPException) as exc_info:
+            await process_tg_webhook(mock_request)
+
+        assert exc_info.value.status_code == 404
+
     @pytest.mark.asyncio
     async def test_process_tg_webhook_missing_secret(self, mock_request):
         from app.api import process_tg_webhook
@@ -238,21 +273,32 @@ class TestProcessTgWebhook:
             await process_tg_webhook(mock_request)
 
     @pytest.mark.asyncio
-    async def test_process_tg_webhook_entrypoint_error(self, mock_request):
+    async def test_process_tg_webhook_does_not_process(self, mock_request):
         from app.api import process_tg_webhook
 
-        mock_request.app.state.tg_if.webhook_entrypoint.side_effect = Exception("Webhook processing failed")
+        mock_request.app.state.tg_if.webhook_entrypoint = AsyncMock(side_effect=Exception("Webhook processing failed"))
 
-        with pytest.raises(Exception, match="Webhook processing failed"):
-            await process_tg_webhook(mock_request)
+        # Processing is left to the update queue workers
+        assert await process_tg_webhook(mock_request) == {'status': 'ok'}
+        mock_request.app.state.tg_if.webhook_entrypoint.assert_not_awaited()
 
 
 class TestGetLoads:
 
     @pytest.fixture
     def mock_request(self):
+        from app.api import _render_active_loads
+
         request = MagicMock()
+        request.headers = {}
         request.app.state.loads = MagicMock()
+        request.app.state.loads.get_high_water = AsyncMock(return_value=HIGH_WATER)
+        request.app.state.loads.delta_cursor = Loads.delta_cursor
+        request.app.state.loads.parse_delta_cursor = Loads.parse_delta_cursor
+        request.app.state.loads_response = ResponseCache(
+            render=partial(_render_active_loads, request.app.state.loads),
+            interval=60
+        )
         return request
 
     @pytest.fixture
@@ -274,12 +320,15 @@ class TestGetLoads:
         result = await get_loads(mock_request)
 
         expected_loads = [mock_load.safe_dump.return_value, mock_load.safe_dump.return_value]
-        assert result == {
+        assert result.media_type == 'application/json'
+        assert 'Content-Encoding' not in result.headers
+        assert json.loads(result.body) == {
             'status': 'success',
             'message': None,
             'workload': {
                 'len': 2,
-                'loads': expected_loads
+                'loads': expected_loads,
+                'cursor': Loads.delta_cursor(HIGH_WATER)
             }
         }
 
@@ -291,24 +340,511 @@ class TestGetLoads:
 
         result = await get_loads(mock_request)
 
-        assert result == {
+        assert json.loads(result.body) == {
             'status': 'success',
             'message': None,
             'workload': {
                 'len': 0,
-                'loads': []
+                'loads': [],
+                'cursor': Loads.delta_cursor(HIGH_WATER)
             }
         }
 
+    @pytest.mark.asyncio
+    async def test_get_loads_gzip(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+        mock_request.headers = {'Accept-Encoding': 'gzip, deflate, br'}
+
+        result = await get_loads(mock_request)
+
+        assert result.headers['Content-Encoding'] == 'gzip'
+        assert result.headers['Vary'] == 'Accept-Encoding'
+        assert json.loads(gzip.decompress(result.body))['workload']['len'] == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('accept_encoding', ['gzip;q=0', 'br, gzip; q=0.0', 'identity', '*;q=0', 'gzip;q=x'])
+    async def test_get_loads_gzip_refused(self, mock_request, mock_load, accept_encoding):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+        mock_request.headers = {'Accept-Encoding': accept_encoding}
+
+        result = await get_loads(mock_request)
+
+        assert 'Content-Encoding' not in result.headers
+        assert json.loads(result.body)['workload']['len'] == 1
+
+    @pytest.mark.parametrize('accept_encoding, accepted', [
+        ('', False),
+        ('gzip', True),
+        ('GZIP;Q=0.5', True),
+        ('deflate, *', True),
+        ('*;q=1, gzip;q=0', False),
+        ('gzip;q=0, *', False),
+        ('x-gzip', True),
+    ])
+    def test_accepts_gzip(self, accept_encoding, accepted):
+        from app.api import _accepts_gzip
+
+        assert _accepts_gzip(accept_encoding) is accepted
+
+    @pytest.mark.asyncio
+    async def test_get_loads_served_from_cache(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+
+        first = await get_loads(mock_request)
+        second = await get_loads(mock_request)
+
+        mock_request.app.state.loads.get_actives.assert_awaited_once_with(public=True)
+        assert first.body == second.body
+
+    @pytest.mark.asyncio
+    async def test_get_loads_etag(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+
+        plain = await get_loads(mock_request)
+        mock_request.headers = {'Accept-Encoding': 'gzip'}
+        gzipped = await get_loads(mock_request)
+
+        assert plain.headers['ETag'].startswith('"')
+        assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+        assert plain.headers['Cache-Control'] == (
+            f'public, max-age={settings.PUBLIC_CACHE_MAX_AGE}, '
+            f'stale-while-revalidate={settings.PUBLIC_CACHE_STALE_WHILE_REVALIDATE}'
+        )
+
+    @pytest.mark.asyncio
+    async def test_get_loads_not_modified(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+        etag = (await get_loads(mock_request)).headers['ETag']
+
+        mock_request.headers = {'If-None-Match': f'"other", W/{etag}'}
+        result = await get_loads(mock_request)
+
+        assert result.status_code == 304
+        assert result.body == b''
+        assert result.headers['ETag'] == etag
+
+    @pytest.mark.asyncio
+    async def test_get_loads_modified(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_actives = AsyncMock(return_value=[mock_load])
+        etag = (await get_loads(mock_request)).headers['ETag']
+
+        # The gzip tag does not match the plain representation
+        mock_request.headers = {'If-None-Match': etag[:-1] + '-gzip"'}
+        result = await get_loads(mock_request)
+
+        assert result.status_code == 200
+        assert json.loads(result.body)['workload']['len'] == 1
+
     @pytest.mark.asyncio
     async def test_get_loads_database_error(self, mock_request):
         from app.api import get_loads
 
-        mock_request.app.state.loads.get_actives.side_effect = Exception("Database connection failed")
+        mock_request.app.state.loads.get_actives = AsyncMock(side_effect=Exception("Database connection failed"))
 
         with pytest.raises(Exception, match="Database connection failed"):
             await get_loads(mock_request)
 
+    @pytest.mark.asyncio
+    async def test_get_loads_delta(self, mock_request):
+        from app.api import get_loads
+
+        load = MagicMock()
+        load.safe_dump.return_value = {
+            'id': 'a' * 32,
+            'type': 'internal',
+            'stage': 'drive',
+            'stages': {'start': 'Kyiv'},
+            'last_update': '12:00'
+        }
+        loads = mock_request.app.state.loads
+        loads.get_changes = AsyncMock(return_value=([load], ['b' * 32], HIGH_WATER))
+        since = datetime(2025, 1, 1, 10, 0)
+
+        result = await get_loads(
+            mock_request,
+            cursor=Loads.delta_cursor(since),
+            stage='drive',
+            load_type='internal',
+            fields='stage, last_update'
+        )
+
+        loads.get_changes.assert_awaited_once_with(since=since, stage='drive', load_type='internal', public=True)
+        assert json.loads(result.body)['workload'] == {
+            'len': 1,
+            'loads': [{'id': 'a' * 32, 'stage': 'drive', 'last_update': '12:00'}],
+            'cursor': Loads.delta_cursor(HIGH_WATER),
+            'removed': ['b' * 32]
+        }
+        assert result.headers['Cache-Control'].startswith('public, max-age=')
+
+    @pytest.mark.asyncio
+    async def test_get_loads_filtered_without_since(self, mock_request, mock_load):
+        from app.api import get_loads
+
+        loads = mock_request.app.state.loads
+        loads.get_changes = AsyncMock(return_value=([mock_load], [], HIGH_WATER))
+
+        result = await get_loads(mock_request, load_type='external')
+
+        loads.get_changes.assert_awaited_once_with(since=None, stage=None, load_type='external', public=True)
+        assert 'removed' not in json.loads(result.body)['workload']
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('kwargs', [
+        {'cursor': 'garbage!'},
+        {'cursor': Loads.delta_cursor(HIGH_WATER), 'updated_since': HIGH_WATER},
+        {'fields': 'id,driver_num'},
+    ])
+    async def test_get_loads_bad_delta_request(self, mock_request, kwargs):
+        from app.api import get_loads
+
+        mock_request.app.state.loads.get_changes = AsyncMock(return_value=([], [], HIGH_WATER))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_loads(mock_request, **kwargs)
+
+        assert exc_info.value.status_code == 400
+        mock_request.app.state.loads.get_changes.assert_not_awaited()
+
+
+class TestStreamLoads:
+
+    @pytest.fixture
+    def broadcaster(self):
+        broadcaster = LoadsBroadcaster(MagicMock(), buffer_size=4)
+        broadcaster._snapshot = StreamEvent('snapshot', '{"loads":[],"cursor":null}')
+        return broadcaster
+
+    @pytest.fixture
+    def mock_request(self, broadcaster):
+        request = MagicMock()
+        request.app.state.broadcaster = broadcaster
+        return request
+
+    @pytest.mark.asyncio
+    async def test_stream_loads_sse(self, mock_request, broadcaster):
+        from app.api import stream_loads
+
+        result = await stream_loads(mock_request)
+        assert result.media_type == 'text/event-stream'
+        assert len(broadcaster.subscribers) == 1
+
+        broadcaster.push(StreamEvent('changes', '{}'))
+        body = result.body_iterator
+        assert await anext(body) == 'event: snapshot\ndata: {"loads":[],"cursor":null}\n\n'
+        assert await anext(body) == 'event: changes\ndata: {}\n\n'
+
+        # Client gone
+        await body.aclose()
+        assert not broadcaster.subscribers
+
+    @pytest.mark.asyncio
+    async def test_stream_loads_disabled(self, mock_request):
+        from app.api import stream_loads
+
+        mock_request.app.state.broadcaster = None
+
+        with pytest.raises(HTTPException) as exc_info:
+            await stream_loads(mock_request)
+
+        assert exc_info.value.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_stream_loads_ws(self, broadcaster):
+        from app.api import stream_loads_ws
+
+        websocket = AsyncMock()
+        websocket.app.state.broadcaster = broadcaster
+        sent = []
+
+        async def send_text(text):
+            sent.append(json.loads(text))
+            if len(sent) == 1:
+                # Falls behind: reset ends the stream
+                for _ in range(5):
+                    broadcaster.push(HEARTBEAT_EVENT)
+
+        websocket.send_text.side_effect = send_text
+
+        await stream_loads_ws(websocket)
+
+        websocket.accept.assert_awaited_once()
+        assert [message['event'] for message in sent] == ['snapshot', 'reset']
+        websocket.close.assert_awaited_once()
+        assert not broadcaster.subscribers
+
+    @pytest.mark.asyncio
+    async def test_stream_loads_ws_disabled(self):
+        from app.api import stream_loads_ws
+
+        websocket = AsyncMock()
+        websocket.app.state.broadcaster = None
+
+        await stream_loads_ws(websocket)
+
+        websocket.accept.assert_not_awaited()
+        websocket.close.assert_awaited_once()
+
+
+class TestGetHistory:
+
+    @pytest.fixture
+    def mock_loads(self):
+        loads = MagicMock()
+        loads.history_cursor.return_value = 'next_cursor'
+        return loads
+
+    @pytest.fixture
+    def mock_load(self):
+        load = MagicMock()
+        load.safe_dump.return_value = {"id": "test_id", "stage": "history"}
+        return load
+
+    @pytest.mark.asyncio
+    async def test_get_history_full_page(self, mock_loads, mock_load):
+        from app.api import get_history
+
+        mock_loads.get_historicals = AsyncMock(return_value=[mock_load, mock_load])
+
+        response = Response()
+        result = await get_history(response, after='cursor', limit=2, since=None, until=None, loads=mock_loads)
+
+        mock_loads.get_historicals.assert_awaited_once_with(after='cursor', limit=2, since=None, until=None, public=True)
+        mock_loads.history_cursor.assert_called_once_with(mock_load)
+        assert response.headers['Cache-Control'].startswith('public, max-age=')
+        assert result['workload'] == {
+            'len': 2,
+            'loads': [mock_load.safe_dump.return_value] * 2,
+            'next': 'next_cursor'
+        }
+
+    @pytest.mark.asyncio
+    async def test_get_history_last_page(self, mock_loads, mock_load):
+        from app.api import get_history
+
+        mock_loads.get_historicals = AsyncMock(return_value=[mock_load])
+
+        result = await get_history(Response(), after=None, limit=2, since=None, until=None, loads=mock_loads)
+
+        assert result['workload']['next'] is None
+
+    @pytest.mark.asyncio
+    async def test_get_history_malformed_cursor(self, mock_loads):
+        from app.api import get_history
+
+        mock_loads.get_historicals = AsyncMock(side_effect=ValueError('Malformed history cursor'))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_history(Response(), after='garbage', limit=2, since=None, until=None, loads=mock_loads)
+
+        assert exc_info.value.status_code == 400
+
+
+class TestExportLoads:
+
+    ROWS = [
+        ('id1', datetime(2025, 1, 1), datetime(2025, 1, 2), 'external', 'history', 'A', 'B', 'C', 'D'),
+        ('id2', datetime(2025, 1, 3), datetime(2025, 1, 4), 'internal', 'history', 'E', None, None, 'F'),
+    ]
+
+    @pytest.fixture
+    def mock_request(self):
+        async def iter_export(**kwargs):
+            yield self.ROWS[:1]
+            yield self.ROWS[1:]
+
+        request = MagicMock()
+        request.app.state.loads.iter_export = MagicMock(side_effect=iter_export)
+        request.app.state.export_slots = asyncio.Semaphore(1)
+        return request
+
+    @staticmethod
+    async def read_body(response) -> bytes:
+        return b''.join([chunk async for chunk in response.body_iterator])
+
+    @pytest.mark.asyncio
+    async def test_export_csv(self, mock_request):
+        from app.api import export_loads
+
+        response = await export_loads(
+            mock_request, 'csv', False, stage='history', load_type=None, since=None, until=None
+        )
+        body = (await self.read_body(response)).decode()
+
+        mock_request.app.state.loads.iter_export.assert_called_once_with(
+            stage='history', load_type=None, since=None, until=None, batch_size=settings.EXPORT_BATCH_SIZE
+        )
+        assert response.media_type == 'text/csv'
+        assert body.splitlines() == [
+            'id,created_at,modified_at,type,stage,start,engage,clear,finish',
+            'id1,2025-01-01T00:00:00,2025-01-02T00:00:00,external,history,A,B,C,D',
+            'id2,2025-01-03T00:00:00,2025-01-04T00:00:00,internal,history,E,,,F',
+        ]
+
+    @pytest.mark.asyncio
+    async def test_export_ndjson_gzip(self, mock_request):
+        from app.api import export_loads
+
+        response = await export_loads(
+            mock_request, 'ndjson', True, stage=None, load_type=None, since=None, until=None
+        )
+        body = gzip.decompress(await self.read_body(response)).decode()
+
+        assert response.media_type == 'application/gzip'
+        assert 'Content-Encoding' not in response.headers
+        assert 'loads.ndjson.gz' in response.headers['Content-Disposition']
+        records = [json.loads(line) for line in body.splitlines()]
+        assert [record['id'] for record in records] == ['id1', 'id2']
+        assert records[1]['engage'] is None
+        assert records[0]['modified_at'] == '2025-01-02T00:00:00'
+
+    @pytest.mark.asyncio
+    async def test_export_concurrency_capped(self, mock_request):
+        from app.api import export_loads
+
+        first = await export_loads(
+            mock_request, 'csv', False, stage=None, load_type=None, since=None, until=None
+        )
+        chunks = first.body_iterator
+        await chunks.__anext__()
+
+        # The first export holds the only slot until read to the end
+        with pytest.raises(HTTPException) as exc_info:
+            await export_loads(mock_request, 'csv', False, stage=None, load_type=None, since=None, until=None)
+        assert exc_info.value.status_code == 503
+        assert 'Retry-After' in exc_info.value.headers
+
+        [_ async for _ in chunks]
+        second = await export_loads(
+            mock_request, 'csv', False, stage=None, load_type=None, since=None, until=None
+        )
+        assert (await self.read_body(second)).startswith(b'id,')
+
+    @pytest.mark.asyncio
+    async def test_export_csv_empty(self):
+        from app.api import _encode_export_csv
+
+        async def no_batches():
+            return
+            yield
+
+        body = b''.join([chunk async for chunk in _encode_export_csv(no_batches())])
+        assert body.decode().splitlines() == ['id,created_at,modified_at,type,stage,start,engage,clear,finish']
+
+
+class TestAddLoadsBulk:
+
+    @pytest.fixture
+    def mock_loads(self):
+        loads = MagicMock()
+        loads.read_only = False
+        loads.add_many = AsyncMock(return_value=[
+            {'index': 0, 'id': 'a', 'status': 'created', 'error': None},
+            {'index': 1, 'id': 'b', 'status': 'error', 'error': 'Load already exists'},
+        ])
+        return loads
+
+    @pytest.fixture
+    def mock_request(self, mock_loads):
+        request = MagicMock()
+        request.app.state.loads = mock_loads
+        request.headers = {'X-Api-Token': 'token'}
+        request.json = AsyncMock(return_value=[{'id': 'a'}, {'id': 'b'}])
+        return request
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_success(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'):
+            result = await add_loads_bulk(mock_request)
+
+        mock_loads.add_many.assert_awaited_once_with([{'id': 'a'}, {'id': 'b'}])
+        assert result['workload']['created'] == 1
+        assert result['workload']['failed'] == 1
+        assert result['workload']['report'] == mock_loads.add_many.return_value
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('configured', [None, 'other'])
+    async def test_add_loads_bulk_forbidden(self, mock_request, mock_loads, configured):
+        from app.api import add_loads_bulk
+
+        with patch('app.api.settings.BULK_API_TOKEN', configured):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 403
+        mock_loads.connection.assert_not_called()
+        mock_loads.add_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_non_ascii_token(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        mock_request.headers = {'X-Api-Token': 't\u00f6ken'}
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_too_large(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'), patch('app.api.settings.BULK_MAX_LOADS', 1):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_read_only(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        mock_loads.read_only = True
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 503
+        mock_loads.add_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_not_a_list(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        mock_request.json.return_value = {'id': 'a'}
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_add_loads_bulk_invalid_json(self, mock_request, mock_loads):
+        from app.api import add_loads_bulk
+
+        mock_request.json.side_effect = json.JSONDecodeError('Expecting value', '[{', 2)
+        with patch('app.api.settings.BULK_API_TOKEN', 'token'):
+            with pytest.raises(HTTPException) as exc_info:
+                await add_loads_bulk(mock_request)
+
+        assert exc_info.value.status_code == 422
+        mock_loads.add_many.assert_not_called()
+
 
 class TestGetDriver:
 
@@ -316,6 +852,10 @@ class TestGetDriver:
     def mock_request(self):
         request = MagicMock()
         request.app.state.loads = MagicMock()
+        request.app.state.driver_limiter = MemoryAttemptLimiter(max_failures=2, window=60, lockout=10)
+        request.app.state.load_limiter = MemoryAttemptLimiter(max_failures=2, window=60, lockout=2, progressive=False)
+        request.client.host = '203.0.113.7'
+        request.headers = {}
         return request
 
     @pytest.fixture
@@ -332,8 +872,10 @@ class TestGetDriver:
 
         mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
 
-        with patch('app.api.asyncio.sleep', new_callable=AsyncMock):
-            result = await get_driver("test_load_id", "380951234567", mock_request)
+        response = Response()
+        result = await get_driver("test_load_id", "380951234567", mock_request, response)
+
+        assert response.headers['Cache-Control'] == 'no-store'
 
         assert result == {
             'status': 'success',
@@ -350,9 +892,8 @@ class TestGetDriver:
 
         mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=None)
 
-        with patch('app.api.asyncio.sleep', new_callable=AsyncMock):
-            with pytest.raises(HTTPException) as exc_info:
-                await get_driver("invalid_load_id", "380951234567", mock_request)
+        with pytest.raises(HTTPException) as exc_info:
+            await get_driver("invalid_load_id", "380951234567", mock_request, Response())
 
         assert exc_info.value.status_code == 400
         assert exc_info.value.detail == 'Wrong load ID'
@@ -364,9 +905,8 @@ class TestGetDriver:
         mock_load.client_num = "380951234567"
         mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
 
-        with patch('app.api.asyncio.sleep', new_callable=AsyncMock):
-            with pytest.raises(HTTPException) as exc_info:
-                await get_driver("test_load_id", "wrong_auth_num", mock_request)
+        with pytest.raises(HTTPException) as exc_info:
+            await get_driver("test_load_id", "wrong_auth_num", mock_request, Response())
 
         assert exc_info.value.status_code == 401
         assert exc_info.value.detail == {
@@ -376,14 +916,107 @@ class TestGetDriver:
         }
 
     @pytest.mark.asyncio
-    async def test_get_driver_with_delay(self, mock_request, mock_load):
+    async def test_get_driver_not_delayed(self, mock_request, mock_load):
         from app.api import get_driver
 
         mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
 
         with patch('app.api.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
-            await get_driver("test_load_id", "380951234567", mock_request)
-            mock_sleep.assert_called_once_with(2)
+            await get_driver("test_load_id", "380951234567", mock_request, Response())
+            mock_sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_get_driver_locked_out_after_failures(self, mock_request, mock_load):
+        from app.api import get_driver
+
+        mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                await get_driver("test_load_id", "wrong_auth_num", mock_request, Response())
+            assert exc_info.value.status_code == 401
+
+        # Even the right number is refused while locked
+        with pytest.raises(HTTPException) as exc_info:
+            await get_driver("test_load_id", "380951234567", mock_request, Response())
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers == {'Retry-After': '10'}
+
+    @pytest.mark.asyncio
+    async def test_get_driver_load_locked_for_every_ip(self, mock_request, mock_load):
+        from app.api import get_driver
+
+        mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=None)
+
+        for host in ('203.0.113.1', '203.0.113.2'):
+            mock_request.client.host = host
+            with pytest.raises(HTTPException) as exc_info:
+                await get_driver("test_load_id", "380951234567", mock_request, Response())
+            assert exc_info.value.status_code == 400
+
+        mock_request.client.host = '203.0.113.3'
+        with pytest.raises(HTTPException) as exc_info:
+            await get_driver("test_load_id", "380951234567", mock_request, Response())
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers == {'Retry-After': '2'}
+
+        # Further failures from anywhere never lock the load for longer
+        await mock_request.app.state.load_limiter.failed(['load:test_load_id'] * 10)
+        retry_after = await mock_request.app.state.load_limiter.retry_after(['load:test_load_id'])
+        assert 0 < retry_after <= 2
+
+        # Other loads are not affected
+        mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
+        result = await get_driver("other_load_id", "380951234567", mock_request, Response())
+        assert result['status'] == 'success'
+
+    @pytest.mark.asyncio
+    async def test_get_driver_signed_link(self, mock_request, mock_load):
+        from app.api import get_driver
+
+        mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
+        # Locked out by failures from the same IP
+        await mock_request.app.state.driver_limiter.failed(['ip:203.0.113.7'] * 2)
+
+        with patch.object(settings, 'DRIVER_LINK_SECRET', 'test-secret'):
+            token = make_driver_token("test_load_id", "380951234567", 'test-secret', ttl=60)
+            result = await get_driver(
+                "test_load_id", "380951234567", mock_request, Response(), token
+            )
+
+        assert result['status'] == 'success'
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('token', ['', 'garbage', '1.forged'])
+    async def test_get_driver_forged_link(self, mock_request, token):
+        from app.api import get_driver
+
+        mock_request.app.state.loads.get_load_by_id = AsyncMock()
+
+        with patch.object(settings, 'DRIVER_LINK_SECRET', 'test-secret'):
+            with pytest.raises(HTTPException) as exc_info:
+                await get_driver(
+                    "test_load_id", "380951234567", mock_request, Response(), token
+                )
+
+        assert exc_info.value.status_code == 401
+        mock_request.app.state.loads.connection.assert_not_called()
+        mock_request.app.state.loads.get_load_by_id.assert_not_awaited()
+        assert mock_request.app.state.driver_limiter._failures == {}
+        assert mock_request.app.state.load_limiter._failures == {}
+
+    @pytest.mark.asyncio
+    async def test_get_driver_forwarded_for(self, mock_request):
+        from app.api import _client_ip
+
+        mock_request.headers = {'X-Forwarded-For': '198.51.100.1, 203.0.113.9'}
+        assert _client_ip(mock_request) == '203.0.113.7'
+
+        with patch.object(settings, 'TRUST_FORWARDED_FOR', True):
+            assert _client_ip(mock_request) == '203.0.113.9'
+
+        mock_request.client = None
+        assert _client_ip(mock_request) is None
 
     @pytest.mark.asyncio
     async def test_get_driver_database_error(self, mock_request):
@@ -391,9 +1024,8 @@ class TestGetDriver:
 
         mock_request.app.state.loads.get_load_by_id.side_effect = Exception("Database error")
 
-        with patch('app.api.asyncio.sleep', new_callable=AsyncMock):
-            with pytest.raises(Exception, match="Database error"):
-                await get_driver("test_load_id", "380951234567", mock_request)
+        with pytest.raises(Exception, match="Database error"):
+            await get_driver("test_load_id", "380951234567", mock_request, Response())
 
     @pytest.mark.asyncio
     async def test_get_driver_different_auth_formats(self, mock_request, mock_load):
@@ -409,8 +1041,7 @@ class TestGetDriver:
             mock_load.client_num = client_num
             mock_request.app.state.loads.get_load_by_id = AsyncMock(return_value=mock_load)
 
-            with patch('app.api.asyncio.sleep', new_callable=AsyncMock):
-                result = await get_driver("test_load_id", auth_num, mock_request)
+            result = await get_driver("test_load_id", auth_num, mock_request, Response())
 
-                assert result['status'] == 'success'
-                assert result['workload']['driver_name'] == 'John Doe'
+            assert result['status'] == 'success'
+            assert result['workload']['driver_name'] == 'John Doe'
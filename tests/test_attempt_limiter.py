@@ -0,0 +1,62 @@
+import pytest
+from app.attempt_limiter import AttemptLimiter, MemoryAttemptLimiter
+
+
+@pytest.fixture
+def limiter(clock):
+    return MemoryAttemptLimiter(max_failures=3, window=600, lockout=10)
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        AttemptLimiter()
+
+
+def test_lock_duration_is_progressive():
+    limiter = MemoryAttemptLimiter(max_failures=3, window=600, lockout=10)
+    assert [limiter.lock_duration(failures) for failures in range(1, 9)] == [0, 0, 10, 20, 40, 80, 160, 320]
+    assert limiter.lock_duration(1000) == 600
+
+
+def test_lock_duration_fixed():
+    limiter = MemoryAttemptLimiter(max_failures=3, window=600, lockout=5, progressive=False)
+    assert [limiter.lock_duration(failures) for failures in range(1, 7)] == [0, 0, 5, 5, 5, 5]
+    assert limiter.lock_duration(1000) == 5
+
+
+async def test_allowed_below_max_failures(limiter):
+    await limiter.failed(['ip:a'])
+    await limiter.failed(['ip:a'])
+    assert await limiter.retry_after(['ip:a']) == 0
+
+
+async def test_locked_after_max_failures(limiter, clock):
+    for _ in range(3):
+        await limiter.failed(['ip:a', 'load:x'])
+
+    assert await limiter.retry_after(['ip:a']) == 10
+    assert await limiter.retry_after(['ip:b', 'load:x']) == 10
+    assert await limiter.retry_after(['ip:b', 'load:y']) == 0
+
+    clock.now += 10
+    assert await limiter.retry_after(['ip:a']) == 0
+
+    # Next failure doubles the lock
+    await limiter.failed(['ip:a'])
+    assert await limiter.retry_after(['ip:a']) == 20
+
+
+async def test_failures_expire(limiter, clock):
+    for _ in range(3):
+        await limiter.failed(['ip:a'])
+    clock.now += 600
+
+    assert await limiter.retry_after(['ip:a']) == 0
+    assert 'ip:a' not in limiter._failures
+
+
+async def test_keys_bounded(clock):
+    limiter = MemoryAttemptLimiter(max_keys=2)
+    for key in ('ip:a', 'ip:b', 'ip:c'):
+        await limiter.failed([key])
+    assert list(limiter._failures) == ['ip:b', 'ip:c']
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from app.broadcaster import HEARTBEAT_EVENT, RESET_EVENT, LoadsBroadcaster, StreamEvent
+from app.loads.loads import Loads
+
+
+def make_load(load_id: str, stage: str) -> MagicMock:
+    load = MagicMock()
+    load.load_id = load_id
+    load.safe_dump.return_value = {'id': load_id, 'stage': stage}
+    return load
+
+
+@pytest.fixture
+def loads():
+    loads = MagicMock()
+    loads.get_changes = AsyncMock(return_value=([make_load('a', 'start'), make_load('b', 'drive')], [], datetime(2025, 1, 1)))
+    loads.delta_cursor = Loads.delta_cursor
+    return loads
+
+
+@pytest.fixture
+async def broadcaster(loads):
+    broadcaster = LoadsBroadcaster(loads, buffer_size=3)
+    await broadcaster._sync()
+    return broadcaster
+
+
+def drain(subscription) -> list[StreamEvent]:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+async def test_subscribe_starts_with_snapshot(broadcaster):
+    subscription = broadcaster.subscribe()
+
+    [snapshot] = drain(subscription)
+    assert snapshot.name == 'snapshot'
+    assert json.loads(snapshot.data) == {
+        'loads': [{'id': 'a', 'stage': 'start'}, {'id': 'b', 'stage': 'drive'}],
+        'cursor': Loads.delta_cursor(datetime(2025, 1, 1))
+    }
+    # Encoded once for every subscriber
+    assert broadcaster.subscribe().queue.get_nowait() is snapshot
+
+
+async def test_only_differences_are_pushed(broadcaster, loads):
+    subscription = broadcaster.subscribe()
+    drain(subscription)
+
+    loads.get_changes.return_value = (
+        [make_load('a', 'start'), make_load('b', 'finish'), make_load('c', 'start')],
+        ['a', 'x'],
+        datetime(2025, 1, 2)
+    )
+    await broadcaster._sync()
+
+    loads.get_changes.assert_awaited_with(since=datetime(2025, 1, 1), public=True)
+    [changes] = drain(subscription)
+    assert changes.name == 'changes'
+    assert json.loads(changes.data) == {
+        'loads': [{'id': 'b', 'stage': 'finish'}, {'id': 'c', 'stage': 'start'}],
+        'removed': ['a'],
+        'cursor': Loads.delta_cursor(datetime(2025, 1, 2))
+    }
+    assert json.loads(broadcaster.subscribe().queue.get_nowait().data)['loads'] == [
+        {'id': 'b', 'stage': 'finish'},
+        {'id': 'c', 'stage': 'start'}
+    ]
+
+
+async def test_nothing_pushed_without_differences(broadcaster, loads):
+    subscription = broadcaster.subscribe()
+    drain(subscription)
+
+    await broadcaster._sync()
+
+    assert drain(subscription) == []
+
+
+async def test_slow_subscriber_is_reset(broadcaster):
+    slow = broadcaster.subscribe()
+    fast = broadcaster.subscribe()
+    drain(fast)
+
+    for _ in range(3):
+        broadcaster.push(HEARTBEAT_EVENT)
+        drain(fast)
+
+    assert slow not in broadcaster.subscribers
+    assert fast in broadcaster.subscribers
+    assert [event async for event in slow.events()] == [RESET_EVENT]
+
+
+async def test_sync_loop_coalesces_and_retries(broadcaster, loads):
+    loads.get_changes.reset_mock()
+    loads.get_changes.side_effect = [Exception('Database connection failed'), ([], [], datetime(2025, 1, 3))]
+    broadcaster.retry_delay = 0
+    task = asyncio.create_task(broadcaster._run_sync())
+
+    for _ in range(5):
+        broadcaster._wake.set()
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert loads.get_changes.await_count == 2
+    assert broadcaster.cursor == datetime(2025, 1, 3)
+
+
+def test_event_framing():
+    event = StreamEvent('changes', '{"loads":[]}')
+    assert event.sse() == 'event: changes\ndata: {"loads":[]}\n\n'
+    assert json.loads(event.ws()) == {'event': 'changes', 'data': {'loads': []}}
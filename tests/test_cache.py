@@ -0,0 +1,165 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+from app.loads.cache import ActiveLoadsCache
+from app.loads.load import Load, Stages
+
+
+def make_load(load_id: str, stage: str = 'start', minute: int = 0) -> Load:
+    return Load(
+        id=load_id,
+        type='external',
+        stage=stage,
+        stages=Stages(start='Полтава', finish='Варшава'),
+        client_num='380631231212',
+        driver_name='Тарас',
+        driver_num='380637776633',
+        last_update=f'2025-01-01T10:{minute:02}:00'
+    )
+
+
+@pytest.fixture
+def fetch():
+    return AsyncMock(return_value=[make_load('b' * 32, minute=2), make_load('a' * 32, minute=1)])
+
+
+@pytest.fixture
+def cache(fetch):
+    cache = ActiveLoadsCache(fetch, max_age=60, stale_if_error=30)
+    cache.set_tracking(True)
+    return cache
+
+
+async def test_get_all_is_cached_and_ordered(cache, fetch):
+    first = await cache.get_all()
+    second = await cache.get_all()
+
+    fetch.assert_awaited_once()
+    assert [load.load_id for load in first] == ['a' * 32, 'b' * 32]
+    assert first == second
+
+
+async def test_get_all_returns_copies(cache):
+    loads = await cache.get_all()
+    loads[0].change_stage('finish')
+
+    assert (await cache.get_all())[0].stage == 'start'
+    assert cache.peek('a' * 32) is not cache.peek('a' * 32)
+
+
+async def test_concurrent_reads_share_one_fetch(cache, fetch):
+    release = asyncio.Event()
+    loads = fetch.return_value
+
+    async def slow_fetch():
+        await release.wait()
+        return loads
+
+    fetch.side_effect = slow_fetch
+    readers = [asyncio.create_task(cache.get_all()) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*readers)
+
+    assert fetch.await_count == 1
+    assert all(len(result) == 2 for result in results)
+
+
+async def test_invalidate_reloads(cache, fetch):
+    await cache.get_all()
+    cache.invalidate()
+    await cache.get_all()
+
+    assert fetch.await_count == 2
+
+
+async def test_not_tracking_reloads_every_time(cache, fetch):
+    cache.set_tracking(False)
+    await cache.get_all()
+    await cache.get_all()
+
+    assert fetch.await_count == 2
+    assert cache.peek('a' * 32) is None
+
+
+async def test_max_age(cache, fetch):
+    await cache.get_all()
+    with patch('app.loads.cache.time.monotonic', return_value=10 ** 9):
+        await cache.get_all()
+
+    assert fetch.await_count == 2
+
+
+async def test_put_writes_through(cache, fetch):
+    await cache.get_all()
+    cache.put(make_load('c' * 32, minute=3))
+    cache.put(make_load('a' * 32, stage='history'))
+
+    assert [load.load_id for load in await cache.get_all()] == ['b' * 32, 'c' * 32]
+    fetch.assert_awaited_once()
+
+
+async def test_put_during_reload_is_not_lost(cache, fetch):
+    release = asyncio.Event()
+    loads = fetch.return_value
+
+    async def slow_fetch():
+        await release.wait()
+        return loads
+
+    fetch.side_effect = slow_fetch
+    reader = asyncio.create_task(cache.get_all())
+    await asyncio.sleep(0)
+    cache.put(make_load('c' * 32))
+    release.set()
+    await reader
+
+    # The reload started before the write, it is not trusted
+    assert not cache.fresh
+    fetch.side_effect = None
+    fetch.return_value = loads + [make_load('c' * 32)]
+    assert len(await cache.get_all()) == 3
+
+
+async def test_stale_if_error(cache, fetch):
+    await cache.get_all()
+    cache.invalidate()
+    fetch.side_effect = ConnectionError('database is down')
+
+    assert len(await cache.get_all()) == 2
+
+    with patch('app.loads.cache.time.monotonic', return_value=10 ** 9):
+        with pytest.raises(ConnectionError):
+            await cache.get_all()
+
+
+async def test_stale_while_reload_hangs(fetch):
+    cache = ActiveLoadsCache(fetch, max_age=60, stale_if_error=30, reload_timeout=0.05)
+    cache.set_tracking(True)
+    await cache.get_all()
+    cache.invalidate()
+
+    released = asyncio.Event()
+
+    async def hanging_fetch():
+        await released.wait()
+        return [make_load('c' * 32)]
+
+    fetch.side_effect = hanging_fetch
+    assert len(await asyncio.wait_for(cache.get_all(), 1)) == 2
+    assert len(await asyncio.wait_for(cache.get_all(), 1)) == 2
+    # Reads served stale share the reload going on in the background
+    assert fetch.await_count == 2
+
+    reload = cache._inflight
+    released.set()
+    await reload
+    assert [load.load_id for load in await cache.get_all()] == ['c' * 32]
+    assert fetch.await_count == 2
+
+
+async def test_error_without_snapshot(cache, fetch):
+    fetch.side_effect = ConnectionError('database is down')
+
+    with pytest.raises(ConnectionError):
+        await cache.get_all()
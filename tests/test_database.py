@@ -1,10 +1,20 @@
 
+import asyncio
+import json
+from datetime import datetime
 import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException, Response
+from psycopg.errors import ReadOnlySqlTransaction
 from app.loads.loads import Loads
+from app.broadcaster import LoadsBroadcaster
+from app.attempt_limiter import MemoryAttemptLimiter, PostgresAttemptLimiter
+from app.leader import LeaderElection
+from app.tg_interface.update_dedup import PostgresUpdateDeduplicator
 import app.loads.queries as queries
-from app.loads.load import Load, Stages
+from app.loads.load import Load, PublicLoad, Stages
 from app import settings
-from psycopg import sql
+from psycopg import AsyncConnection, sql
 
 
 TEST_DB_NAME = 'test_loads'
@@ -42,6 +52,7 @@ async def db_instance():
     ) as instance:
         await instance.execute_query(queries.DROP_ALL_TABLES)
         await instance.initialise_db_if_empty()
+        await instance.refresh_lookups()
         await instance.execute_query(queries.ADD_FAKE_DATA)
         yield instance
 
@@ -97,6 +108,36 @@ async def test_get_historicals(db_instance: Loads):
     assert isinstance(historical_loads[0], Load)
 
 
+@pytest.mark.integration
+async def test_public_reads_match_safe_dump(db_instance: Loads):
+    actives = await db_instance.get_actives()
+    public = await db_instance.get_actives(public=True)
+    assert all(isinstance(load, PublicLoad) for load in public)
+    assert [load.safe_dump() for load in public] == [load.safe_dump() for load in actives]
+
+    history = await db_instance.get_historicals(limit=10, public=True)
+    assert [load.safe_dump() for load in history] == [
+        load.safe_dump() for load in await db_instance.get_historicals(limit=10)
+    ]
+
+    changed, _, _ = await db_instance.get_changes(public=True)
+    assert {load.load_id for load in changed} == {load.load_id for load in actives}
+
+
+@pytest.mark.integration
+async def test_public_reads_skip_sensitive_tables(db_instance: Loads):
+    query = queries.CTE_SELECT_PUBLIC_LOADS + queries.FILTER_ACTIVE_LOADS
+    [[plan]] = await db_instance.execute_query('explain (format json) ' + query)
+    assert 'clients' not in json.dumps(plan)
+    assert 'drivers' not in json.dumps(plan)
+
+
+@pytest.mark.integration
+async def test_status_sequence_follows_seed(db_instance: Loads):
+    [[next_id]] = await db_instance.execute_query("select nextval('load_statuses_load_status_id_seq')")
+    assert next_id > queries.HISTORY_STATUS_ID
+
+
 @pytest.mark.integration
 async def test_add_load(db_instance: Loads, load):
     load_id = await db_instance.add(load)
@@ -208,3 +249,696 @@ async def test_get_qty_of_actives(db_instance):
 async def test_get_qty_of_historicals(db_instance):
     historicals_count = await db_instance.get_qty_of_historicals()
     assert historicals_count == 1
+
+
+@pytest.mark.integration
+async def test_connection_is_reused_within_block(db_instance: Loads):
+    async with db_instance.connection():
+        first = await db_instance.execute_query('select pg_backend_pid()')
+        second = await db_instance.execute_query('select pg_backend_pid()')
+    assert first == second
+
+
+@pytest.mark.integration
+async def test_concurrent_queries_use_pool(db_instance: Loads):
+    results = await asyncio.gather(*(db_instance.get_actives() for _ in range(20)))
+    assert all(len(actives) == len(results[0]) for actives in results)
+    assert db_instance.pool.get_stats()['pool_size'] <= db_instance.pool_max_size
+
+
+@pytest.mark.integration
+async def test_add_load_reuses_client_and_driver(db_instance: Loads, load):
+    repeat = load.model_copy(update={'load_id': '0' * 32, 'stage': 'history'})
+    select_versions = """
+        select c.xmin::text, d.xmin::text
+        from clients c, drivers d
+        where c.phone_num = %s and d.phone_num = %s and d.name_surname = %s
+    """
+    params = (repeat.client_num, repeat.driver_num, repeat.driver_name)
+    before = await db_instance.execute_query(select_versions, *params)
+
+    assert await db_instance.add(repeat) == repeat.load_id
+
+    after = await db_instance.execute_query(select_versions, *params)
+    assert before == after
+
+
+@pytest.mark.integration
+async def test_transition(db_instance: Loads):
+    load_id = '9264575ff59944ebac30d8ffc38280bb'
+    before = await db_instance.get_load_by_id(load_id)
+
+    moved = await db_instance.transition(load_id, 'finish')
+
+    assert isinstance(moved, Load)
+    assert moved.stage == 'finish'
+    assert moved.last_update > before.last_update
+    assert moved == await db_instance.get_load_by_id(load_id)
+
+
+@pytest.mark.integration
+async def test_transition_missing_load(db_instance: Loads):
+    assert await db_instance.transition('f' * 32, 'finish') is None
+
+
+@pytest.mark.integration
+async def test_transition_wrong_stage(db_instance: Loads):
+    with pytest.raises(ValueError):
+        await db_instance.transition('9264575ff59944ebac30d8ffc38280bb', 'wrong_parameter')
+
+
+@pytest.mark.integration
+async def test_hot_queries_are_prepared(db_instance: Loads):
+    async with db_instance.connection():
+        await db_instance.get_actives()
+        rows = await db_instance.execute_query(
+            'select count(*) from pg_prepared_statements where from_sql is false'
+        )
+    assert rows[0][0] > 0
+
+
+@pytest.mark.integration
+async def test_prepared_statements_can_be_disabled():
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        prepare_threshold=None
+    ) as instance:
+        async with instance.connection():
+            await instance.get_actives()
+            rows = await instance.execute_query('select count(*) from pg_prepared_statements')
+    assert rows[0][0] == 0
+
+
+@pytest.mark.integration
+async def test_get_historicals_pages(db_instance: Loads):
+    everything = await db_instance.get_historicals()
+    assert len(everything) >= 2
+
+    pages = []
+    cursor = None
+    while page := await db_instance.get_historicals(after=cursor, limit=1):
+        pages.extend(page)
+        cursor = db_instance.history_cursor(page[-1])
+
+    assert [load.load_id for load in pages] == [load.load_id for load in everything]
+
+
+@pytest.mark.integration
+async def test_get_historicals_bounded(db_instance: Loads):
+    newest = (await db_instance.get_historicals(limit=1))[0]
+    assert await db_instance.get_historicals(since=newest.last_update) == [newest]
+    assert newest not in await db_instance.get_historicals(until=newest.last_update)
+
+
+@pytest.mark.integration
+async def test_get_historicals_malformed_cursor(db_instance: Loads):
+    with pytest.raises(ValueError):
+        await db_instance.get_historicals(after='garbage')
+
+
+@pytest.mark.integration
+async def test_iter_export_batches(db_instance: Loads):
+    count = (await db_instance.execute_query('select count(*) from loads'))[0][0]
+    batches = [rows async for rows in db_instance.iter_export(batch_size=1)]
+
+    assert len(batches) == count
+    assert all(len(rows) == 1 for rows in batches)
+    assert all(len(rows[0]) == len(queries.EXPORT_LOADS_COLUMNS) for rows in batches)
+    modified = [rows[0][2] for rows in batches]
+    assert modified == sorted(modified)
+
+
+@pytest.mark.integration
+async def test_iter_export_filters(db_instance: Loads):
+    rows = [row async for batch in db_instance.iter_export(stage='history', load_type='external') for row in batch]
+
+    assert len(rows) <= await db_instance.get_qty_of_historicals()
+    assert all(row[3] == 'external' and row[4] == 'history' for row in rows)
+    assert [row async for row in db_instance.iter_export(since=datetime.now())] == []
+
+
+@pytest.mark.integration
+async def test_add_many(db_instance: Loads, load):
+    new = {
+        'type': 'internal',
+        'stage': 'history',
+        'stages': {'start': 'Львів', 'finish': 'Одеса'},
+        'client_num': '380500000001',
+        'driver_name': 'Богдан',
+        'driver_num': '380500000002'
+    }
+    batch = [
+        new,
+        {**new, 'id': 'a' * 32},
+        {**new, 'id': 'a' * 32},        # duplicate in batch
+        {**new, 'type': 'cargo'},       # invalid
+        {**new, 'client_num': '380'},   # too short for the database
+        {**new, 'id': load.load_id},    # already added
+    ]
+
+    report = await db_instance.add_many(batch)
+
+    assert [entry['status'] for entry in report] == ['created', 'created', 'error', 'error', 'error', 'error']
+    assert [entry['index'] for entry in report] == list(range(len(batch)))
+    assert report[1]['id'] == 'a' * 32
+    assert report[2]['error'] == 'Duplicate load ID in batch'
+    assert report[3]['id'] is None and report[3]['error'].startswith('type')
+    assert report[5]['error'] == 'Load already exists'
+
+    created = await db_instance.get_load_by_id('a' * 32)
+    assert created.client_num == new['client_num']
+    assert created.stages.finish == 'Одеса'
+    assert await db_instance.get_load_by_id(report[0]['id']) is not None
+
+
+@pytest.mark.integration
+async def test_add_many_ignores_last_update(db_instance: Loads):
+    future = {
+        'id': '8' * 32,
+        'type': 'internal',
+        'stage': 'history',
+        'stages': {'start': 'Львів', 'finish': 'Одеса'},
+        'client_num': '380500000001',
+        'driver_name': 'Богдан',
+        'driver_num': '380500000002',
+        'last_update': datetime(2030, 1, 1)
+    }
+    [created] = await db_instance.add_many([future])
+    assert created['status'] == 'created'
+
+    added = await db_instance.get_load_by_id('8' * 32)
+    assert added.last_update < datetime(2030, 1, 1)
+
+
+@pytest.mark.integration
+async def test_add_many_empty(db_instance: Loads):
+    assert await db_instance.add_many([]) == []
+
+
+@pytest.mark.integration
+async def test_transition_many(db_instance: Loads):
+    load_id = 'a' * 32  # Added by test_add_many
+    await db_instance.transition(load_id, 'finish')
+
+    moved = await db_instance.transition_many([load_id, 'b' * 32], 'history', from_stage='finish')
+    assert [load.load_id for load in moved] == [load_id]
+    assert moved[0].stage == 'history'
+    assert moved[0].client_num == '380500000001'
+
+    # Not in 'finish' anymore
+    assert await db_instance.transition_many([load_id], 'start', from_stage='finish') == []
+    assert await db_instance.transition_many([], 'history') == []
+
+
+@pytest.mark.integration
+async def test_transition_many_wrong_stage(db_instance: Loads):
+    with pytest.raises(ValueError):
+        await db_instance.transition_many(['a' * 32], 'wrong_stage')
+
+
+@pytest.mark.integration
+async def test_lookups_loaded(db_instance: Loads):
+    assert db_instance.status_ids['history'] == queries.HISTORY_STATUS_ID
+    assert set(db_instance.status_ids) == {'start', 'engage', 'drive', 'clear', 'finish', 'history'}
+    assert set(db_instance.type_ids) == {'external', 'internal'}
+    with pytest.raises(TypeError):
+        db_instance.status_ids['new'] = 7  # noqa
+
+
+@pytest.mark.integration
+async def test_lookup_refreshed_on_miss(db_instance: Loads):
+    await db_instance.execute_query("insert into load_statuses (load_status_id, status) values (7, 'pause')")
+    try:
+        assert 'pause' not in db_instance.status_ids
+        assert await db_instance.status_id('pause') == 7
+        with pytest.raises(ValueError):
+            await db_instance.status_id('wrong_stage')
+    finally:
+        await db_instance.execute_query("delete from load_statuses where status = 'pause'")
+        await db_instance.refresh_lookups()
+
+
+@pytest.mark.integration
+async def test_refresh_lookups_checks_history_id(db_instance: Loads):
+    await db_instance.execute_query("update load_statuses set status = 'archive' where load_status_id = 6")
+    try:
+        with pytest.raises(RuntimeError):
+            await db_instance.refresh_lookups()
+    finally:
+        await db_instance.execute_query("update load_statuses set status = 'history' where load_status_id = 6")
+        await db_instance.refresh_lookups()
+
+
+@pytest.mark.integration
+async def test_get_changes(db_instance: Loads):
+    since = await db_instance.get_high_water()
+    new = {
+        'type': 'internal',
+        'stage': 'start',
+        'stages': {'start': 'Суми', 'finish': 'Ужгород'},
+        'client_num': '380500000003',
+        'driver_name': 'Остап',
+        'driver_num': '380500000004'
+    }
+    await db_instance.add_many([{**new, 'id': 'd' * 32}, {**new, 'id': 'e' * 32}])
+
+    changed, removed, high_water = await db_instance.get_changes(since=since)
+    assert {'d' * 32, 'e' * 32} <= {load.load_id for load in changed}
+    assert high_water >= since
+
+    await db_instance.transition('d' * 32, 'history')
+    await db_instance.transition('e' * 32, 'drive')
+
+    changed, removed, _ = await db_instance.get_changes(since=high_water)
+    assert 'e' * 32 in {load.load_id for load in changed}
+    assert 'd' * 32 not in {load.load_id for load in changed}
+    assert 'd' * 32 in removed
+
+    # Left the filtered stage
+    changed, removed, _ = await db_instance.get_changes(since=high_water, stage='start', load_type='internal')
+    assert all(load.stage == 'start' and load.load_type == 'internal' for load in changed)
+    assert {'d' * 32, 'e' * 32} <= set(removed)
+
+    # Without a moment, every matching active load and nothing removed
+    changed, removed, _ = await db_instance.get_changes(stage='drive')
+    assert 'e' * 32 in {load.load_id for load in changed}
+    assert removed == []
+
+
+@pytest.mark.integration
+async def test_high_water_ignores_last_update(db_instance: Loads):
+    since = await db_instance.get_high_water()
+    future = Load(
+        type='internal',
+        stage='start',
+        stages=Stages(start='Суми', finish='Ужгород'),
+        client_num='380500000003',
+        driver_name='Остап',
+        driver_num='380500000004',
+        id='9' * 32,
+        last_update=datetime(2030, 1, 1)
+    )
+    await db_instance.add(future)
+    try:
+        changed, _, high_water = await db_instance.get_changes(since=since)
+        assert '9' * 32 in {load.load_id for load in changed}
+        assert high_water < datetime(2030, 1, 1).astimezone()
+
+        # A load written later is still seen past the returned mark
+        await db_instance.transition('9' * 32, 'drive')
+        changed, _, _ = await db_instance.get_changes(since=high_water)
+        assert '9' * 32 in {load.load_id for load in changed}
+    finally:
+        await db_instance.execute_query('delete from loads where loads_id = %s', '9' * 32)
+
+
+@pytest.mark.integration
+async def test_get_changes_history_stage(db_instance: Loads):
+    with pytest.raises(ValueError):
+        await db_instance.get_changes(stage='history')
+
+
+@pytest.mark.integration
+async def test_delta_cursor_roundtrip(db_instance: Loads):
+    high_water = await db_instance.get_high_water()
+    assert Loads.parse_delta_cursor(Loads.delta_cursor(high_water)) == high_water
+    with pytest.raises(ValueError):
+        Loads.parse_delta_cursor('garbage!')
+
+
+@pytest.mark.integration
+async def test_load_row_matches_validated_load(db_instance: Loads):
+    loads = await db_instance.get_actives() + await db_instance.get_historicals()
+    assert loads
+    for hydrated in loads:
+        validated = Load(
+            type=hydrated.load_type,
+            stage=hydrated.stage,
+            stages=Stages(**hydrated.stages.model_dump()),
+            client_num=hydrated.client_num,
+            driver_name=hydrated.driver_name,
+            driver_num=hydrated.driver_num,
+            id=hydrated.load_id,
+            last_update=hydrated.last_update
+        )
+        assert hydrated == validated
+        assert hydrated.safe_dump() == validated.safe_dump()
+
+
+@pytest.fixture
+async def cached_instance(db_instance):
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        cache_actives=True
+    ) as instance:
+        yield instance
+
+
+@pytest.mark.integration
+async def test_cached_actives_match_database(cached_instance: Loads, db_instance: Loads):
+    assert cached_instance.cache.fresh
+    assert await cached_instance.get_actives() == await db_instance.get_actives()
+    assert await cached_instance.get_qty_of_actives() == await db_instance.get_qty_of_actives()
+
+
+@pytest.mark.integration
+async def test_cache_invalidated_by_other_process(cached_instance: Loads, db_instance: Loads):
+    load_id = '9264575ff59944ebac30d8ffc38280bb'
+    await cached_instance.get_actives()
+
+    await db_instance.transition(load_id, 'clear')
+    for _ in range(100):
+        if not cached_instance.cache.fresh:
+            break
+        await asyncio.sleep(0.01)
+
+    assert (await cached_instance.get_load_by_id(load_id)).stage == 'clear'
+    assert load_id in [load.load_id for load in await cached_instance.get_actives()]
+
+
+@pytest.mark.integration
+async def test_cache_written_through(cached_instance: Loads):
+    load_id = '9264575ff59944ebac30d8ffc38280bb'
+    await cached_instance.get_actives()
+
+    await cached_instance.transition(load_id, 'drive')
+
+    # Served from the written through snapshot or reloaded after the own
+    # notification, either way the reader sees its write
+    assert (await cached_instance.get_load_by_id(load_id)).stage == 'drive'
+    assert [load.stage for load in await cached_instance.get_actives() if load.load_id == load_id] == ['drive']
+
+
+@pytest.mark.integration
+async def test_listener_reconnects(cached_instance: Loads, db_instance: Loads):
+    listener = cached_instance.listener
+    await db_instance.execute_query("""
+        select pg_terminate_backend(pid) from pg_stat_activity
+        where datname = current_database() and query ilike 'listen%%'
+    """)
+    for _ in range(100):
+        if not listener.listening.is_set():
+            break
+        await asyncio.sleep(0.01)
+    assert not cached_instance.cache.fresh
+
+    # Still served, straight from the database
+    assert len(await cached_instance.get_actives()) == await db_instance.get_qty_of_actives()
+
+    await asyncio.wait_for(listener.listening.wait(), timeout=5)
+    await cached_instance.get_actives()
+    assert cached_instance.cache.fresh
+
+
+@pytest.mark.integration
+async def test_broadcaster_pushes_changes(db_instance: Loads):
+    broadcaster = LoadsBroadcaster(db_instance)
+    await broadcaster.start()
+    try:
+        subscription = broadcaster.subscribe()
+        events = subscription.events()
+        snapshot = await anext(events)
+        assert snapshot.name == 'snapshot'
+
+        await db_instance.add_many([{
+            'id': '1' * 32,
+            'type': 'internal',
+            'stage': 'start',
+            'stages': {'start': 'Рівне', 'finish': 'Луцьк'},
+            'client_num': '380500000005',
+            'driver_name': 'Тарас',
+            'driver_num': '380500000006'
+        }])
+        changes = await asyncio.wait_for(anext(events), timeout=5)
+        assert changes.name == 'changes'
+        assert '1' * 32 in [load['id'] for load in json.loads(changes.data)['loads']]
+
+        await db_instance.transition('1' * 32, 'history')
+        changes = await asyncio.wait_for(anext(events), timeout=5)
+        assert json.loads(changes.data)['removed'] == ['1' * 32]
+    finally:
+        await broadcaster.stop()
+
+
+@pytest.mark.integration
+async def test_postgres_attempt_limiter(db_instance: Loads):
+    limiter = PostgresAttemptLimiter(db_instance, max_failures=2, window=60, lockout=30)
+    keys = ['ip:test-limiter', 'load:test-limiter']
+
+    assert await limiter.retry_after(keys) == 0
+    await limiter.failed(keys)
+    assert await limiter.retry_after(keys) == 0
+    await limiter.failed(keys)
+    assert 29 < await limiter.retry_after(keys) <= 30
+    assert 29 < await limiter.retry_after(['load:test-limiter']) <= 30
+    assert await limiter.retry_after(['ip:other']) == 0
+
+    # Shared with every worker
+    other_worker = PostgresAttemptLimiter(db_instance, max_failures=2, window=60, lockout=30)
+    assert await other_worker.retry_after(keys) > 0
+
+
+@pytest.fixture
+async def filtered_instance(db_instance):
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        filter_ids=True
+    ) as instance:
+        yield instance
+
+
+async def wait_fresh(known_ids):
+    for _ in range(100):
+        if known_ids.fresh:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('Load ID filter not rebuilt')
+
+
+@pytest.mark.integration
+async def test_unknown_ids_skip_database(filtered_instance: Loads, db_instance: Loads):
+    await wait_fresh(filtered_instance.known_ids)
+    known_id = '9264575ff59944ebac30d8ffc38280ba'
+    assert (await filtered_instance.get_load_by_id(known_id)).load_id == known_id
+
+    filtered_instance.execute_query = AsyncMock(side_effect=AssertionError('Database queried'))
+    assert await filtered_instance.get_load_by_id('f' * 32) is None
+
+
+@pytest.mark.integration
+async def test_unknown_driver_ids_skip_pool(filtered_instance: Loads):
+    from app.api import get_driver
+
+    await wait_fresh(filtered_instance.known_ids)
+    request = MagicMock()
+    request.app.state.loads = filtered_instance
+    request.app.state.driver_limiter = MemoryAttemptLimiter(max_failures=2, window=60, lockout=10)
+    request.app.state.load_limiter = MemoryAttemptLimiter(max_failures=2, window=60, lockout=2, progressive=False)
+    request.client.host = '203.0.113.7'
+    request.headers = {}
+
+    filtered_instance.pool.connection = MagicMock(side_effect=AssertionError('Connection checked out'))
+    with pytest.raises(HTTPException) as exc_info:
+        await get_driver('f' * 32, '380951234567', request, Response())
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.integration
+async def test_ids_added_elsewhere_are_found(filtered_instance: Loads, db_instance: Loads):
+    await wait_fresh(filtered_instance.known_ids)
+    new = {
+        'type': 'internal',
+        'stage': 'start',
+        'stages': {'start': 'Черкаси', 'finish': 'Чернігів'},
+        'client_num': '380500000007',
+        'driver_name': 'Левко',
+        'driver_num': '380500000008'
+    }
+
+    # By this instance
+    load_id = await filtered_instance.add(Load(**new))
+    assert await filtered_instance.get_load_by_id(load_id) is not None
+
+    # By another process: found once its insert is notified
+    [created] = await db_instance.add_many([new])
+    for _ in range(100):
+        if await filtered_instance.get_load_by_id(created['id']) is not None:
+            break
+        await asyncio.sleep(0.01)
+    else:
+        raise AssertionError('Load added elsewhere not found')
+    await wait_fresh(filtered_instance.known_ids)
+    assert await filtered_instance.get_load_by_id(created['id']) is not None
+
+
+@pytest.mark.integration
+async def test_leader_election(db_instance: Loads):
+    elected = []
+
+    def election(name):
+        async def on_elected():
+            elected.append(name)
+        return LeaderElection(db_instance.get_conn_url(), 4242, on_elected, retry_interval=0.05)
+
+    first, second = election('first'), election('second')
+    await first.start(timeout=5)
+    await second.start(timeout=5)
+    try:
+        assert first.is_leader and not second.is_leader
+        assert elected == ['first']
+
+        # Leadership passes over once the leader connection closes
+        await first.stop()
+        for _ in range(100):
+            if second.is_leader:
+                break
+            await asyncio.sleep(0.01)
+        assert elected == ['first', 'second']
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+@pytest.mark.integration
+async def test_read_only_instance(db_instance: Loads):
+    load = Load(
+        id='c' * 32,
+        type='internal',
+        stage='start',
+        stages={'start': 'Вінниця', 'finish': 'Житомир'},
+        client_num='380500000009',
+        driver_name='Іван',
+        driver_num='380500000010'
+    )
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        read_only=True
+    ) as instance:
+        public = await instance.get_actives(public=True)
+        assert [load.load_id for load in public] == [load.load_id for load in await db_instance.get_actives()]
+
+        with pytest.raises(ReadOnlySqlTransaction):
+            await instance.add(load)
+        assert await db_instance.get_load_by_id(load.load_id) is None
+
+
+@pytest.mark.integration
+async def test_read_only_standby(db_instance: Loads, monkeypatch):
+    # A hot standby refuses LISTEN, the instance must not wait for it
+    monkeypatch.setattr(queries, 'IN_RECOVERY', 'select true')
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD,
+        cache_actives=True,
+        filter_ids=True,
+        read_only=True
+    ) as instance:
+        assert instance.standby
+        assert instance.listener is None
+        assert instance.cache is None and instance.known_ids is None
+        assert len(await instance.get_actives()) == len(await db_instance.get_actives())
+
+
+@pytest.mark.integration
+async def test_postgres_update_deduplicator(db_instance: Loads):
+    first, second = PostgresUpdateDeduplicator(db_instance), PostgresUpdateDeduplicator(db_instance)
+
+    # Shared by every worker
+    assert await first.first_seen(900001)
+    assert not await second.first_seen(900001)
+    assert not await first.first_seen(900001)
+    assert first.dropped == 1 and second.dropped == 1
+
+    # Received again after the TTL
+    await db_instance.execute_query(
+        "update tg_updates set received_at = now() - interval '2 days' where update_id = 900001"
+    )
+    assert await second.first_seen(900001)
+
+
+@pytest.mark.integration
+async def test_add_load_with_client_inserted_concurrently(db_instance: Loads):
+    new = Load(
+        type='internal',
+        stage='start',
+        stages=Stages(start='Умань', finish='Луцьк'),
+        client_num='380500000011',
+        driver_name='Остап',
+        driver_num='380500000012'
+    )
+    # Its own pool, which can grow in the loop of this test
+    async with Loads(
+        db_host=settings.DB_HOST,
+        db_port=settings.DB_PORT,
+        db_name=TEST_DB_NAME,
+        db_user=settings.DB_USER,
+        db_password=settings.DB_PASSWORD
+    ) as instance:
+        async with await AsyncConnection.connect(instance.get_conn_url()) as conn:
+            await conn.execute('insert into clients (phone_num) values (%s)', (new.client_num,))
+            # Blocks on the uncommitted client, then misses it once committed
+            adding = asyncio.create_task(instance.add(new))
+            for _ in range(100):
+                [[waiting]] = await instance.execute_query(
+                    "select count(*) from pg_stat_activity where wait_event_type = 'Lock'"
+                )
+                if waiting:
+                    break
+                await asyncio.sleep(0.01)
+            else:
+                raise AssertionError('Load not waiting for the client')
+            await conn.commit()
+
+        assert await adding == new.load_id
+    assert (await db_instance.get_load_by_id(new.load_id)).client_num == new.client_num
+
+
+@pytest.mark.integration
+async def test_concurrent_startup():
+    db_name = 'test_loads_startup'
+
+    def open_loads(name: str, **kwargs) -> Loads:
+        return Loads(
+            db_host=settings.DB_HOST,
+            db_port=settings.DB_PORT,
+            db_name=name,
+            db_user=settings.DB_USER,
+            db_password=settings.DB_PASSWORD,
+            **kwargs
+        )
+
+    async def start():
+        async with open_loads(db_name) as instance:
+            return await instance.status_id('history')
+
+    async with open_loads(settings.DB_NAME, autocommit=True) as database_helper:
+        for statement in ('DROP DATABASE IF EXISTS {} WITH (FORCE);', 'CREATE DATABASE {};'):
+            await database_helper.execute_query(sql.SQL(statement).format(sql.Identifier(db_name)).as_string())
+        try:
+            # Workers booting at once on a fresh database, then on an initialised one
+            for _ in range(2):
+                started = await asyncio.gather(*(start() for _ in range(8)), return_exceptions=True)
+                assert started == [queries.HISTORY_STATUS_ID] * 8
+        finally:
+            await database_helper.execute_query(
+                sql.SQL('DROP DATABASE {} WITH (FORCE);').format(sql.Identifier(db_name)).as_string()
+            )
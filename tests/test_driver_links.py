@@ -0,0 +1,68 @@
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
+from app.driver_links import make_driver_token, verify_driver_token, driver_link
+from app.loads.load import Load
+from app import settings
+
+SECRET = 'test-secret'
+LOAD_ID = 'a' * 32
+CLIENT_NUM = '380951234567'
+NOW = 1_700_000_000
+
+
+def test_token_verified():
+    token = make_driver_token(LOAD_ID, CLIENT_NUM, SECRET, ttl=60, now=NOW)
+    assert token.startswith(f'{NOW + 60}.')
+    assert verify_driver_token(LOAD_ID, CLIENT_NUM, token, SECRET, now=NOW + 59)
+
+
+def test_token_expired():
+    token = make_driver_token(LOAD_ID, CLIENT_NUM, SECRET, ttl=60, now=NOW)
+    assert not verify_driver_token(LOAD_ID, CLIENT_NUM, token, SECRET, now=NOW + 60)
+
+
+def test_token_bound_to_pair_and_secret():
+    token = make_driver_token(LOAD_ID, CLIENT_NUM, SECRET, ttl=60, now=NOW)
+    assert not verify_driver_token('b' * 32, CLIENT_NUM, token, SECRET, now=NOW)
+    assert not verify_driver_token(LOAD_ID, '380950000000', token, SECRET, now=NOW)
+    assert not verify_driver_token(LOAD_ID, CLIENT_NUM, token, 'other-secret', now=NOW)
+    assert not verify_driver_token(LOAD_ID, CLIENT_NUM, token, None, now=NOW)
+
+
+def test_token_tampered():
+    token = make_driver_token(LOAD_ID, CLIENT_NUM, SECRET, ttl=60, now=NOW)
+    expires, _, signature = token.partition('.')
+    # Extending the expiry breaks the signature
+    assert not verify_driver_token(LOAD_ID, CLIENT_NUM, f'{int(expires) + 3600}.{signature}', SECRET, now=NOW)
+    for forged in ('', 'garbage', f'{expires}.', f'-1.{signature}', f'{expires}.{signature[:-1]}'):
+        assert not verify_driver_token(LOAD_ID, CLIENT_NUM, forged, SECRET, now=NOW)
+
+
+def test_token_malformed_expiry():
+    # Non-ASCII digits, and more digits than int() converts
+    for forged in ('\u00b2.abc', '\u0661\u0662.abc', f'{"9" * 5000}.abc'):
+        assert not verify_driver_token(LOAD_ID, CLIENT_NUM, forged, SECRET, now=NOW)
+
+
+def test_driver_link():
+    load = Load(
+        type='internal',
+        stage='start',
+        stages={'start': 'Kyiv', 'finish': 'Lviv'},
+        client_num=CLIENT_NUM,
+        driver_name='Driver',
+        driver_num='380501234567',
+        id=LOAD_ID
+    )
+
+    with patch.object(settings, 'DRIVER_LINK_SECRET', None):
+        assert driver_link(load) is None
+
+    with patch.object(settings, 'DRIVER_LINK_SECRET', SECRET), \
+            patch.object(settings, 'DRIVER_LINK_BASE', 'https://example.com/driver'):
+        link = urlsplit(driver_link(load))
+        query = {name: values[0] for name, values in parse_qs(link.query).items()}
+        assert link.netloc == 'example.com'
+        assert query['load_id'] == LOAD_ID
+        assert query['auth_num'] == CLIENT_NUM
+        assert verify_driver_token(LOAD_ID, CLIENT_NUM, query['token'], SECRET)
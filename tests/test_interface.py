@@ -1,9 +1,12 @@
+import re
 
 import pytest, pytest_asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
-from app.tg_interface.interface import AsyncTelegramInterface
+from app.tg_interface.interface import AsyncTelegramInterface, derive_webhook_secret, update_ordering_key
 from app.tg_interface import reply_buttons
+from app.tg_interface.update_dedup import MemoryUpdateDeduplicator
 from telegram import Update
+from telegram.error import RetryAfter
 
 
 def test_get_reply_kbd():
@@ -34,6 +37,7 @@ async def mocked_iface():
         mock_app_builder_cls.return_value = mock_app_builder
 
         mock_loads = AsyncMock()
+        mock_loads.connection = MagicMock()
         iface = AsyncTelegramInterface(
             token='some_telegram_token:123457890',
             webhook_url='/telegram-webhook-url/',
@@ -55,6 +59,66 @@ async def test_interface_init(mocked_iface):
     mocked_iface.app.bot.set_webhook.assert_awaited_once()
 
 
+def test_derive_webhook_secret():
+    secret = derive_webhook_secret('some_telegram_token:123457890')
+    assert secret == derive_webhook_secret('some_telegram_token:123457890')
+    assert secret != derive_webhook_secret('other_telegram_token:123457890')
+    assert 'some_telegram_token' not in secret
+    assert re.fullmatch(r'[A-Za-z0-9_-]{1,256}', secret)
+
+
+@pytest.mark.parametrize('data, key', [
+    (
+        {'update_id': 1, 'callback_query': {'data': 'set_drive:' + 'a' * 32, 'message': {'chat': {'id': -100}}}},
+        'load:' + 'a' * 32
+    ),
+    ({'update_id': 2, 'callback_query': {'data': 'garbage', 'message': {'chat': {'id': -100}}}}, 'chat:-100'),
+    ({'update_id': 3, 'message': {'chat': {'id': -100}, 'text': 'Show deleted'}}, 'chat:-100'),
+    ({'update_id': 4, 'edited_message': {'chat': {'id': 42}}}, 'chat:42'),
+    ({'update_id': 5, 'poll': {'id': '1'}}, None),
+])
+def test_update_ordering_key(data, key):
+    assert update_ordering_key(data) == key
+
+
+async def test_interface_clustered():
+    with patch('app.tg_interface.interface.ApplicationBuilder') as mock_app_builder_cls:
+        mock_app = AsyncMock()
+        mock_app.add_error_handler = MagicMock()
+        mock_app.add_handler = MagicMock()
+        mock_app_builder_cls.return_value.token.return_value.build.return_value = mock_app
+
+        iface = AsyncTelegramInterface(
+            token='some_telegram_token:123457890',
+            webhook_url='/telegram-webhook-url/',
+            chat_id=-123498765,
+            loads=AsyncMock(),
+            secret='shared_secret',
+            manage_webhook=False
+        )
+        async with iface:
+            # Left to the leader
+            mock_app.bot.set_webhook.assert_not_awaited()
+            await iface.set_webhook()
+        mock_app.bot.set_webhook.assert_awaited_once_with(
+            url='/telegram-webhook-url/',
+            secret_token='shared_secret'
+        )
+        mock_app.bot.delete_webhook.assert_not_awaited()
+
+
+@patch('app.tg_interface.interface.Update.de_json')
+async def test_webhook_entrypoint_drops_replays(mock_de_json, mocked_iface):
+    mocked_iface.dedup = MemoryUpdateDeduplicator()
+
+    await mocked_iface.webhook_entrypoint({'update_id': 7, 'message': {}})
+    await mocked_iface.webhook_entrypoint({'update_id': 7, 'message': {}})
+
+    mock_de_json.assert_called_once()
+    mocked_iface.app.process_update.assert_awaited_once()
+    assert mocked_iface.dedup.dropped == 1
+
+
 @patch('app.tg_interface.interface.ReplyKeyboardMarkup')
 async def test_prepare_chat(mock_reply_kbd_markup, reply_kbd):
     chat_id = -123456789  # Telegram groups often have negative ids
@@ -208,4 +272,126 @@ async def test_handle_inline_buttons_edited(mocked_iface):
             text='Edited message',
             reply_markup='keyboard'
         )
-        fake_callback_query.answer.assert_awaited_once()
\ No newline at end of file
+        fake_callback_query.answer.assert_awaited_once()
+
+def fake_message(chat_id: int, message_id: int) -> MagicMock:
+    message = MagicMock()
+    message.chat_id = chat_id
+    message.message_id = message_id
+    return message
+
+
+def fake_load(load_id: str, stage: str) -> MagicMock:
+    load = MagicMock()
+    load.load_id = load_id
+    load.stage = stage
+    return load
+
+
+@pytest.mark.asyncio
+async def test_post_loads_remembers_messages(mocked_iface):
+    fake_bot = AsyncMock()
+    fake_bot.send_message.side_effect = [fake_message(1, 10), fake_message(1, 11), fake_message(1, 12)]
+    loads = [fake_load('load1', 'start'), fake_load('load2', 'drive')]
+
+    with patch("app.tg_interface.interface.craft_load_message", return_value=('text', 'keyboard')):
+        await mocked_iface.post_loads(chat_id=1, loads=loads, bot=fake_bot)
+
+    assert mocked_iface.load_messages == {'load1': [(1, 10)], 'load2': [(1, 11)]}
+
+
+@pytest.mark.asyncio
+async def test_remember_message_is_bounded(mocked_iface):
+    with patch("app.tg_interface.interface.settings.TG_TRACKED_LOADS", 2):
+        for message_id in range(5):
+            mocked_iface.remember_message('load1', fake_message(1, message_id))
+        mocked_iface.remember_message('load2', fake_message(1, 5))
+        mocked_iface.remember_message('load3', fake_message(1, 6))
+
+    assert list(mocked_iface.load_messages) == ['load2', 'load3']
+    mocked_iface.remember_message('load1', fake_message(1, 7))
+    assert mocked_iface.load_messages['load1'] == [(1, 7)]
+    for message_id in range(8, 12):
+        mocked_iface.remember_message('load1', fake_message(1, message_id))
+    assert len(mocked_iface.load_messages['load1']) == mocked_iface.MESSAGES_PER_LOAD
+
+
+@pytest.mark.asyncio
+async def test_refresh_load_messages(mocked_iface):
+    mocked_iface.remember_message('load1', fake_message(1, 10))
+    mocked_iface.remember_message('load1', fake_message(2, 20))
+    mocked_iface.remember_message('load2', fake_message(1, 11))
+    fake_bot = AsyncMock()
+    fake_bot.edit_message_text.side_effect = [True, Exception('Message to edit not found'), True]
+
+    with patch("app.tg_interface.interface.craft_load_message", return_value=('text', 'keyboard')):
+        edited = await mocked_iface.refresh_load_messages(
+            [fake_load('load1', 'finish'), fake_load('load2', 'history'), fake_load('load3', 'finish')],
+            fake_bot
+        )
+
+    assert edited == (2, 1)
+    fake_bot.edit_message_text.assert_any_await(chat_id=1, message_id=10, text='text', reply_markup='keyboard')
+    fake_bot.edit_message_text.assert_any_await(chat_id=1, message_id=11, text='Deleted')
+    assert 'load2' not in mocked_iface.load_messages
+
+
+@pytest.mark.asyncio
+async def test_refresh_load_messages_waits_out_flood_control(mocked_iface):
+    mocked_iface.remember_message('load1', fake_message(1, 10))
+    mocked_iface.remember_message('load2', fake_message(1, 11))
+    fake_bot = AsyncMock()
+    fake_bot.edit_message_text.side_effect = [RetryAfter(3), True] + [RetryAfter(1)] * 4
+
+    with patch("app.tg_interface.interface.craft_load_message", return_value=('text', 'keyboard')), \
+            patch("app.tg_interface.interface.asyncio.sleep", new=AsyncMock()) as sleep:
+        edited = await mocked_iface.refresh_load_messages(
+            [fake_load('load1', 'finish'), fake_load('load2', 'finish')],
+            fake_bot
+        )
+
+    # The second message is given up after EDIT_RETRIES waits
+    assert edited == (1, 1)
+    assert fake_bot.edit_message_text.await_count == 2 + mocked_iface.EDIT_RETRIES + 1
+    assert sleep.await_args_list[0].args == (3,)
+
+
+@pytest.mark.asyncio
+async def test_archive_finished_command():
+    fake_loads = AsyncMock()
+    fake_loads.connection = MagicMock()
+    fake_loads.get_actives.return_value = [
+        fake_load('load1', 'finish'), fake_load('load2', 'drive'), fake_load('load3', 'finish')
+    ]
+    moved = [fake_load('load1', 'history')]
+    fake_loads.transition_many.return_value = moved
+    fake_iface = AsyncMock()
+    fake_iface.refresh_load_messages.return_value = (1, 0)
+    fake_bot = AsyncMock()
+    fake_update = MagicMock()
+    fake_update.effective_chat.id = 123
+
+    await reply_buttons.ArchiveFinishedCommand.action(fake_update, fake_loads, fake_bot, fake_iface)
+
+    fake_loads.transition_many.assert_awaited_once_with(['load1', 'load3'], 'history', from_stage='finish')
+    fake_iface.refresh_load_messages.assert_awaited_once_with(moved, fake_bot)
+    fake_bot.send_message.assert_awaited_once_with(chat_id=123, text='finish → history: 1 loads')
+
+
+@pytest.mark.asyncio
+async def test_bulk_command_reports_messages_not_edited():
+    fake_loads = AsyncMock()
+    fake_loads.connection = MagicMock()
+    fake_loads.get_actives.return_value = [fake_load('load1', 'drive'), fake_load('load2', 'drive')]
+    fake_loads.transition_many.return_value = [fake_load('load1', 'finish'), fake_load('load2', 'finish')]
+    fake_iface = AsyncMock()
+    fake_iface.refresh_load_messages.return_value = (1, 2)
+    fake_bot = AsyncMock()
+    fake_update = MagicMock()
+    fake_update.effective_chat.id = 123
+
+    await reply_buttons.AdvanceDriveCommand.action(fake_update, fake_loads, fake_bot, fake_iface)
+
+    fake_bot.send_message.assert_awaited_once_with(
+        chat_id=123, text='drive → finish: 2 loads, 2 messages could not be edited'
+    )
@@ -0,0 +1,90 @@
+import asyncio
+import secrets
+import pytest
+from unittest.mock import AsyncMock
+from app.loads.known_ids import BloomFilter, KnownLoadIds
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    ids = [secrets.token_hex(16) for _ in range(1000)]
+    for load_id in ids:
+        bloom.add(load_id)
+
+    assert all(load_id in bloom for load_id in ids)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for _ in range(1000):
+        bloom.add(secrets.token_hex(16))
+
+    false_positives = sum(secrets.token_hex(16) in bloom for _ in range(10000))
+    assert false_positives < 300
+
+
+def fetcher(*batches, started: asyncio.Event = None, release: asyncio.Event = None):
+    async def fetch():
+        if started is not None:
+            started.set()
+            await release.wait()
+        for batch in batches:
+            yield batch
+    return fetch
+
+
+@pytest.fixture
+def estimate():
+    return AsyncMock(return_value=10)
+
+
+async def test_trusted_only_while_tracking(estimate):
+    known = KnownLoadIds(fetcher(['a' * 32]), estimate)
+    await known.start()
+    try:
+        # Not listening yet: every ID may exist
+        assert known.might_exist('b' * 32)
+
+        known.set_tracking(True)
+        await known.rebuild()
+        assert known.fresh
+        assert known.might_exist('a' * 32)
+        assert not known.might_exist('b' * 32)
+
+        known.add('b' * 32)
+        assert known.might_exist('b' * 32)
+    finally:
+        await known.stop()
+
+
+async def test_insert_during_build_builds_again(estimate):
+    started, release = asyncio.Event(), asyncio.Event()
+    known = KnownLoadIds(fetcher(['a' * 32], started=started, release=release), estimate)
+    known._tracking = True
+
+    build = known.rebuild()
+    await started.wait()
+    known.add('c' * 32)    # Added by this process meanwhile
+    known.invalidate()     # Inserted by another one meanwhile
+    assert known.rebuild() is build
+    release.set()
+    await build
+
+    assert known.fresh
+    assert known.might_exist('c' * 32)
+    assert not known.might_exist('b' * 32)
+    assert estimate.await_count == 2
+
+
+async def test_failed_build_is_not_trusted(estimate):
+    async def fetch():
+        raise Exception('Database connection failed')
+        yield
+
+    known = KnownLoadIds(fetch, estimate)
+    known._tracking = True
+    await known.rebuild()
+
+    assert not known.fresh
+    assert known.might_exist('b' * 32)
@@ -0,0 +1,156 @@
+"""
+EXPLAIN every query from queries.py over a large seeded dataset and make
+sure none of them falls back to a sequential scan of the loads table.
+
+The size of the dataset is taken from PLAN_TEST_ROWS (1M by default).
+Lookup and dimension tables (statuses, types, clients, drivers) are allowed
+to be scanned: hashing them is what the planner should do for them.
+"""
+import os
+from datetime import datetime
+import pytest
+from app.loads import queries
+from benchmarks.seed import make_loads, recreate_database, seed
+
+
+PLAN_TEST_DB_NAME = 'test_loads_plans'
+PLAN_TEST_ROWS = int(os.getenv('PLAN_TEST_ROWS', '1000000'))
+
+GUARDED_TABLES = {'loads'}
+
+# Existing load from the seed: md5('seed' || 1)
+SEEDED_LOAD_ID = '9289941f8a4200fd6c05f11fab6bc867'
+
+NEW_LOAD = {
+    'load_id': 'f' * 32,
+    'modified_at': datetime.now(),
+    'load_type': 'external',
+    'load_type_id': 1,
+    'client_num': '380000000001',
+    'driver_name': 'Driver 1',
+    'driver_num': '380000000001',
+    'stage': 'start',
+    'status_id': 1,
+    'start_city': 'Start',
+    'engage_city': 'Engage',
+    'clear_city': 'Clear',
+    'finish_city': 'Finish'
+}
+
+# name: (query, params, seq scan allowed)
+PLANNED_QUERIES = {
+    'active': (queries.CTE_SELECT_ALL_LOADS + queries.FILTER_ACTIVE_LOADS, (), False),
+    'history_page': (
+        queries.CTE_SELECT_ALL_LOADS + queries.FILTER_HISTORY_PAGE + queries.HISTORY_PAGE_ORDER,
+        ({'limit': 50}, ),
+        False
+    ),
+    'history_page_after': (
+        queries.CTE_SELECT_ALL_LOADS +
+        queries.FILTER_HISTORY_PAGE +
+        queries.HISTORY_PAGE_SINCE +
+        queries.HISTORY_PAGE_UNTIL +
+        queries.HISTORY_PAGE_AFTER +
+        queries.HISTORY_PAGE_ORDER,
+        ({
+            'since': datetime(2000, 1, 1),
+            'until': datetime.now(),
+            'after_at': datetime.now(),
+            'after_id': SEEDED_LOAD_ID,
+            'limit': 50
+        }, ),
+        False
+    ),
+    'public_active': (queries.CTE_SELECT_PUBLIC_LOADS + queries.FILTER_ACTIVE_LOADS, (), False),
+    'public_history_page': (
+        queries.CTE_SELECT_PUBLIC_LOADS + queries.FILTER_HISTORY_PAGE + queries.HISTORY_PAGE_ORDER,
+        ({'limit': 50}, ),
+        False
+    ),
+    'single': (queries.CTE_SELECT_ALL_LOADS + queries.FILTER_SINGLE_LOAD, (SEEDED_LOAD_ID, ), False),
+    'insert_load': (queries.INSERT_LOAD, (NEW_LOAD, ), False),
+    'insert_client': (queries.INSERT_CLIENT, ({'phone_num': '380000000001'}, ), False),
+    'insert_driver': (
+        queries.INSERT_DRIVER,
+        ({'name_surname': 'Driver 1', 'phone_num': '380000000001'}, ),
+        False
+    ),
+    'update_load': (queries.UPDATE_LOAD, (datetime.now(), 5, SEEDED_LOAD_ID), False),
+    'transition_load': (
+        queries.TRANSITION_LOAD,
+        ({'modified_at': datetime.now(), 'status_id': 5, 'load_id': SEEDED_LOAD_ID}, ),
+        False
+    ),
+    'export_stage': (
+        queries.EXPORT_LOADS + queries.EXPORT_BY_STAGE + queries.EXPORT_SINCE + queries.EXPORT_ORDER,
+        ({'status_id': 3, 'since': datetime(2000, 1, 1)}, ),
+        False
+    ),
+    'delta_high_water': (queries.DELTA_HIGH_WATER, (), False),
+    'delta_changed': (
+        queries.CTE_SELECT_ALL_LOADS +
+        queries.DELTA_CHANGED +
+        queries.DELTA_SINCE +
+        queries.DELTA_BY_STAGE +
+        queries.DELTA_BY_TYPE +
+        queries.DELTA_ORDER,
+        ({'since': datetime.now(), 'status_id': 3, 'load_type_id': 1}, ),
+        False
+    ),
+    'delta_removed': (
+        queries.DELTA_REMOVED + queries.DELTA_BY_TYPE + queries.DELTA_MOVED_AWAY + queries.DELTA_BY_TYPE,
+        ({'since': datetime.now(), 'status_id': 3, 'load_type_id': 1}, ),
+        False
+    ),
+    # A full export reads the whole table by design
+    'export_all': (queries.EXPORT_LOADS + queries.EXPORT_ORDER, (), True),
+    'transition_loads': (
+        queries.TRANSITION_LOADS,
+        ({
+            'modified_at': datetime.now(),
+            'status_id': 6,
+            'from_status_id': 5,
+            'load_ids': [SEEDED_LOAD_ID, 'f' * 32]
+        }, ),
+        False
+    ),
+    'count_active': (queries.COUNT_ACTIVE_LOADS, ({'status_ids': [1, 2, 3, 4, 5]}, ), False),
+    # Counts nearly every row of the table, a scan is the cheapest plan
+    'count_history': (queries.COUNT_HISTORICAL_LOADS, ({'status_id': 6}, ), True),
+}
+
+
+def iter_plan_nodes(node: dict):
+    """
+    Walk an EXPLAIN (FORMAT JSON) plan tree depth first.
+    """
+    yield node
+    for child in node.get('Plans', ()):
+        yield from iter_plan_nodes(child)
+
+
+@pytest.fixture(scope='module')
+async def seeded_db():
+    await recreate_database(PLAN_TEST_DB_NAME)
+    async with make_loads(PLAN_TEST_DB_NAME, autocommit=True) as instance:
+        await seed(instance, PLAN_TEST_ROWS)
+        await instance.execute_query('vacuum analyze')
+        yield instance
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize('name', PLANNED_QUERIES)
+async def test_query_plan_uses_indexes(seeded_db, name):
+    query, params, seq_scan_allowed = PLANNED_QUERIES[name]
+    explain = 'explain (format json) ' + query.strip().rstrip(';')
+    rows = await seeded_db.execute_query(explain, *params)
+    plan = rows[0][0][0]['Plan']
+
+    seq_scans = [
+        node['Relation Name']
+        for node in iter_plan_nodes(plan)
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in GUARDED_TABLES
+    ]
+    if seq_scan_allowed:
+        return
+    assert not seq_scans, f'{name} falls back to a sequential scan of {seq_scans}'
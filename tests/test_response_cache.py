@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.response_cache import ResponseCache
+
+
+@pytest.fixture
+def render():
+    return AsyncMock(side_effect=[b'first', b'second', b'third'])
+
+
+def expire(cache: ResponseCache):
+    """
+    Make the cached response look older than the interval.
+    """
+    cache._response = cache._response._replace(rendered_at=cache._response.rendered_at - cache.interval)
+
+
+async def test_first_get_renders(render):
+    cache = ResponseCache(render, interval=60)
+
+    response = await cache.get()
+
+    assert response.body == b'first'
+    assert gzip.decompress(response.gzip_body) == b'first'
+    assert response.etag.startswith('"') and response.etag.endswith('"')
+    render.assert_awaited_once()
+
+
+async def test_served_from_cache_within_interval(render):
+    cache = ResponseCache(render, interval=60)
+
+    await cache.get()
+    response = await cache.get()
+
+    assert response.body == b'first'
+    render.assert_awaited_once()
+
+
+async def test_concurrent_first_gets_render_once(render):
+    cache = ResponseCache(render, interval=60)
+
+    responses = await asyncio.gather(*(cache.get() for _ in range(10)))
+
+    assert {response.body for response in responses} == {b'first'}
+    render.assert_awaited_once()
+
+
+async def test_stale_while_revalidate(render):
+    cache = ResponseCache(render, interval=60)
+    await cache.get()
+    expire(cache)
+
+    # Stale responses are served while one background render runs
+    stale = await asyncio.gather(*(cache.get() for _ in range(10)))
+    assert {response.body for response in stale} == {b'first'}
+
+    await asyncio.sleep(0)
+    assert (await cache.get()).body == b'second'
+    assert render.await_count == 2
+
+
+async def test_etag_follows_body():
+    cache = ResponseCache(AsyncMock(side_effect=[b'same', b'same', b'other']), interval=60)
+
+    etags = []
+    for _ in range(3):
+        etags.append((await cache.get()).etag)
+        expire(cache)
+        await cache.get()
+        await asyncio.sleep(0)
+
+    assert etags[0] == etags[1] != etags[2]
+
+
+async def test_unchanged_version_is_not_rendered_again(render):
+    version = MagicMock(return_value=1)
+    cache = ResponseCache(render, interval=60, version=version)
+    await cache.get()
+    expire(cache)
+
+    await cache.get()
+    await asyncio.sleep(0)
+    assert (await cache.get()).body == b'first'
+
+    version.return_value = 2
+    expire(cache)
+    await cache.get()
+    await asyncio.sleep(0)
+    assert (await cache.get()).body == b'second'
+
+
+async def test_failed_render_keeps_stale_response(render):
+    render.side_effect = [b'first', Exception('Database connection failed'), b'third']
+    cache = ResponseCache(render, interval=60)
+    await cache.get()
+    expire(cache)
+
+    await cache.get()
+    await asyncio.sleep(0)
+    assert (await cache.get()).body == b'first'
+    # Not retried before the next interval
+    assert render.await_count == 2
+
+
+async def test_failed_first_render_raises(render):
+    render.side_effect = [Exception('Database connection failed'), b'second']
+    cache = ResponseCache(render, interval=60)
+
+    with pytest.raises(Exception, match='Database connection failed'):
+        await cache.get()
+    assert (await cache.get()).body == b'second'
@@ -0,0 +1,23 @@
+import importlib
+import pytest
+from app import settings
+
+
+@pytest.fixture
+def reload_settings(monkeypatch):
+    yield lambda: importlib.reload(settings)
+    monkeypatch.undo()
+    importlib.reload(settings)
+
+
+@pytest.mark.parametrize('mode, read_only', [('full', False), ('read', True)])
+def test_api_mode(reload_settings, monkeypatch, mode, read_only):
+    monkeypatch.setenv('API_MODE', mode)
+    assert reload_settings().READ_ONLY is read_only
+
+
+@pytest.mark.parametrize('mode', ['Read', 'readonly', ''])
+def test_unknown_api_mode(reload_settings, monkeypatch, mode):
+    monkeypatch.setenv('API_MODE', mode)
+    with pytest.raises(EnvironmentError, match='API_MODE'):
+        reload_settings()
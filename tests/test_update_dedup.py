@@ -0,0 +1,31 @@
+import pytest
+from app.tg_interface.update_dedup import MemoryUpdateDeduplicator
+
+
+@pytest.fixture
+def dedup(clock):
+    return MemoryUpdateDeduplicator(ttl=60, max_ids=3)
+
+
+async def test_replays_dropped(dedup):
+    assert await dedup.first_seen(1)
+    assert await dedup.first_seen(2)
+    assert not await dedup.first_seen(1)
+    assert not await dedup.first_seen(1)
+    assert dedup.dropped == 2
+
+
+async def test_ids_forgotten_after_ttl(dedup, clock):
+    await dedup.first_seen(1)
+    clock.now += 30
+    await dedup.first_seen(2)
+    clock.now += 31
+    assert await dedup.first_seen(1)
+    assert not await dedup.first_seen(2)
+
+
+async def test_oldest_ids_forgotten_first(dedup):
+    for update_id in range(4):
+        await dedup.first_seen(update_id)
+    assert await dedup.first_seen(0)
+    assert not await dedup.first_seen(3)
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from app.tg_interface.update_queue import UpdateQueue
+
+
+@pytest.fixture
+async def queue():
+    queue = UpdateQueue(AsyncMock(), workers=2, maxsize=2, put_timeout=0.01, drain_timeout=1)
+    await queue.start()
+    yield queue
+    await queue.stop()
+
+
+async def test_updates_processed_in_background(queue):
+    assert await queue.put({'update_id': 1})
+    assert await queue.put({'update_id': 2})
+    await queue.queue.join()
+
+    assert queue.handle.await_count == 2
+    assert queue.stats() == {'queued': 0, 'accepted': 2, 'rejected': 0, 'processed': 2, 'failed': 0}
+
+
+async def test_failed_update_does_not_stop_workers(queue):
+    queue.handle.side_effect = [Exception('Telegram API unavailable'), None]
+    await queue.put({'update_id': 1})
+    await queue.put({'update_id': 2})
+    await queue.queue.join()
+
+    assert queue.failed == 1
+    assert queue.processed == 1
+
+
+async def test_full_queue_refuses_updates(queue):
+    release = asyncio.Event()
+
+    async def blocked(_data):
+        await release.wait()
+
+    queue.handle.side_effect = blocked
+
+    # Both being processed
+    for update_id in range(2):
+        assert await queue.put({'update_id': update_id})
+    assert not await queue.put({'update_id': 2})
+    assert queue.rejected == 1
+
+    release.set()
+    await queue.queue.join()
+    assert queue.processed == 2
+
+
+async def test_stop_drains_queue():
+    handled = []
+
+    async def handle(data):
+        await asyncio.sleep(0.01)
+        handled.append(data['update_id'])
+
+    queue = UpdateQueue(handle, workers=1, maxsize=10, drain_timeout=1)
+    await queue.start()
+    for update_id in range(3):
+        await queue.put({'update_id': update_id})
+    await queue.stop()
+
+    assert handled == [0, 1, 2]
+    assert not await queue.put({'update_id': 3})
+
+
+async def test_updates_of_a_key_processed_in_order():
+    started, release = asyncio.Event(), asyncio.Event()
+    handled = []
+
+    async def handle(data):
+        if data['update_id'] == 1:
+            started.set()
+            await release.wait()
+        handled.append(data['update_id'])
+
+    queue = UpdateQueue(handle, key=lambda data: data['key'], workers=3, maxsize=10)
+    await queue.start()
+    try:
+        await queue.put({'update_id': 1, 'key': 'load:a'})
+        await started.wait()
+        await queue.put({'update_id': 2, 'key': 'load:a'})
+        await queue.put({'update_id': 3, 'key': 'load:b'})
+        await queue.put({'update_id': 4, 'key': None})
+
+        # Other keys proceed while the first update of load:a is stuck
+        for _ in range(100):
+            if len(handled) == 2:
+                break
+            await asyncio.sleep(0.001)
+        assert sorted(handled) == [3, 4]
+
+        release.set()
+        await queue.queue.join()
+        assert handled[2:] == [1, 2]
+        assert queue.stats()['queued'] == 0
+    finally:
+        await queue.stop()
+
+
+async def test_updates_waiting_for_their_key_hold_capacity():
+    release = asyncio.Event()
+
+    async def handle(_data):
+        await release.wait()
+
+    queue = UpdateQueue(handle, key=lambda _data: 'chat:1', workers=2, maxsize=3, put_timeout=0.01)
+    await queue.start()
+    try:
+        for update_id in range(3):
+            assert await queue.put({'update_id': update_id})
+        assert not await queue.put({'update_id': 3})
+        release.set()
+        await queue.queue.join()
+        assert queue.processed == 3
+    finally:
+        await queue.stop()
+
+
+async def test_update_without_key_processed_unordered():
+    def key(data):
+        return f"chat:{data['message']['chat']['id']}"
+
+    queue = UpdateQueue(AsyncMock(), key=key, workers=1, drain_timeout=1)
+    await queue.start()
+    try:
+        await queue.put({'update_id': 1})
+        await queue.put({'update_id': 2, 'message': {'chat': {'id': 7}}})
+        await asyncio.wait_for(queue.queue.join(), 1)
+        assert queue.processed == 2
+        assert queue._busy == {}
+    finally:
+        await queue.stop()